@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('SERVE_ASYNC', '1')
 
 application = get_asgi_application()
+
+from core.schema import build_on_startup  # noqa: E402
+
+build_on_startup()
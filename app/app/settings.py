@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 import os
 
@@ -50,16 +51,34 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.RateLimitMiddleware",
+    "core.middleware.CompressionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "core.middleware.QueryProfilerMiddleware",
+    "core.middleware.RoutedMiddleware",
+    "core.middleware.ReplicaMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+# Run by core.middleware.RoutedMiddleware for the admin and the API docs
+# only. The rest of the API authenticates with tokens and skips them.
+ROUTED_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
-    "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
+ROUTED_MIDDLEWARE_PATHS = ["/admin/", "/api/schema/", "/api/docs/"]
+
+# The admin checks for its middleware in MIDDLEWARE, but it runs from
+# ROUTED_MIDDLEWARE.
+SILENCED_SYSTEM_CHECKS = ["admin.E408", "admin.E409", "admin.E410"]
 
 ROOT_URLCONF = "app.urls"
 
+TEST_RUNNER = "core.test_runner.TestRunner"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -78,6 +97,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "app.wsgi.application"
 
+# Set by app.asgi: views are served from an event loop.
+SERVE_ASYNC = os.getenv("SERVE_ASYNC", "0") == "1"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
@@ -89,9 +111,85 @@ DATABASES = {
         "NAME": os.getenv("DB_NAME"),
         "USER": os.getenv("DB_USER"),
         "PASSWORD": os.getenv("DB_PASS"),
+        # Seconds to keep a connection open between requests, 0 to close it
+        # after each one.
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "1") == "1",
     }
 }
 
+# Borrow connections from a per-worker pool instead of keeping one per
+# thread. DB_POOL_SIZE is per process.
+if os.getenv("DB_POOL", "0") == "1":
+    DATABASES["default"].update(
+        {
+            "ENGINE": "core.db.backends.postgresql_pool",
+            "CONN_MAX_AGE": 0,
+            "POOL": {
+                "MAX_SIZE": int(os.getenv("DB_POOL_SIZE", "10")),
+                "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+            },
+        }
+    )
+
+# Read replicas, as a comma separated list of hosts. Each one is a copy of
+# the default database with another HOST; locally it can point at the
+# primary itself.
+REPLICA_DATABASES = []
+for index, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), 1
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["core.db.routers.ReplicaRouter"]
+
+# Seconds a client reads from the primary after it writes
+# (core.middleware.ReplicaMiddleware), and the cache holding those pins.
+REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "5"))
+REPLICA_PIN_CACHE_ALIAS = "default"
+# Function taking a replica alias and returning its lag in seconds, or "" to
+# assume replicas are current. Lagging replicas aren't read from.
+REPLICA_LAG_CHECK = os.getenv(
+    "DB_REPLICA_LAG_CHECK", "core.db.routers.replication_lag"
+)
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "2"))
+# Seconds a lag measurement is reused for.
+REPLICA_LAG_CACHE = 5
+
+
+# Request metrics served at /metrics (core.metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Directory where every worker process writes its metrics, so any of them
+# can serve the totals. Empty for a single process. Use a tmpfs directory
+# that's emptied when the deployment restarts.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = 5
+# Also record each request's time in SQL queries. Off by default, as it
+# adds two thread hops to every async request.
+METRICS_DB_TIME = os.getenv("METRICS_DB_TIME", "0") == "1"
+# Bearer token scrapers must send, or empty to serve /metrics openly.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# SQL profiling of requests (core.middleware.QueryProfilerMiddleware)
+QUERY_PROFILER_ENABLED = os.getenv("QUERY_PROFILER", "0") == "1"
+# Fraction of requests profiled; keep it low in production.
+QUERY_PROFILER_SAMPLE_RATE = float(
+    os.getenv("QUERY_PROFILER_SAMPLE_RATE", "1")
+)
+# Add a Server-Timing header to profiled responses.
+QUERY_PROFILER_SERVER_TIMING = True
+# Profiled requests reaching either threshold are logged to core.queries.
+QUERY_PROFILER_SLOW_DB_MS = int(os.getenv("QUERY_PROFILER_SLOW_DB_MS", "200"))
+QUERY_PROFILER_SLOW_QUERY_COUNT = 30
+# Number of slowest statements to log.
+QUERY_PROFILER_SLOWEST = 3
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -111,6 +209,42 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing profile: "pbkdf2", "argon2" (needs argon2-cffi) or
+# "scrypt". New hashes use the chosen profile; the others stay listed so
+# existing hashes still verify and get upgraded on login.
+PASSWORD_HASHER_PROFILE = os.getenv("PASSWORD_HASHER_PROFILE", "pbkdf2")
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": "core.hashers.TunedPBKDF2PasswordHasher",
+    "argon2": "core.hashers.TunedArgon2PasswordHasher",
+    "scrypt": "core.hashers.TunedScryptPasswordHasher",
+}
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE],
+    *(
+        hasher
+        for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+        if profile != PASSWORD_HASHER_PROFILE
+    ),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.getenv("PASSWORD_PBKDF2_ITERATIONS", "720000")
+)
+PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "2"))
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.getenv("PASSWORD_ARGON2_MEMORY_COST", "102400")
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.getenv("PASSWORD_ARGON2_PARALLELISM", "8")
+)
+PASSWORD_SCRYPT_WORK_FACTOR = int(
+    os.getenv("PASSWORD_SCRYPT_WORK_FACTOR", str(2**14))
+)
+# Threads that login and signup views run on when SERVE_ASYNC is set.
+PASSWORD_HASHING_WORKERS = int(
+    os.getenv("PASSWORD_HASHING_WORKERS", str(os.cpu_count() or 1))
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -130,6 +264,42 @@ STATIC_URL = "/static/static/"
 MEDIA_URL = "/static/media/"
 MEDIA_ROOT = "/vol/web/media"
 STATIC_ROOT = "/vol/web/static"
+# Cache lifetime for media that isn't stored under a content-unique name.
+MEDIA_CACHE_MAX_AGE = 60 * 60
+# Offload media bodies to the front server: "x-sendfile" (Apache, lighttpd)
+# or "x-accel-redirect" (nginx, with an internal location that maps
+# MEDIA_ACCEL_REDIRECT_LOCATION onto MEDIA_ROOT).
+MEDIA_SENDFILE = os.getenv("MEDIA_SENDFILE", "")
+MEDIA_ACCEL_REDIRECT_LOCATION = "/protected/media/"
+
+# Response compression (core.middleware.CompressionMiddleware)
+# Codings in order of preference; "br" and "zstd" need the brotli and
+# zstandard packages.
+COMPRESSION_ENCODINGS = ["br", "zstd", "gzip"]
+COMPRESSION_LEVELS = {"br": 4, "zstd": 3, "gzip": 6}
+COMPRESSION_MIN_SIZE = 1024
+# Streamed as it's produced, so not compressed.
+COMPRESSION_EXCLUDED_TYPES = ["text/event-stream"]
+
+# Recipe image uploads
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION = 6000
+RECIPE_IMAGE_MAX_PIXELS = 24_000_000
+RECIPE_IMAGE_FORMATS = ["JPEG", "PNG", "GIF", "WEBP"]
+# Bytes buffered while waiting for Pillow to recognise the image header.
+RECIPE_IMAGE_HEADER_SIZE = 256 * 1024
+RECIPE_BULK_UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+RECIPE_BULK_UPLOAD_MAX_FILES = 500
+RECIPE_BULK_UPLOAD_WORKERS = 4
+
+# Recipe change events (/api/recipe/events/, served when SERVE_ASYNC is set)
+# Events a slow subscriber may fall behind by before it's told to resync.
+RECIPE_EVENTS_QUEUE_SIZE = 100
+# Seconds between keep-alive comments on idle streams.
+RECIPE_EVENTS_KEEPALIVE = 15
+# Fan events out to every worker with Postgres LISTEN/NOTIFY.
+RECIPE_EVENTS_PG_NOTIFY = os.getenv("RECIPE_EVENTS_PG_NOTIFY", "0") == "1"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -137,6 +307,69 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "core.User"
 
-REST_FRAMEWORK = {"DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema"}
+# Lifetime of the API tokens handed out by user.views.CreateTokenView.
+AUTH_TOKEN_TTL = timedelta(days=int(os.getenv("AUTH_TOKEN_TTL_DAYS", "30")))
+
+# Idempotency-Key handling (core.idempotency): how long responses are kept
+# for replay, and the seconds after which a request still holding its key
+# is presumed dead, letting a retry take over. The timeout must be well
+# above the time the slowest upload can take to send and process.
+IDEMPOTENCY_KEY_TTL = timedelta(
+    hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+)
+IDEMPOTENCY_LOCK_TIMEOUT = int(
+    os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", "900")
+)
+
+# Token -> user lookups cached by user.authentication.
+TOKEN_AUTH_CACHE_TTL = 60
+TOKEN_AUTH_CACHE_MAX_ENTRIES = 10_000
+# Django cache shared between processes, or None for in-process only.
+TOKEN_AUTH_CACHE_ALIAS = "default"
+
+# Request throttling (core.throttling), with the rates per scope in
+# REST_FRAMEWORK. Turned off for the test suite by core.test_runner.
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "1") == "1"
+# Django cache holding the token buckets, shared by every process, or ""
+# to keep them per process, which multiplies the rates by the workers.
+THROTTLE_CACHE_ALIAS = os.getenv("THROTTLE_CACHE_ALIAS", "")
+# Seconds between sweeps dropping the refilled per-process buckets.
+THROTTLE_EVICT_INTERVAL = 60
+
+REST_FRAMEWORK = {
+    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # orjson when it's installed, DRF's stdlib json otherwise.
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+    "DEFAULT_THROTTLE_CLASSES": ["core.throttling.RequestThrottle"],
+    # Reverse proxies in front of the app, whose X-Forwarded-For entries
+    # are trusted to find a client's address for throttling. With none,
+    # the header is ignored, so clients can't pick their own bucket.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
+    # Token bucket rates: a client can burst up to the number of requests,
+    # then gets the steady rate.
+    "DEFAULT_THROTTLE_RATES": {
+        "reads": os.getenv("THROTTLE_RATE_READS", "600/min"),
+        "writes": os.getenv("THROTTLE_RATE_WRITES", "120/min"),
+        "login": os.getenv("THROTTLE_RATE_LOGIN", "10/min"),
+        "signup": os.getenv("THROTTLE_RATE_SIGNUP", "20/hour"),
+    },
+}
 
 SPECTACULAR_SETTINGS = {"COMPONENT_SPLIT_REQUEST": True}
+
+# Prebuilt OpenAPI schema (core.schema)
+# Version of the deployed code, e.g. its commit. The schema is rebuilt when
+# it changes; when empty, a hash of the source files is used instead.
+APP_VERSION = os.getenv("APP_VERSION", "")
+# The image builds the schema into it, so server processes only load it.
+SCHEMA_CACHE_DIR = os.getenv("SCHEMA_CACHE_DIR", "/vol/web/schema")
+# Load or build the schema when a server process starts.
+SCHEMA_BUILD_ON_STARTUP = os.getenv("SCHEMA_BUILD_ON_STARTUP", "1") == "1"
@@ -0,0 +1,55 @@
+"""
+Performance benchmarks.
+
+Each module is a script run from the app directory, for example
+`python -m benchmarks.hashers`. They aren't collected by the test runner.
+"""
+
+import os
+from contextlib import contextmanager
+
+
+def setup():
+    """Configure Django for a standalone benchmark script."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Run against a throwaway test copy of the configured database."""
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(values, fraction):
+    """Return the value below which `fraction` of sorted `values` fall."""
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+
+def summarize(latencies):
+    """Return the mean and p50/p95/p99 of request latencies, in seconds."""
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"mean": None, "p50": None, "p95": None, "p99": None}
+    return {
+        "mean": sum(latencies) / len(latencies),
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
@@ -0,0 +1,451 @@
+"""
+Load test the recipe API end to end against seeded data.
+
+Seeds a throwaway test database, then sends each scenario's requests
+through one of three drivers:
+
+- client: Django's test client, in process.
+- wsgi: a threaded WSGI server on a local port, over HTTP.
+- asgi: Django's ASGI handler, through the async test client. Its
+  concurrent requests share one thread for ORM calls, so query counts are
+  only exact with --concurrency 1.
+
+Reports throughput, p50/p95/p99 latency and SQL queries per request, read
+from the Server-Timing header of QueryProfilerMiddleware, and can save the
+results as JSON and compare them with an earlier run. Requests that got an
+error status are counted by status and reported after the table, since
+their timings aren't those of the endpoint. Throttling is off unless
+--throttle is given, so the runs measure the API rather than 429s.
+
+Usage: python -m benchmarks.api [--driver client] [--requests 200]
+           [--concurrency 4] [--output results.json]
+           [--compare baseline.json] [--scenario list ...] [--throttle]
+
+For the large dataset: --recipes 10000 --tags-per-recipe 50. The dataset
+options take the same distributions as the seed_data command.
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from io import BytesIO
+
+from benchmarks import setup, summarize, test_database
+
+QUERIES_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+class Request:
+    """An HTTP request, encoded so every driver sends the same bytes."""
+
+    def __init__(self, method, path, body=b"", content_type=None, token=""):
+        self.method = method
+        self.path = path
+        self.body = body
+        self.content_type = content_type
+        self.headers = {"Authorization": f"Token {token}"} if token else {}
+
+
+def json_request(method, path, data, token=""):
+    return Request(
+        method, path, json.dumps(data).encode(), "application/json", token
+    )
+
+
+def multipart_request(path, data, token):
+    from django.test.client import (
+        BOUNDARY,
+        MULTIPART_CONTENT,
+        encode_multipart,
+    )
+
+    body = encode_multipart(BOUNDARY, data)
+    return Request("POST", path, body, MULTIPART_CONTENT, token)
+
+
+def image_file():
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), "orange").save(buffer, format="JPEG")
+    return SimpleUploadedFile("image.jpg", buffer.getvalue(), "image/jpeg")
+
+
+def scenarios(user, token):
+    """Return a function building request `i`, for each scenario."""
+    from django.urls import reverse
+
+    from core.models import Recipe, Tag
+    from core.seeding import DEFAULT_PASSWORD
+
+    recipe_ids = list(
+        Recipe.objects.filter(user=user).values_list("id", flat=True)
+    )
+    tag_ids = list(Tag.objects.filter(user=user).values_list("id", flat=True))
+    recipes_url = reverse("recipe:recipe-list")
+    filters = ",".join(map(str, tag_ids[:2]))
+
+    def detail(i):
+        recipe_id = recipe_ids[i % len(recipe_ids)]
+        path = reverse("recipe:recipe-detail", args=[recipe_id])
+        return Request("GET", path, token=token)
+
+    def create(i):
+        data = {
+            "title": f"Created recipe {i}",
+            "time_minutes": 10,
+            "price": "4.50",
+            "tags": [{"name": "Tag 0"}, {"name": f"New tag {i}"}],
+            "ingredients": [{"name": "Ingredient 0"}],
+        }
+        return json_request("POST", recipes_url, data, token)
+
+    def upload_image(i):
+        recipe_id = recipe_ids[i % len(recipe_ids)]
+        path = reverse("recipe:recipe-upload-image", args=[recipe_id])
+        return multipart_request(path, {"image": image_file()}, token)
+
+    def login(i):
+        data = {"email": user.email, "password": DEFAULT_PASSWORD}
+        return json_request("POST", reverse("user:token"), data)
+
+    return {
+        "list": lambda i: Request("GET", recipes_url, token=token),
+        "list_filtered": lambda i: Request(
+            "GET", f"{recipes_url}?tags={filters}", token=token
+        ),
+        "detail": detail,
+        "create": create,
+        "upload_image": upload_image,
+        "login": login,
+    }
+
+
+def queries(header):
+    match = QUERIES_RE.search(header or "")
+    return int(match.group(1)) if match else None
+
+
+def run_threads(send, build, count, concurrency):
+    """
+    Send `count` requests from `concurrency` threads, each with its own
+    `send()` state, and return (latency, status, queries) per request.
+    """
+    from django.db import connections
+
+    results = []
+    lock = threading.Lock()
+    counter = iter(range(count))
+
+    def work():
+        sender = send()
+        timings = []
+        try:
+            for i in counter:
+                request = build(i)
+                start = time.perf_counter()
+                status, timing = sender(request)
+                timings.append(
+                    (time.perf_counter() - start, status, queries(timing))
+                )
+        finally:
+            connections.close_all()
+        with lock:
+            results.extend(timings)
+
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def client_driver(build, count, concurrency):
+    from django.test import Client
+
+    def send():
+        client = Client()
+
+        def sender(request):
+            response = client.generic(
+                request.method,
+                request.path,
+                request.body,
+                request.content_type,
+                headers=request.headers,
+            )
+            return response.status_code, response.get("Server-Timing")
+
+        return sender
+
+    return run_threads(send, build, count, concurrency)
+
+
+def asgi_driver(build, count, concurrency):
+    from django.test import AsyncClient
+
+    async def run():
+        client = AsyncClient()
+        counter = iter(range(count))
+        results = []
+
+        async def work():
+            for i in counter:
+                request = build(i)
+                start = time.perf_counter()
+                response = await client.generic(
+                    request.method,
+                    request.path,
+                    request.body,
+                    request.content_type,
+                    headers=request.headers,
+                )
+                results.append(
+                    (
+                        time.perf_counter() - start,
+                        response.status_code,
+                        queries(response.get("Server-Timing")),
+                    )
+                )
+
+        await asyncio.gather(*(work() for _ in range(concurrency)))
+        return results
+
+    return asyncio.run(run())
+
+
+def wsgi_driver(build, count, concurrency):
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.servers.basehttp import (
+        ThreadedWSGIServer,
+        WSGIRequestHandler,
+    )
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+    server.set_app(WSGIHandler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+
+    def send():
+        def sender(request):
+            # The development server closes connections after a response.
+            connection = http.client.HTTPConnection(host, port)
+            headers = dict(request.headers)
+            if request.content_type:
+                headers["Content-Type"] = request.content_type
+            connection.request(
+                request.method, request.path, request.body, headers
+            )
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            return response.status, response.getheader("Server-Timing")
+
+        return sender
+
+    try:
+        return run_threads(send, build, count, concurrency)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+DRIVERS = {
+    "client": client_driver,
+    "wsgi": wsgi_driver,
+    "asgi": asgi_driver,
+}
+
+
+def run_scenario(driver, build, count, concurrency):
+    """Run a scenario and return its summary."""
+    # Warm up caches, imports and connections.
+    driver(build, min(concurrency, count), concurrency)
+    start = time.perf_counter()
+    results = driver(build, count, concurrency)
+    elapsed = time.perf_counter() - start
+    query_counts = [q for _, _, q in results if q is not None]
+    errors = Counter(str(status) for _, status, _ in results if status >= 400)
+    return {
+        "requests": len(results),
+        "errors": sum(errors.values()),
+        "error_statuses": dict(sorted(errors.items())),
+        "throughput": len(results) / elapsed,
+        **summarize([latency for latency, _, _ in results]),
+        "queries_mean": (
+            sum(query_counts) / len(query_counts) if query_counts else None
+        ),
+        "queries_max": max(query_counts, default=None),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline):
+    print(
+        f"{'scenario':<15}{'req/sec':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'queries':>9}{'errors':>8}"
+    )
+    for name, result in results.items():
+        queries = result["queries_mean"]
+        print(
+            f"{name:<15}{result['throughput']:>10.1f}"
+            f"{result['p50'] * 1000:>10.2f}{result['p95'] * 1000:>10.2f}"
+            f"{result['p99'] * 1000:>10.2f}"
+            f"{'-' if queries is None else f'{queries:.1f}':>9}"
+            f"{result['errors']:>8}"
+        )
+        before = baseline.get(name)
+        if before:
+            changes = "  ".join(
+                f"{key} {(result[key] / before[key] - 1) * 100:+.1f}%"
+                for key in ["throughput", "p50", "p99"]
+                if before.get(key)
+            )
+            print(f"{'':<15}vs baseline: {changes}")
+    for name, result in results.items():
+        if result["errors"]:
+            statuses = ", ".join(
+                f"{count} x {status}"
+                for status, count in result["error_statuses"].items()
+            )
+            print(
+                f"WARNING: {result['errors']} of {result['requests']} "
+                f"{name} requests failed ({statuses}); its timings don't "
+                "measure the endpoint.",
+                file=sys.stderr,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip(),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--driver", choices=DRIVERS, default="client")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="Scenario to run, may be repeated. All by default.",
+    )
+    # Dataset sizes, as seed_data distributions.
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--recipes", default="1000")
+    parser.add_argument("--tags", default="50")
+    parser.add_argument("--ingredients", default="100")
+    parser.add_argument("--tags-per-recipe", default="5")
+    parser.add_argument("--ingredients-per-recipe", default="8")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--throttle",
+        action="store_true",
+        help="Keep the API's throttles on, as in production.",
+    )
+    parser.add_argument("--output", help="Write the results to this file.")
+    parser.add_argument("--compare", help="Earlier results to compare to.")
+    args = parser.parse_args()
+    setup()
+
+    import django
+    from django.contrib.auth import get_user_model
+    from django.test import override_settings
+
+    from core.models import AuthToken
+    from core.seeding import email_for, generate
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    dataset = {
+        key: getattr(args, key)
+        for key in [
+            "users",
+            "recipes",
+            "tags",
+            "ingredients",
+            "tags_per_recipe",
+            "ingredients_per_recipe",
+            "seed",
+        ]
+    }
+
+    with test_database(), tempfile.TemporaryDirectory() as media_root:
+        start = time.perf_counter()
+        counts = generate(**dataset)
+        print(f"Seeded {counts} in {time.perf_counter() - start:.1f}s")
+        user = get_user_model().objects.get(email=email_for(0))
+        _, token = AuthToken.objects.issue(user, "benchmark")
+
+        profiler = override_settings(
+            MEDIA_ROOT=media_root,
+            ALLOWED_HOSTS=["*"],
+            THROTTLE_ENABLED=args.throttle,
+            QUERY_PROFILER_ENABLED=True,
+            QUERY_PROFILER_SAMPLE_RATE=1,
+            QUERY_PROFILER_SLOW_DB_MS=float("inf"),
+            QUERY_PROFILER_SLOW_QUERY_COUNT=float("inf"),
+        )
+        results = {}
+        with profiler:
+            for name, build in scenarios(user, token).items():
+                if args.scenario and name not in args.scenario:
+                    continue
+                results[name] = run_scenario(
+                    DRIVERS[args.driver],
+                    build,
+                    args.requests,
+                    args.concurrency,
+                )
+
+    print_results(results, baseline)
+    if args.output:
+        output = {
+            "meta": {
+                "date": datetime.now(timezone.utc).isoformat(),
+                "revision": git_revision(),
+                "driver": args.driver,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "throttle": args.throttle,
+                "dataset": dataset,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
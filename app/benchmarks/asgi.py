@@ -0,0 +1,128 @@
+"""
+Compare WSGI and ASGI throughput of the recipe read endpoints.
+
+Runs the same workload twice, each in its own process: once through the
+WSGI handler with a thread per client, and once through the ASGI handler
+(SERVE_ASYNC, so the async read views) with every client on one event
+loop. Requests go through Django's in-process test clients, so this
+measures the framework and view cost rather than a particular server.
+
+Usage: python -m benchmarks.asgi [--requests 2000] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import setup, test_database
+
+
+def seed(recipes):
+    """Create a user with recipes and tags, and return their token key."""
+    from decimal import Decimal
+
+    from django.contrib.auth import get_user_model
+
+    from core.models import AuthToken, Recipe, Tag
+
+    user = get_user_model().objects.create_user(email="bench@example.com")
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f"Tag {i}") for i in range(5)
+    )
+    created = Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f"Recipe {i}",
+            time_minutes=10,
+            price=Decimal("5.50"),
+        )
+        for i in range(recipes)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in created
+        for tag in tags
+    )
+    return AuthToken.objects.issue(user)[1]
+
+
+def run_wsgi(url, headers, requests, concurrency):
+    from django.test import Client
+
+    def worker(count):
+        client = Client(headers=headers)
+        for _ in range(count):
+            assert client.get(url).status_code == 200
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        counts = [requests // concurrency] * concurrency
+        list(pool.map(worker, counts))
+
+
+def run_asgi(url, headers, requests, concurrency):
+    from django.test import AsyncClient
+
+    async def worker(count):
+        client = AsyncClient()
+        for _ in range(count):
+            response = await client.get(url, headers=headers)
+            assert response.status_code == 200
+
+    async def main():
+        counts = [requests // concurrency] * concurrency
+        await asyncio.gather(*(worker(count) for count in counts))
+
+    asyncio.run(main())
+
+
+def run_mode(args):
+    """Run the workload in this process and print the result as JSON."""
+    setup()
+    from django.conf import settings
+    from django.urls import reverse
+
+    with test_database():
+        key = seed(args.recipes)
+        url = reverse("recipe:recipe-list")
+        headers = {"Authorization": f"Token {key}"}
+        run = run_asgi if settings.SERVE_ASYNC else run_wsgi
+        # Warm up caches, connections and imports.
+        run(url, headers, args.concurrency, args.concurrency)
+        start = time.perf_counter()
+        run(url, headers, args.requests, args.concurrency)
+        elapsed = time.perf_counter() - start
+    print(json.dumps({"requests_per_second": args.requests / elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--recipes", type=int, default=100)
+    parser.add_argument("--mode", choices=["wsgi", "asgi"])
+    args = parser.parse_args()
+    if args.mode:
+        return run_mode(args)
+
+    print(f"{'mode':<6}{'requests/sec':>14}")
+    for mode in ["wsgi", "asgi"]:
+        env = {**os.environ, "SERVE_ASYNC": "1" if mode == "asgi" else "0"}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.asgi", *sys.argv[1:]]
+            + ["--mode", mode],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"{mode:<6}{result['requests_per_second']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
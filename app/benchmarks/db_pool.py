@@ -0,0 +1,158 @@
+"""
+Load test the recipe list with and without persistent or pooled database
+connections, reporting request latency percentiles.
+
+Each mode runs in its own process with the matching DB_* environment, with
+a number of threads sending authenticated requests through a WSGI handler,
+so connections are opened and closed at request boundaries as in a real
+worker. Needs a reachable PostgreSQL server; the DB_HOST latency is what the
+persistent modes save.
+
+Usage: python -m benchmarks.db_pool [--threads 8] [--requests 200]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from io import BytesIO
+
+from benchmarks import percentile, setup, test_database
+
+PATH = "/api/recipe/recipes/"
+
+MODES = {
+    "no-persist": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "0"},
+    "persistent": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "60"},
+    "pool": {"DB_POOL": "1"},
+}
+
+
+def run_worker(key, threads, requests):
+    """Send requests from `threads` threads and print their latencies."""
+    setup()
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    latencies = []
+    lock = threading.Lock()
+
+    def start_response(status, headers):
+        assert status.startswith("200"), status
+
+    def send():
+        timings = []
+        for _ in range(requests):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": PATH,
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "HTTP_AUTHORIZATION": f"Token {key}",
+                "wsgi.input": BytesIO(),
+                "wsgi.url_scheme": "http",
+            }
+            start = time.perf_counter()
+            response = handler(environ, start_response)
+            b"".join(response)
+            response.close()
+            timings.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(timings)
+
+    workers = [threading.Thread(target=send) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    from core.db.backends.postgresql_pool.base import pool_stats
+
+    latencies.sort()
+    print(
+        json.dumps(
+            {
+                "rate": len(latencies) / elapsed,
+                "p50": percentile(latencies, 0.5),
+                "p99": percentile(latencies, 0.99),
+                "pool": pool_stats(),
+            }
+        )
+    )
+
+
+def run_mode(mode, database, key, args):
+    """Run a worker process for a mode and return its results."""
+    env = {**os.environ, **MODES[mode], "DB_NAME": database}
+    env["DB_POOL_SIZE"] = str(args.pool_size)
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.db_pool",
+            "--worker",
+            key,
+            "--threads",
+            str(args.threads),
+            "--requests",
+            str(args.requests),
+        ],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args.worker, args.threads, args.requests)
+        return
+
+    setup()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from core.models import AuthToken, Recipe
+
+    with test_database():
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="benchmark-password"
+        )
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f"Recipe {i}", time_minutes=5, price=1)
+            for i in range(20)
+        )
+        _, key = AuthToken.objects.issue(user)
+        database = connection.settings_dict["NAME"]
+        connection.close()
+
+        print(
+            f"{'mode':<12}{'req/sec':>10}{'p50 ms':>10}{'p99 ms':>10}"
+            f"{'pool waits':>12}"
+        )
+        for mode in MODES:
+            result = run_mode(mode, database, key, args)
+            waits = sum(pool["waited"] for pool in result["pool"])
+            print(
+                f"{mode:<12}{result['rate']:>10.1f}"
+                f"{result['p50'] * 1000:>10.2f}"
+                f"{result['p99'] * 1000:>10.2f}"
+                f"{waits if result['pool'] else '-':>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
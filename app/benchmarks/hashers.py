@@ -0,0 +1,46 @@
+"""
+Benchmark logins per second per core for each password hasher profile.
+
+Usage: python -m benchmarks.hashers [--seconds 3]
+"""
+
+import argparse
+import time
+
+from benchmarks import setup
+
+
+def logins_per_second(hasher, seconds):
+    """Return how many password checks one thread does per second."""
+    encoded = hasher.encode("correct horse battery", hasher.salt())
+    checks = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        hasher.verify("correct horse battery", encoded)
+        checks += 1
+    return checks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+    setup()
+
+    from django.conf import settings
+    from django.utils.module_loading import import_string
+
+    print(f"{'profile':<10}{'logins/sec/core':>18}")
+    for profile, path in settings.PASSWORD_HASHER_PROFILES.items():
+        hasher = import_string(path)()
+        try:
+            rate = logins_per_second(hasher, args.seconds)
+        except ValueError as exc:
+            # Raised by Django when the hasher's library isn't installed.
+            print(f"{profile:<10}{'skipped':>18}  ({exc})")
+            continue
+        print(f"{profile:<10}{rate:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
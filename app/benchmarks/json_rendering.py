@@ -0,0 +1,74 @@
+"""
+Benchmark rendering and parsing a 1,000 recipe list with DRF's JSON
+renderer and parser and with the orjson based ones.
+
+Usage: python -m benchmarks.json_rendering [--recipes 1000] [--rounds 50]
+"""
+
+import argparse
+import time
+from decimal import Decimal
+from io import BytesIO
+
+from benchmarks import setup
+
+
+def recipe_payload(count):
+    """Return a recipe list shaped like RecipeSerializer's output."""
+    return [
+        {
+            "id": i,
+            "title": f"Recipe {i}",
+            "time_minutes": i % 90,
+            "price": Decimal(i % 5000) / 100,
+            "link": f"https://example.com/recipes/{i}",
+            "tags": [{"id": t, "name": f"Tag {t}"} for t in range(3)],
+            "ingredients": [
+                {"id": n, "name": f"Ingredient {n}"} for n in range(8)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def per_second(func, rounds):
+    """Return how many times func runs per second."""
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return rounds / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    setup()
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from core.parsers import FastJSONParser
+    from core.renderers import FastJSONRenderer, orjson
+
+    if orjson is None:
+        print("orjson isn't installed, both renderers use stdlib json.")
+    data = recipe_payload(args.recipes)
+    body = JSONRenderer().render(data)
+    print(f"payload: {args.recipes} recipes, {len(body)} bytes")
+    print(f"{'':<18}{'render/sec':>12}{'parse/sec':>12}")
+    for name, renderer, json_parser in [
+        ("JSONRenderer", JSONRenderer(), JSONParser()),
+        ("FastJSONRenderer", FastJSONRenderer(), FastJSONParser()),
+    ]:
+        renders = per_second(lambda: renderer.render(data), args.rounds)
+        parses = per_second(
+            lambda: json_parser.parse(BytesIO(body)), args.rounds
+        )
+        print(f"{name:<18}{renders:>12.1f}{parses:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
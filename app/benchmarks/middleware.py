@@ -0,0 +1,88 @@
+"""
+Benchmark the per-request cost of the middleware stack on API routes, with
+the routed stack and with every middleware applied to every request.
+
+Requests go to the API root view, which does no work of its own, both
+without cookies and with the session cookie of a logged in admin user.
+
+Usage: python -m benchmarks.middleware [--seconds 3]
+"""
+
+import argparse
+import time
+
+from benchmarks import setup, test_database
+
+PATH = "/api/recipe/"
+
+
+def flat_middleware():
+    """Return MIDDLEWARE with the routed middleware run for every path."""
+    from django.conf import settings
+
+    middleware = []
+    for path in settings.MIDDLEWARE:
+        if path == "core.middleware.RoutedMiddleware":
+            middleware.extend(settings.ROUTED_MIDDLEWARE)
+        else:
+            middleware.append(path)
+    return middleware
+
+
+def requests_per_second(middleware, cookies, seconds):
+    """Return how many requests a handler with `middleware` serves."""
+    from django.core.handlers.base import BaseHandler
+    from django.test import RequestFactory, override_settings
+
+    with override_settings(MIDDLEWARE=middleware):
+        handler = BaseHandler()
+        handler.load_middleware()
+        factory = RequestFactory()
+        count = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            request = factory.get(PATH)
+            request.COOKIES.update(cookies)
+            response = handler.get_response(request)
+            assert response.status_code == 200, response.status_code
+            count += 1
+        return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+    setup()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+
+    with test_database():
+        get_user_model().objects.create_superuser(
+            email="admin@example.com", password="benchmark-password"
+        )
+        client = Client()
+        client.login(email="admin@example.com", password="benchmark-password")
+        session = {
+            settings.SESSION_COOKIE_NAME: client.cookies[
+                settings.SESSION_COOKIE_NAME
+            ].value
+        }
+
+        print(f"{'stack':<10}{'cookies':<10}{'req/sec':>10}{'us/req':>10}")
+        for stack, middleware in [
+            ("flat", flat_middleware()),
+            ("routed", settings.MIDDLEWARE),
+        ]:
+            for name, cookies in [("none", {}), ("session", session)]:
+                rate = requests_per_second(middleware, cookies, args.seconds)
+                print(
+                    f"{stack:<10}{name:<10}{rate:>10.1f}"
+                    f"{1_000_000 / rate:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,10 @@ Django admin customizaion.
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import ImageField
 from core import models
 from django.utils.translation import gettext_lazy as _
+from recipe.uploads import ImageFormField
 
 
 # Register your models here.
@@ -41,7 +43,12 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class RecipeAdmin(admin.ModelAdmin):
+    # Caps image pixels like the API, without importing Pillow at boot.
+    formfield_overrides = {ImageField: {"form_class": ImageFormField}}
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
+admin.site.register(models.Recipe, RecipeAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
@@ -0,0 +1,157 @@
+"""
+PostgreSQL backend that keeps connections in a per-process pool.
+
+Set it as the ENGINE and configure the pool with a POOL dict in the
+database settings:
+
+    "POOL": {"MAX_SIZE": 10, "TIMEOUT": 5}
+
+MAX_SIZE is per process, so a deployment opens up to workers x MAX_SIZE
+connections. CONN_MAX_AGE should be 0: closing a connection at the end of a
+request hands it back to the pool instead.
+"""
+
+import os
+import threading
+
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from psycopg2 import extensions
+
+from core import metrics
+from core.db.pool import ConnectionPool, PoolTimeout
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, settings_dict):
+    """Return this process's pool for a set of connection parameters."""
+    options = settings_dict.get("POOL", {})
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.pid != os.getpid():
+            # Inherited through fork: the connections belong to the parent,
+            # so drop them without closing.
+            pool = None
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                connect,
+                max_size=options.get("MAX_SIZE", 10),
+                timeout=options.get("TIMEOUT", 5),
+                check=check_connection
+                if settings_dict["CONN_HEALTH_CHECKS"]
+                else None,
+            )
+        return pool
+
+
+def pool_stats():
+    """Return the stats of every pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools if pool.pid == os.getpid()]
+
+
+POOL_CONNECTIONS = metrics.Gauge(
+    "db_pool_connections",
+    "Open pooled database connections, by state.",
+    ["state"],
+)
+POOL_ACQUIRED = metrics.Gauge(
+    "db_pool_acquired", "Connections handed out by live worker pools."
+)
+POOL_WAIT = metrics.Gauge(
+    "db_pool_wait_seconds",
+    "Total time live worker pools made requests wait for a connection.",
+)
+POOL_TIMEOUTS = metrics.Gauge(
+    "db_pool_timeouts", "Acquisitions that timed out in live worker pools."
+)
+
+
+@metrics.register_collector
+def collect_pool_metrics():
+    """Set the pool gauges from this process's pools."""
+    stats = pool_stats()
+    idle = sum(pool["idle"] for pool in stats)
+    POOL_CONNECTIONS.set(idle, state="idle")
+    POOL_CONNECTIONS.set(
+        sum(pool["size"] for pool in stats) - idle, state="in_use"
+    )
+    POOL_ACQUIRED.set(sum(pool["acquired"] for pool in stats))
+    POOL_WAIT.set(sum(pool["wait_seconds_total"] for pool in stats))
+    POOL_TIMEOUTS.set(sum(pool["timeouts"] for pool in stats))
+
+
+def close_pools():
+    """Close the idle connections of every pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        if pool.pid == os.getpid():
+            pool.close_idle()
+
+
+def check_connection(connection):
+    """Raise if a pooled connection can't run a query."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections would keep the database in use.
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend that borrows its connections from a pool."""
+
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        key = repr(sorted(conn_params.items()))
+        fresh = []
+
+        def connect():
+            fresh.append(True)
+            return super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+
+        pool = get_pool(key, connect, self.settings_dict)
+        try:
+            connection = pool.acquire()
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        if not fresh:
+            # Set by the parent when it opens a connection.
+            options = self.settings_dict["OPTIONS"]
+            self.isolation_level = IsolationLevel(
+                options.get("isolation_level", IsolationLevel.READ_COMMITTED)
+            )
+        self._pool = pool
+        return connection
+
+    def _close(self):
+        connection = self.connection
+        if connection is None:
+            return
+        pool = self._pool
+        status = connection.info.transaction_status
+        if (
+            self.in_atomic_block
+            or connection.closed
+            or status == extensions.TRANSACTION_STATUS_UNKNOWN
+        ):
+            pool.discard(connection)
+            return
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except self.Database.Error:
+                pool.discard(connection)
+                return
+        pool.release(connection)
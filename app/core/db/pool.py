@@ -0,0 +1,130 @@
+"""
+A thread-safe pool of database connections.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the pool's timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded pool of DB-API connections shared by a process's threads.
+
+    At most `max_size` connections are open at once; `acquire()` waits up
+    to `timeout` seconds for one to be released. `connect` opens a new
+    connection, and `check`, when given, is called on an idle connection
+    before it's handed out again and should raise if it's broken.
+
+    Wait times are recorded, see stats().
+    """
+
+    def __init__(self, connect, max_size, timeout, check=None):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._acquired = 0
+        self._waited = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+
+    def acquire(self):
+        """Return an idle connection, or a new one if there's room."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No connection available after {self.timeout}s "
+                        f"({self.max_size} in use)."
+                    )
+                self._condition.wait(remaining)
+            connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                self._size += 1
+            self._record_wait(time.monotonic() - start)
+
+        if connection is not None and self.check is not None:
+            try:
+                self.check(connection)
+            except Exception:
+                logger.info("Replacing a broken pooled connection")
+                self._close(connection)
+                connection = None
+        if connection is None:
+            try:
+                connection = self.connect()
+            except BaseException:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+        return connection
+
+    def release(self, connection):
+        """Return a connection to the pool."""
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def discard(self, connection):
+        """Close a connection that mustn't be reused, freeing its slot."""
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._close(connection)
+
+    def close_idle(self):
+        """Close every idle connection."""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        """Return the pool's size and wait time metrics."""
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "acquired": self._acquired,
+                "waited": self._waited,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": self._wait_time,
+                "wait_seconds_max": self._max_wait,
+            }
+
+    def _record_wait(self, seconds):
+        self._acquired += 1
+        self._wait_time += seconds
+        self._max_wait = max(self._max_wait, seconds)
+        # Count waits long enough to be the pool's doing.
+        if seconds > 0.001:
+            self._waited += 1
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
@@ -0,0 +1,89 @@
+"""
+Record the queries run on database connections.
+"""
+
+import heapq
+import itertools
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+# Longest SQL kept for a slow statement.
+MAX_SQL_LENGTH = 1000
+
+
+class QueryProfile:
+    """
+    A connection.execute_wrapper() that counts queries and their time.
+
+    Keeps the `keep` slowest statements, slowest first in `slowest()`.
+    """
+
+    def __init__(self, keep=3):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self._slowest = []
+        self._order = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start, many)
+
+    def record(self, sql, duration, many=False):
+        self.count += 1
+        self.duration += duration
+        if not self.keep:
+            return
+        entry = (duration, next(self._order), sql, many)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def slowest(self):
+        """Return the slowest statements as dicts, slowest first."""
+        return [
+            {
+                "sql": sql[:MAX_SQL_LENGTH],
+                "ms": round(duration * 1000, 3),
+                "many": many,
+            }
+            for duration, _, sql, many in sorted(self._slowest, reverse=True)
+        ]
+
+
+@contextmanager
+def profile_queries(keep=3, using=None):
+    """
+    Record the queries run in the block on every database, or on the
+    `using` aliases, and yield the QueryProfile.
+    """
+    profile = QueryProfile(keep)
+    with ExitStack() as stack:
+        for alias in using or connections:
+            stack.enter_context(connections[alias].execute_wrapper(profile))
+        yield profile
+
+
+@asynccontextmanager
+async def aprofile_queries(keep=3, using=None):
+    """
+    Async version of profile_queries().
+
+    The async ORM runs queries on the connections of the thread that
+    sync_to_async uses, so the wrappers are installed there.
+    """
+    stack = ExitStack()
+    profile = await sync_to_async(stack.enter_context)(
+        profile_queries(keep, using)
+    )
+    try:
+        yield profile
+    finally:
+        await sync_to_async(stack.close)()
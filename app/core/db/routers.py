@@ -0,0 +1,115 @@
+"""
+Database router sending reads to replicas.
+"""
+
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+
+# alias -> (checked at, lag in seconds or None if unknown)
+_lag = {}
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Route reads in the block to a replica, or to the primary."""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replication_lag(alias):
+    """
+    Return how many seconds a PostgreSQL replica is behind its primary.
+
+    Zero when it has replayed everything it received, None when it isn't a
+    standby.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE"
+            " WHEN NOT pg_is_in_recovery() THEN NULL"
+            " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()"
+            " THEN 0"
+            " ELSE EXTRACT(EPOCH FROM"
+            " now() - pg_last_xact_replay_timestamp()) END"
+        )
+        (lag,) = cursor.fetchone()
+    return None if lag is None else float(lag)
+
+
+def replica_lag(alias):
+    """Return a replica's lag per REPLICA_LAG_CHECK, cached briefly."""
+    now = time.monotonic()
+    checked, lag = _lag.get(alias, (None, None))
+    if checked is not None and now - checked < settings.REPLICA_LAG_CACHE:
+        return lag
+    try:
+        lag = import_string(settings.REPLICA_LAG_CHECK)(alias)
+    except Exception:
+        # Unreachable replicas are skipped until the next check.
+        lag = float("inf")
+    _lag[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    """Return the replicas close enough to the primary to read from."""
+    replicas = settings.REPLICA_DATABASES
+    if not settings.REPLICA_LAG_CHECK:
+        return replicas
+    return [
+        alias
+        for alias in replicas
+        if (replica_lag(alias) or 0) <= settings.REPLICA_MAX_LAG
+    ]
+
+
+class ReplicaRouter:
+    """
+    Send reads to a random healthy replica inside use_replica() blocks.
+
+    core.middleware.ReplicaMiddleware opens one around safe-method
+    requests. Everything else, including writes, migrations and reads
+    outside such blocks, uses the primary. With no healthy replica, reads
+    fall back to the primary too.
+
+    Auth tokens are always read from the primary: a token is issued by a
+    login, which pins the client's old Authorization header rather than
+    the new one, so its first request could otherwise hit a replica that
+    hasn't received the token yet.
+    """
+
+    primary_models = {"core.authtoken"}
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return DEFAULT_DB_ALIAS
+        if model is not None and (
+            model._meta.label_lower in self.primary_models
+        ):
+            return DEFAULT_DB_ALIAS
+        replicas = healthy_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -0,0 +1,98 @@
+"""
+Password hashers with a tunable cost, and off-thread password hashing.
+
+The hashers keep their parent's algorithm name, so hashes made with another
+cost still verify, and Django rehashes them on the next login.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+from django.db import close_old_connections
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count from settings."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with its costs from settings. Requires argon2-cffi."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with its work factor from settings."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hashing_executor():
+    """Return the thread pool that password hashing views run on."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix="password-hashing",
+            )
+    return _executor
+
+
+def _run_view(view, request, *args, **kwargs):
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        # Connections opened on pool threads aren't closed by the
+        # request_finished signal.
+        close_old_connections()
+
+
+def offload_hashing(view):
+    """
+    Run a sync view that hashes passwords on the bounded hashing pool.
+
+    Under ASGI Django runs every sync view on one shared thread, so a burst
+    of logins would stall all other sync views. With SERVE_ASYNC the view is
+    wrapped in an async view that runs it on its own pool of
+    PASSWORD_HASHING_WORKERS threads instead. Otherwise it's returned as is.
+    """
+    if not settings.SERVE_ASYNC:
+        return view
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        run = sync_to_async(
+            _run_view, thread_sensitive=False, executor=hashing_executor()
+        )
+        return await run(view, request, *args, **kwargs)
+
+    return async_view
@@ -0,0 +1,61 @@
+"""
+Cheap database checks for readiness probes and wait_for_db.
+
+They use raw SQL rather than ORM models, so they work before migrations
+have run and cost a single round trip.
+"""
+
+import functools
+import random
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+
+MIGRATIONS_TABLE = "django_migrations"
+
+
+def ping(alias=DEFAULT_DB_ALIAS):
+    """Run a trivial query, raising a DatabaseError if it fails."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Exception:
+        # Don't reuse a connection that may be half open.
+        connection.close()
+        raise
+
+
+@functools.cache
+def migration_targets():
+    """Return every migration on disk, as (app, name) pairs."""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return frozenset(loader.graph.nodes)
+
+
+def pending_migrations(alias=DEFAULT_DB_ALIAS):
+    """Return the migrations not applied to the database yet."""
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        if MIGRATIONS_TABLE not in connection.introspection.table_names(
+            cursor
+        ):
+            applied = set()
+        else:
+            cursor.execute(f"SELECT app, name FROM {MIGRATIONS_TABLE}")
+            applied = set(cursor.fetchall())
+    return sorted(migration_targets() - applied)
+
+
+def backoff(interval, max_interval, factor=2):
+    """
+    Yield exponentially growing delays, starting at `interval` seconds and
+    capped at `max_interval`.
+
+    Each delay is randomly shortened by up to half, so processes started
+    together don't retry in lockstep.
+    """
+    delay = interval
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(delay * factor, max_interval)
@@ -0,0 +1,237 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+A client that sends an Idempotency-Key header can safely retry the
+request: the first one runs the view and stores its response, and retries
+with the same key get that response replayed without running the view
+again. While the first request is in progress its row acts as a lock, so
+a concurrent retry gets a 409 instead of doing the work twice. Multipart
+uploads are only claimed once the view has their body parsed, so the
+uploaded files can be part of the request's fingerprint.
+
+Keys are per user and kept for IDEMPOTENCY_KEY_TTL. Only successful
+responses are stored; after an error the key is released so the request
+can be fixed and retried. Expired keys are deleted by the
+purge_idempotency_keys command.
+"""
+
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(exceptions.APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _(
+        "This Idempotency-Key was already used for a different request."
+    )
+    default_code = "idempotency_key_reused"
+
+
+class RequestInProgress(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _(
+        "A request with this Idempotency-Key is still in progress."
+    )
+    default_code = "request_in_progress"
+    # Sent as Retry-After by DRF's exception handler.
+    wait = 1
+
+
+class Replay(Exception):
+    """Raised while parsing a request whose response is stored."""
+
+    def __init__(self, record):
+        super().__init__()
+        self.record = record
+
+
+def request_digest(request):
+    """
+    Return a sha256 of the request, to tell retries from other requests
+    reusing a key.
+
+    Multipart bodies are left for the upload handlers to stream, so only
+    their length is added here; FingerprintUploadHandler adds their files
+    as they arrive.
+    """
+    digest = hashlib.sha256()
+    for part in [
+        request.method,
+        request.get_full_path(),
+        request.META.get("CONTENT_LENGTH", ""),
+    ]:
+        digest.update(part.encode() + b"\0")
+    if not request.content_type.startswith("multipart/"):
+        digest.update(request.body)
+    return digest
+
+
+class FingerprintUploadHandler(FileUploadHandler):
+    """
+    Add the files of a multipart body to the request's digest as they
+    stream in, and call `on_parsed()` with the fingerprint once the body
+    is parsed.
+
+    Upload handlers aren't given the other form fields, so idempotent
+    upload views should only read files.
+    """
+
+    def __init__(self, request, digest, on_parsed):
+        super().__init__(request)
+        self.digest = digest
+        self.on_parsed = on_parsed
+
+    def new_file(self, field_name, file_name, content_type, *args, **kwargs):
+        super().new_file(field_name, file_name, content_type, *args, **kwargs)
+        for part in [field_name, file_name, content_type]:
+            self.digest.update(str(part).encode() + b"\0")
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        # Let the next handler build the uploaded file.
+        return None
+
+    def upload_complete(self):
+        self.on_parsed(self.digest.digest())
+
+
+def claim(user, key, fingerprint):
+    """
+    Return the user's record for a key, and whether the caller now holds
+    it and should run the request.
+
+    A new key is claimed by inserting its row, which the unique constraint
+    lets only one of several concurrent requests do. Expired keys and keys
+    held for longer than IDEMPOTENCY_LOCK_TIMEOUT are taken over.
+    """
+    digest = hashlib.sha256(key.encode()).digest()
+    keys = IdempotencyKey.objects.filter(user=user, digest=digest)
+    while True:
+        now = timezone.now()
+        expires = now + settings.IDEMPOTENCY_KEY_TTL
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user,
+                    digest=digest,
+                    fingerprint=fingerprint,
+                    started=now,
+                    expires=expires,
+                )
+            return record, True
+        except IntegrityError:
+            pass
+        try:
+            record = keys.get()
+        except IdempotencyKey.DoesNotExist:
+            # Released since the insert failed.
+            continue
+
+        timeout = timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+        abandoned = record.status_code is None and (
+            record.started <= now - timeout
+        )
+        if record.expires > now and not abandoned:
+            return record, False
+        taken = keys.filter(pk=record.pk, started=record.started).update(
+            fingerprint=fingerprint,
+            status_code=None,
+            response=None,
+            started=now,
+            expires=expires,
+        )
+        if taken:
+            record.refresh_from_db()
+            return record, True
+
+
+def idempotent(view):
+    """
+    Honour the Idempotency-Key header on a DRF view method.
+
+    The view isn't run in a transaction, so an upload doesn't keep its
+    connection idle in one while the body streams in, and the response is
+    stored once the view returns. Views should make their writes atomic
+    themselves. If the process dies before the response is stored, the key
+    is taken over after IDEMPOTENCY_LOCK_TIMEOUT and the request runs again.
+    """
+
+    @wraps(view)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            message = _("Ensure this value has at most %(max)d characters.")
+            raise exceptions.ValidationError(
+                {HEADER: message % {"max": MAX_KEY_LENGTH}}
+            )
+
+        held = None
+
+        def start(fingerprint):
+            """Claim the key, or raise to answer without running the view."""
+            nonlocal held
+            record, claimed = claim(request.user, key, fingerprint)
+            if not claimed:
+                if bytes(record.fingerprint) != fingerprint:
+                    raise IdempotencyKeyReused()
+                if record.status_code is None:
+                    raise RequestInProgress()
+                raise Replay(record)
+            # Filtering on `started` leaves the key alone if a retry has
+            # taken it over since.
+            held = IdempotencyKey.objects.filter(
+                pk=record.pk, started=record.started
+            )
+
+        digest = request_digest(request)
+        try:
+            if request.content_type.startswith("multipart/"):
+                # Claimed when the view has the body parsed, behind the
+                # upload handlers it adds itself.
+                request.upload_handlers.insert(
+                    0, FingerprintUploadHandler(request, digest, start)
+                )
+            else:
+                start(digest.digest())
+            response = view(self, request, *args, **kwargs)
+        except Replay as replay:
+            return Response(
+                replay.record.response,
+                status=replay.record.status_code,
+                headers={"Idempotent-Replayed": "true"},
+            )
+        except BaseException:
+            if held is not None:
+                held.delete()
+            raise
+        if held is None:
+            # Answered without parsing the body.
+            return response
+        if response.status_code < 400:
+            held.update(
+                status_code=response.status_code, response=response.data
+            )
+        else:
+            held.delete()
+        return response
+
+    return wrapper
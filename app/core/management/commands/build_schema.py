@@ -0,0 +1,30 @@
+"""
+Django command that builds the OpenAPI schema artifacts.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.schema import artifact_path, build_schema, code_version
+
+
+class Command(BaseCommand):
+    """Django command to prebuild the schema served at /api/schema/."""
+
+    help = "Build the OpenAPI schema for the current code version."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild even if this version has already been built.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        artifacts = build_schema(force=options["force"])
+        version = code_version()
+        for format, artifact in artifacts.items():
+            self.stdout.write(
+                f"{artifact_path(version, format)} ETag {artifact.etag}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Built schema {version}."))
@@ -0,0 +1,48 @@
+"""
+Django command that deletes expired idempotency keys.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """Django command to delete expired idempotency keys in batches."""
+
+    help = "Delete expired idempotency keys and their stored responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of keys deleted per statement.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        # Batched through the expiry index like purge_tokens, so no lock
+        # is held for long.
+        expired = IdempotencyKey.objects.filter(expires__lte=timezone.now())
+        total = 0
+        while True:
+            batch = list(
+                expired.values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            IdempotencyKey.objects.filter(pk__in=batch).delete()
+            total += len(batch)
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} keys."))
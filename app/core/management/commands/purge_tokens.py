@@ -0,0 +1,49 @@
+"""
+Django command that deletes expired auth tokens.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import AuthToken
+
+
+class Command(BaseCommand):
+    """Django command to delete expired auth tokens in batches."""
+
+    help = "Delete expired auth tokens in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of tokens deleted per statement.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between batches.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        # Each batch is picked through the expiry index and deleted by
+        # primary key in its own short statement, so no lock is held for
+        # long and other writes can interleave.
+        expired = AuthToken.objects.filter(expires__lte=timezone.now())
+        total = 0
+        while True:
+            batch = list(
+                expired.values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            AuthToken.objects.filter(pk__in=batch).delete()
+            total += len(batch)
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} tokens."))
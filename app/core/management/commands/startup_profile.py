@@ -0,0 +1,84 @@
+"""
+Django command that reports import times of a worker boot.
+"""
+
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(output):
+    """
+    Return (module, self_us, cumulative_us) rows from `-X importtime`
+    output, in import order.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # The header line.
+        rows.append(
+            (fields[2].strip(), int(fields[0]), int(fields[1]))
+        )
+    return rows
+
+
+def profile_imports(module):
+    """Import a module in a fresh interpreter and return its import times."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=settings.BASE_DIR,
+    )
+    if result.returncode:
+        raise CommandError(
+            f"Importing {module} failed:\n{result.stderr.strip()}"
+        )
+    return parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    """Django command to find the slowest imports of a worker boot."""
+
+    help = (
+        "Import a module (app.wsgi by default) in a fresh interpreter and "
+        "report the slowest imports, as measured by -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", default="app.wsgi")
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=25,
+            help="Number of modules to list.",
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["self", "cumulative"],
+            default="self",
+            help="Sort by time spent in the module itself or in total.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        rows = profile_imports(options["module"])
+        total = sum(self_us for _, self_us, _ in rows)
+        column = 1 if options["sort"] == "self" else 2
+        rows.sort(key=lambda row: row[column], reverse=True)
+
+        self.stdout.write(
+            f"Imported {options['module']}: {len(rows)} modules "
+            f"in {total / 1000:.1f} ms"
+        )
+        self.stdout.write(f"{'self ms':>10}{'cumulative ms':>15}  module")
+        for module, self_us, cumulative_us in rows[: options["limit"]]:
+            self.stdout.write(
+                f"{self_us / 1000:>10.1f}{cumulative_us / 1000:>15.1f}  "
+                f"{module}"
+            )
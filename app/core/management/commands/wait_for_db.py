@@ -2,25 +2,77 @@
 Django command that waits for db to be available.
 """
 
-from typing import Any
-from django.core.management.base import BaseCommand
 import time
-from psycopg2 import OperationalError as Psycopg2Error
-from django.db.utils import OperationalError
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import DatabaseError
+
+from core.health import backoff, pending_migrations, ping
 
 
 class Command(BaseCommand):
     """Django command to wait for db."""
 
+    help = (
+        "Wait until the database accepts queries, retrying with exponential "
+        "backoff, and optionally until its migrations are applied."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=60,
+            help="Seconds to wait before giving up, 0 to wait forever.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds before the first retry.",
+        )
+        parser.add_argument(
+            "--max-interval",
+            type=float,
+            default=5,
+            help="Longest delay between retries.",
+        )
+        parser.add_argument(
+            "--migrations",
+            action="store_true",
+            help="Also wait until every migration is applied.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def problem(self, options):
+        """Return why the database isn't ready, or None if it is."""
+        try:
+            ping(options["database"])
+            if options["migrations"]:
+                pending = pending_migrations(options["database"])
+                if pending:
+                    return f"{len(pending)} migrations pending"
+        except DatabaseError as exc:
+            return str(exc).strip() or exc.__class__.__name__
+        return None
+
     def handle(self, *args: Any, **options: Any) -> str | None:
         """Entry point for command."""
         self.stdout.write("Waiting for database...")
-        db_is_up = False
-        while not db_is_up:
-            try:
-                self.check(databases=["default"])
-                db_is_up = True
-            except (Psycopg2Error, OperationalError):
-                self.stdout.write("Database unavailabale, waiting 1 second...")
-                time.sleep(1)
-        self.stdout.write(self.style.SUCCESS("Database availabale!"))
+        timeout = options["timeout"]
+        deadline = time.monotonic() + timeout
+        delays = backoff(options["interval"], options["max_interval"])
+        while problem := self.problem(options):
+            delay = next(delays)
+            if timeout and time.monotonic() + delay > deadline:
+                raise CommandError(
+                    f"Database unavailable after {timeout:g}s: {problem}"
+                )
+            self.stdout.write(
+                f"Database unavailable ({problem}), "
+                f"retrying in {delay:.1f}s..."
+            )
+            time.sleep(delay)
+        self.stdout.write(self.style.SUCCESS("Database available!"))
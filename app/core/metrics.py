@@ -0,0 +1,348 @@
+"""
+Counters, gauges and histograms exposed in the Prometheus text format.
+
+Counters and histograms are recorded into a dict owned by the current
+thread, so recording takes no lock; they're summed when collected. The
+dicts of threads that have exited are merged into one for the process, so
+short-lived threads don't pile up. Gauges are set per process, usually by
+collectors run at collection time.
+
+With METRICS_DIR set, each process also writes its values to a file there
+every METRICS_FLUSH_INTERVAL seconds, and collect() adds up the files of
+every worker. Counter and histogram files of exited workers are kept so
+totals don't go backwards; their gauges are dropped. The directory should
+be emptied when the deployment restarts.
+"""
+
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+)
+
+_registry = {}
+_collectors = []
+_local = threading.local()
+# (thread, values) for each thread that has recorded values.
+_thread_values = []
+# Values of threads that have exited.
+_retired = {}
+_gauges = {}
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _registry[name] = self
+
+    def key(self, labels):
+        return (self.name, tuple(str(labels[label]) for label in self.labels))
+
+
+class Counter(Metric):
+    """A total that only goes up."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        values = thread_values()
+        key = self.key(labels)
+        values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A per-process value that's set, summed across processes."""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        _gauges[self.key(labels)] = value
+
+
+class Histogram(Metric):
+    """Counts of observed values by bucket, with their sum."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        values = thread_values()
+        key = self.key(labels)
+        counts = values.get(key)
+        if counts is None:
+            # A count per bucket, then +Inf, then the sum.
+            counts = values[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds the block takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+def thread_values():
+    """Return the current thread's counter and histogram values."""
+    try:
+        return _local.values
+    except AttributeError:
+        values = _local.values = {}
+        with _lock:
+            retire_threads()
+            _thread_values.append((threading.current_thread(), values))
+        return values
+
+
+def retire_threads():
+    """
+    Merge the values of exited threads into the process's. Call with the
+    lock held.
+    """
+    alive = []
+    for thread, values in _thread_values:
+        if thread.is_alive():
+            alive.append((thread, values))
+        else:
+            merge(_retired, list(values.items()))
+    _thread_values[:] = alive
+
+
+def register_collector(collector):
+    """Call `collector()` before collecting, to set gauges."""
+    _collectors.append(collector)
+    return collector
+
+
+def reset():
+    """Forget every recorded value of this process."""
+    global _local, _last_flush
+    with _lock:
+        _local = threading.local()
+        _thread_values.clear()
+        _retired.clear()
+        _gauges.clear()
+        _last_flush = 0.0
+
+
+# A forked worker starts from zero rather than counting its parent's values
+# a second time.
+os.register_at_fork(after_in_child=reset)
+
+
+def merge(into, values):
+    for key, value in values:
+        current = into.get(key)
+        if current is None:
+            into[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            for index, count in enumerate(value):
+                current[index] += count
+        else:
+            into[key] = current + value
+
+
+def snapshot():
+    """Return this process's (values, gauges)."""
+    for collector in _collectors:
+        collector()
+    values = {}
+    with _lock:
+        retire_threads()
+        merge(values, list(_retired.items()))
+        thread_values = [recorded for _, recorded in _thread_values]
+    for thread in thread_values:
+        # list() copies without running Python code, so it's safe while
+        # the owning thread records.
+        merge(values, list(thread.items()))
+    return values, dict(_gauges)
+
+
+def process_file(pid):
+    return Path(settings.METRICS_DIR) / f"metrics-{pid}.json"
+
+
+def flush():
+    """Write this process's values to METRICS_DIR."""
+    global _last_flush
+    values, gauges = snapshot()
+    data = {
+        "values": [[name, labels, v] for (name, labels), v in values.items()],
+        "gauges": [[name, labels, v] for (name, labels), v in gauges.items()],
+    }
+    path = process_file(os.getpid())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+    _last_flush = time.monotonic()
+
+
+def maybe_flush():
+    """Flush if METRICS_DIR is set and the last flush is old enough."""
+    if (
+        settings.METRICS_DIR
+        and time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL
+    ):
+        flush()
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def load_samples(rows):
+    return [((name, tuple(labels)), value) for name, labels, value in rows]
+
+
+def collect():
+    """Return the (values, gauges) of every process."""
+    if not settings.METRICS_DIR:
+        return snapshot()
+    flush()
+    values, gauges = {}, {}
+    for path in Path(settings.METRICS_DIR).glob("metrics-*.json"):
+        try:
+            data = json.loads(path.read_text())
+            pid = int(path.stem.removeprefix("metrics-"))
+        except (OSError, ValueError):
+            continue
+        merge(values, load_samples(data["values"]))
+        if is_alive(pid):
+            merge(gauges, load_samples(data["gauges"]))
+    return values, gauges
+
+
+def escape(value):
+    return (
+        value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    values, gauges = collect()
+    samples = {}
+    for (name, labels), value in [*values.items(), *gauges.items()]:
+        samples.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name, metric in sorted(_registry.items()):
+        if name not in samples:
+            continue
+        lines.append(f"# HELP {name} {escape(metric.help)}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        for labels, value in sorted(samples[name]):
+            if metric.type != "histogram":
+                lines.append(
+                    f"{name}{format_labels(metric.labels, labels)} "
+                    f"{format_value(value)}"
+                )
+                continue
+            cumulative = 0
+            bounds = [*map(format_value, metric.buckets), "+Inf"]
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                label_text = format_labels(
+                    metric.labels, labels, [("le", bound)]
+                )
+                lines.append(f"{name}_bucket{label_text} {cumulative}")
+            label_text = format_labels(metric.labels, labels)
+            lines.append(f"{name}_sum{label_text} {format_value(value[-1])}")
+            lines.append(f"{name}_count{label_text} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to respond to a request.",
+    ["view", "method"],
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Requests answered.",
+    ["view", "method", "status"],
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of non-streaming response bodies, as sent.",
+    ["view"],
+    buckets=SIZE_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_seconds",
+    "Time a request spent running SQL queries, with METRICS_DB_TIME.",
+    ["view"],
+)
+REQUEST_APP_DURATION = Histogram(
+    "http_request_app_seconds",
+    "Time to respond to a request minus its time in SQL queries, with "
+    "METRICS_DB_TIME.",
+    ["view"],
+)
+RENDER_DURATION = Histogram(
+    "api_render_seconds",
+    "Time to render API data to JSON.",
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by cache and the tier that answered, or miss.",
+    ["cache", "result"],
+)
+THROTTLED = Counter(
+    "http_requests_throttled_total",
+    "Requests refused by a throttle, by throttle scope.",
+    ["scope"],
+)
+IMAGE_DURATION = Histogram(
+    "image_processing_seconds",
+    "Time to validate and store uploaded images.",
+    ["step"],
+)
@@ -0,0 +1,519 @@
+"""
+Middleware shared by the whole project.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+from core import metrics
+from core.db.profiling import aprofile_queries, profile_queries
+from core.db.routers import use_replica
+
+query_logger = logging.getLogger("core.queries")
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        # wbits=31 writes a gzip header and trailer around the deflate data.
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdCompressor
+
+
+def parse_accept_encoding(header):
+    """Return a dict of the codings in an Accept-Encoding header by q."""
+    codings = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header):
+    """
+    Return the content coding to use for an Accept-Encoding header, or None.
+
+    The client's highest q value wins, and ties go to the first coding in
+    COMPRESSION_ENCODINGS.
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in settings.COMPRESSION_ENCODINGS:
+        if encoding not in COMPRESSORS:
+            continue
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type):
+    """Return whether a content type is worth compressing."""
+    media_type = content_type.partition(";")[0].strip().lower()
+    if media_type in settings.COMPRESSION_EXCLUDED_TYPES:
+        return False
+    return media_type.startswith("text/") or media_type.endswith(
+        ("json", "xml", "javascript")
+    )
+
+
+def compress_chunks(compressor, chunks):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_chunks(compressor, chunks):
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with brotli, zstd or gzip.
+
+    The coding is negotiated from Accept-Encoding; brotli and zstd are used
+    when their packages are installed. Only text, JSON, XML and JavaScript
+    bodies of at least COMPRESSION_MIN_SIZE bytes are compressed, so images
+    and other already compressed media pass through untouched. Streaming
+    responses are compressed chunk by chunk as they're sent.
+
+    Against BREACH, responses that may hold a secret next to reflected
+    input are left alone: any response that rendered a CSRF token, and the
+    HTML pages under ROUTED_MIDDLEWARE_PATHS.
+    """
+
+    def has_secrets(self, request, response):
+        """Return whether compressing the response could leak a secret."""
+        if request.META.get("CSRF_COOKIE_NEEDS_UPDATE"):
+            return True
+        return request.path_info.startswith(
+            tuple(settings.ROUTED_MIDDLEWARE_PATHS)
+        ) and response.get("Content-Type", "").startswith("text/html")
+
+    def process_response(self, request, response):
+        if (
+            response.has_header("Content-Encoding")
+            or response.status_code in (204, 206, 304)
+            or not is_compressible(response.get("Content-Type", ""))
+            or "no-transform" in response.get("Cache-Control", "")
+            # The front server sends the body of these.
+            or response.has_header("X-Sendfile")
+            or response.has_header("X-Accel-Redirect")
+            or self.has_secrets(request, response)
+        ):
+            return response
+        if response.streaming:
+            length = response.get("Content-Length")
+            if length and int(length) < settings.COMPRESSION_MIN_SIZE:
+                return response
+        elif len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            return response
+        compressor = COMPRESSORS[encoding](
+            settings.COMPRESSION_LEVELS[encoding]
+        )
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_chunks(
+                    compressor, response.streaming_content
+                )
+            else:
+                response.streaming_content = compress_chunks(
+                    compressor, response.streaming_content
+                )
+            del response.headers["Content-Length"]
+        else:
+            content = compressor.compress(response.content)
+            content += compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers["Content-Length"] = str(len(content))
+
+        # The compressed body differs from the identity one, so a strong
+        # ETag must become weak (RFC 9110, 8.8.1).
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    Send rate limit headers for requests checked by core.throttling.
+
+    RateLimit-Limit, RateLimit-Remaining and RateLimit-Reset, as in the
+    IETF draft for rate limit fields, describe the most restrictive bucket
+    the request was checked against, and RateLimit-Policy its rate.
+    Refused requests get a Retry-After.
+    """
+
+    def process_response(self, request, response):
+        result = getattr(request, "rate_limit", None)
+        if result is None:
+            return response
+        response.headers["RateLimit-Limit"] = str(result.limit)
+        response.headers["RateLimit-Remaining"] = str(result.remaining)
+        response.headers["RateLimit-Reset"] = str(math.ceil(result.reset))
+        response.headers["RateLimit-Policy"] = (
+            f"{result.limit};w={result.period}"
+        )
+        if response.status_code == 429 and not response.has_header(
+            "Retry-After"
+        ):
+            response.headers["Retry-After"] = str(math.ceil(result.wait))
+        return response
+
+
+class RoutedMiddleware:
+    """
+    Run ROUTED_MIDDLEWARE only for requests under ROUTED_MIDDLEWARE_PATHS.
+
+    The admin and the API docs need sessions, CSRF protection, the
+    authenticated user and messages. The token authenticated API needs
+    none of them, so its requests skip that stack. The routed middleware
+    must support both sync and async use, like MiddlewareMixin does, and
+    only their process_view() hooks are supported.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(settings.ROUTED_MIDDLEWARE_PATHS)
+        self.middleware = []
+        handler = get_response
+        for middleware_path in reversed(settings.ROUTED_MIDDLEWARE):
+            handler = import_string(middleware_path)(handler)
+            self.middleware.insert(0, handler)
+        self.routed_response = handler
+        self.view_middleware = [
+            middleware.process_view
+            for middleware in self.middleware
+            if hasattr(middleware, "process_view")
+        ]
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_routed(self, request):
+        return request.path_info.startswith(self.paths)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.is_routed(request):
+            return self.routed_response(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_routed(request):
+            return await self.routed_response(request)
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_routed(request):
+            return None
+        for process_view in self.view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Read from replicas for GET, HEAD and OPTIONS requests.
+
+    A client that writes is pinned to the primary for REPLICA_PIN_SECONDS,
+    so its next reads see its own changes even if the replicas lag.
+    Clients are told apart by their Authorization header, or by their
+    session cookie for the admin. Pins are stored in the
+    REPLICA_PIN_CACHE_ALIAS cache, which must be shared by every worker.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def pin_key(self, request):
+        """Return the cache key pinning the client, or None if anonymous."""
+        client = request.META.get("HTTP_AUTHORIZATION") or (
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        if not client:
+            return None
+        digest = hashlib.sha256(client.encode()).hexdigest()
+        return "replica-pin:" + digest
+
+    def is_write(self, request, response):
+        return request.method not in SAFE_METHODS and (
+            response.status_code < 400
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+        key = self.pin_key(request)
+        replica = request.method in SAFE_METHODS and not (
+            key and cache.get(key)
+        )
+        with use_replica(replica):
+            response = self.get_response(request)
+        if key and self.is_write(request, response):
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        cache = caches[settings.REPLICA_PIN_CACHE_ALIAS]
+        key = self.pin_key(request)
+        replica = request.method in SAFE_METHODS and not (
+            key and await cache.aget(key)
+        )
+        with use_replica(replica):
+            response = await self.get_response(request)
+        if key and self.is_write(request, response):
+            await cache.aset(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+
+class QueryProfilerMiddleware:
+    """
+    Profile the SQL queries of a sample of requests.
+
+    Enabled by QUERY_PROFILER_ENABLED, for QUERY_PROFILER_SAMPLE_RATE of
+    the requests. Profiled responses get a Server-Timing header with the
+    query count and database time. Requests over the
+    QUERY_PROFILER_SLOW_* thresholds are logged to "core.queries" as JSON,
+    with their slowest statements.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return random.random() < settings.QUERY_PROFILER_SAMPLE_RATE
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        start = time.perf_counter()
+        with profile_queries(settings.QUERY_PROFILER_SLOWEST) as profile:
+            response = self.get_response(request)
+        self.report(request, response, profile, start)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        start = time.perf_counter()
+        slowest = settings.QUERY_PROFILER_SLOWEST
+        async with aprofile_queries(slowest) as profile:
+            response = await self.get_response(request)
+        self.report(request, response, profile, start)
+        return response
+
+    def report(self, request, response, profile, start):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        db_ms = profile.duration * 1000
+        if settings.QUERY_PROFILER_SERVER_TIMING:
+            timing = f'db;dur={db_ms:.1f};desc="{profile.count} queries"'
+            if response.has_header("Server-Timing"):
+                timing = f"{response['Server-Timing']}, {timing}"
+            response["Server-Timing"] = timing
+        if (
+            db_ms >= settings.QUERY_PROFILER_SLOW_DB_MS
+            or profile.count >= settings.QUERY_PROFILER_SLOW_QUERY_COUNT
+        ):
+            query_logger.warning(
+                json.dumps(
+                    {
+                        "event": "slow_request",
+                        "method": request.method,
+                        "path": request.path,
+                        "status": response.status_code,
+                        "duration_ms": round(elapsed_ms, 3),
+                        "db_ms": round(db_ms, 3),
+                        "queries": profile.count,
+                        "slowest": profile.slowest(),
+                    }
+                )
+            )
+
+
+def view_label(request):
+    """
+    Return the view that handled a request, for metric labels.
+
+    Viewsets are labelled with their action, as in "RecipeViewSet.list".
+    """
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+    view = match.func
+    cls = getattr(view, "cls", None)
+    if cls is None:
+        return match.view_name or getattr(view, "__name__", "unknown")
+    action = (getattr(view, "actions", None) or {}).get(
+        request.method.lower()
+    )
+    return f"{cls.__name__}.{action}" if action else cls.__name__
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, status and size of responses by view. Enabled by
+    METRICS_ENABLED.
+
+    With METRICS_DB_TIME, their time in SQL queries is recorded too, along
+    with the rest of their time. That costs async requests two
+    sync_to_async() calls to install the query wrappers.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        if not settings.METRICS_DB_TIME:
+            response = self.get_response(request)
+            self.record(request, response, None, start)
+            return response
+        with profile_queries(keep=0) as profile:
+            response = self.get_response(request)
+        self.record(request, response, profile, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        if not settings.METRICS_DB_TIME:
+            response = await self.get_response(request)
+            self.record(request, response, None, start)
+            return response
+        async with aprofile_queries(keep=0) as profile:
+            response = await self.get_response(request)
+        self.record(request, response, profile, start)
+        return response
+
+    def record(self, request, response, profile, start):
+        elapsed = time.perf_counter() - start
+        view = view_label(request)
+        metrics.REQUEST_DURATION.observe(
+            elapsed, view=view, method=request.method
+        )
+        metrics.REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        if profile is not None:
+            metrics.REQUEST_DB_DURATION.observe(profile.duration, view=view)
+            metrics.REQUEST_APP_DURATION.observe(
+                max(elapsed - profile.duration, 0), view=view
+            )
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view=view)
+        metrics.maybe_flush()
@@ -1,10 +1,15 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import (
     AbstractBaseUser,
     PermissionsMixin,
     BaseUserManager,
 )
 from django.conf import settings
+from django.utils import timezone
+import hashlib
+import secrets
 import uuid
 import os
 
@@ -17,6 +22,11 @@ def recipe_image_file_path(instance, i_file_name):
     return os.path.join("uploads", "recipe", file_name)
 
 
+def hash_token(key):
+    """Return the digest an auth token is stored and looked up by."""
+    return hashlib.sha256(key.encode()).digest()
+
+
 # Create your models here.
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **fields):
@@ -71,10 +81,36 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField("Ingredient")
     # in upload_to we specify a function that allows us to generate a PathName
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Bumped by every change through the API, see bump_version().
+    version = models.PositiveIntegerField(default=1)
 
     def __str__(self) -> str:
         return self.title
 
+    def bump_version(self, expected=None):
+        """
+        Move the recipe to its next version before changing it.
+
+        The conditional UPDATE ... WHERE version = ... also locks the row
+        until the transaction ends, so concurrent changes can't interleave.
+        Returns False if the recipe isn't at the `expected` version any
+        more. Without `expected` the last write wins.
+        """
+        if expected is not None and expected != self.version:
+            return False
+        recipes = Recipe.objects.filter(pk=self.pk)
+        if recipes.filter(version=self.version).update(
+            version=self.version + 1
+        ):
+            self.version += 1
+            return True
+        if expected is not None:
+            return False
+        # Changed since this instance was loaded.
+        recipes.update(version=F("version") + 1)
+        self.refresh_from_db(fields=["version"])
+        return True
+
 
 class Tag(models.Model):
     """Tags model for filtering recipes."""
@@ -96,3 +132,90 @@ class Ingredient(models.Model):
 
     def __str__(self) -> str:
         return self.name
+
+
+class AuthTokenManager(models.Manager):
+    def issue(self, user, device=""):
+        """
+        Create a token for a user's device, replacing any older one.
+
+        Returns the token and its key. Only a digest of the key is stored,
+        so the key can't be recovered later.
+        """
+        key = secrets.token_urlsafe(32)
+        with transaction.atomic(using=self.db):
+            # Concurrent logins from one device wait for each other here,
+            # instead of both inserting a token for it.
+            User.objects.using(self.db).select_for_update().filter(
+                pk=user.pk
+            ).values_list("pk").get()
+            self.filter(user=user, device=device).delete()
+            token = self.create(
+                user=user,
+                device=device,
+                digest=hash_token(key),
+                expires=timezone.now() + settings.AUTH_TOKEN_TTL,
+            )
+        return token, key
+
+
+class AuthToken(models.Model):
+    """Expiring API auth token, one per user and device."""
+
+    # The SHA-256 digest of the key, which keeps the lookup index compact.
+    digest = models.BinaryField(max_length=32, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="auth_tokens",
+        on_delete=models.CASCADE,
+    )
+    device = models.CharField(max_length=64, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+
+    objects = AuthTokenManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "device"], name="unique_user_device_token"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user} ({self.device or 'default'})"
+
+    @property
+    def is_expired(self):
+        return self.expires <= timezone.now()
+
+
+class IdempotencyKey(models.Model):
+    """
+    A request made with an Idempotency-Key header, and its response once
+    it has one, see core.idempotency.
+    """
+
+    # SHA-256 digests of the key and of the request keep the rows compact.
+    digest = models.BinaryField(max_length=32)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="idempotency_keys",
+        on_delete=models.CASCADE,
+    )
+    fingerprint = models.BinaryField(max_length=32)
+    # Both null while the request is in progress.
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    started = models.DateTimeField(default=timezone.now)
+    expires = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "digest"], name="unique_user_idempotency_key"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user} ({bytes(self.digest).hex()[:12]})"
@@ -0,0 +1,56 @@
+"""
+JSON renderer for the API, using orjson when it's installed.
+"""
+
+from rest_framework.utils import encoders
+from rest_framework.renderers import JSONRenderer
+
+from core import metrics
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+if orjson is not None:
+    # Datetimes go through DRF's encoder so they're formatted the same.
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+# Encodes what orjson can't (Decimal, datetime, lazy strings, ...).
+encode_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that renders with orjson.
+
+    Output is byte for byte the same as JSONRenderer's, except that NaN
+    and infinite floats render as null. Decimals, datetimes and the other
+    types DRF's encoder knows are encoded the same way. Falls back to
+    JSONRenderer when orjson isn't installed, for indented output (e.g. the
+    browsable API), and when UNICODE_JSON or COMPACT_JSON are turned off.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.RENDER_DURATION.time():
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (
+            orjson is None
+            or indent is not None
+            or self.ensure_ascii
+            or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        # Escape U+2028 and U+2029 like JSONRenderer does.
+        if b"\xe2\x80" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
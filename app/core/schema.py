@@ -0,0 +1,163 @@
+"""
+Prebuilt OpenAPI schema for /api/schema/.
+
+The schema only changes with the code, so it's generated once per code
+version into YAML and JSON artifacts. They're kept in memory and in
+SCHEMA_CACHE_DIR, where `manage.py build_schema` or the first process to
+start can write them for every later process to reuse.
+
+drf_spectacular's views and generator are only imported to build the
+schema, so loading artifacts at startup stays cheap. The view serving them
+is core.schema_views.CachedSpectacularAPIView.
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import django
+import drf_spectacular
+import rest_framework
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ["yaml", "json"]
+
+
+@dataclass(frozen=True)
+class SchemaArtifact:
+    """A rendered schema and its ETag."""
+
+    content: bytes
+    etag: str
+
+    @classmethod
+    def from_content(cls, content):
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        return cls(content, f'"{digest}"')
+
+
+@functools.cache
+def code_version():
+    """
+    Return the version of the running code.
+
+    APP_VERSION when it's set (e.g. the commit being deployed), otherwise a
+    hash of the library versions and of the size and mtime of every source
+    file.
+    """
+    if settings.APP_VERSION:
+        return settings.APP_VERSION
+    digest = hashlib.sha256()
+    for module in (django, rest_framework, drf_spectacular):
+        digest.update(f"{module.__name__}={module.__version__};".encode())
+    for path in sorted(Path(settings.BASE_DIR).rglob("*.py")):
+        stat = path.stat()
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(version, format):
+    return Path(settings.SCHEMA_CACHE_DIR) / f"openapi-{version}.{format}"
+
+
+def renderer_class(format):
+    """Return the schema view's renderer class for a format."""
+    from drf_spectacular.views import SpectacularAPIView
+
+    for renderer in SpectacularAPIView.renderer_classes:
+        if renderer.format == format:
+            return renderer
+    raise ValueError(f"Unknown schema format {format!r}.")
+
+
+def render_schema():
+    """Generate the schema and return its content by format."""
+    from drf_spectacular.views import SpectacularAPIView
+
+    generator = SpectacularAPIView.generator_class(
+        urlconf=SpectacularAPIView.urlconf
+    )
+    schema = generator.get_schema(
+        request=None, public=SpectacularAPIView.serve_public
+    )
+    return {
+        format: renderer_class(format)().render(schema, renderer_context={})
+        for format in FORMATS
+    }
+
+
+def write_artifact(path, content):
+    """Write a file atomically, so readers never see part of it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".schema-")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+_artifacts = {}
+_lock = threading.Lock()
+
+
+def build_schema(force=False):
+    """
+    Make sure the current version's artifacts are in memory and on disk,
+    generating them if needed, and return them by format.
+    """
+    version = code_version()
+    with _lock:
+        paths = {
+            format: artifact_path(version, format) for format in FORMATS
+        }
+        if not force and all(path.exists() for path in paths.values()):
+            contents = {
+                format: path.read_bytes() for format, path in paths.items()
+            }
+        else:
+            contents = render_schema()
+            for format, path in paths.items():
+                try:
+                    write_artifact(path, contents[format])
+                except OSError:
+                    logger.warning(
+                        "Could not write %s", path, exc_info=True
+                    )
+        for format, content in contents.items():
+            _artifacts[version, format] = SchemaArtifact.from_content(content)
+        return {format: _artifacts[version, format] for format in FORMATS}
+
+
+def get_schema_artifact(format):
+    """Return the current version's schema artifact for a format."""
+    artifact = _artifacts.get((code_version(), format))
+    if artifact is None:
+        artifact = build_schema()[format]
+    return artifact
+
+
+def build_on_startup():
+    """Load or build the schema as a server process starts."""
+    if not settings.SCHEMA_BUILD_ON_STARTUP:
+        return
+    try:
+        build_schema()
+    except Exception:
+        # The view builds it on first use instead.
+        logger.exception("Could not build the OpenAPI schema")
+
+
+def clear_cache():
+    """Forget the in-memory artifacts and code version."""
+    _artifacts.clear()
+    code_version.cache_clear()
@@ -0,0 +1,46 @@
+"""
+View serving the prebuilt OpenAPI schema.
+"""
+
+from django.http import HttpResponse, HttpResponseNotModified
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+from core.schema import get_schema_artifact
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """
+    SpectacularAPIView that serves the prebuilt schema, with an ETag.
+
+    Requests for another language, API version or indentation are generated
+    as usual.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if (
+            request.GET.get("lang")
+            or request.GET.get("version")
+            or self.api_version
+            or self.custom_settings
+            or "indent" in (request.accepted_media_type or "")
+        ):
+            return super().get(request, *args, **kwargs)
+
+        renderer = request.accepted_renderer
+        artifact = get_schema_artifact(renderer.format)
+        headers = {"ETag": artifact.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("If-None-Match", "")
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if artifact.etag in tags or "W/" + artifact.etag in tags:
+            return HttpResponseNotModified(headers=headers)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f"; charset={renderer.charset}"
+        filename = self._get_filename(request, None)
+        headers["Content-Disposition"] = f'inline; filename="{filename}"'
+        return HttpResponse(
+            artifact.content, content_type=content_type, headers=headers
+        )
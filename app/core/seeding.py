@@ -0,0 +1,294 @@
+"""
+Generate synthetic users, recipes, tags and ingredients in bulk.
+
+Used by the seed_data command and the benchmarks. The same seed always
+generates the same data.
+"""
+
+import io
+import random
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.utils.crypto import RANDOM_STRING_CHARS
+
+from core.models import Ingredient, Recipe, Tag
+
+DEFAULT_PASSWORD = "seed-password"
+DISTRIBUTION_RE = re.compile(
+    r"^(?:(?P<fixed>\d+)|(?P<low>\d+)-(?P<high>\d+)|exp:(?P<mean>[\d.]+))$",
+    re.ASCII,
+)
+
+WORDS = (
+    "apple basil bean beef butter carrot cheese chicken chili cream curry "
+    "egg garlic ginger honey lamb lemon lentil lime mushroom noodle onion "
+    "pasta pea pepper pork potato rice salmon spinach tofu tomato"
+).split()
+
+
+class Distribution:
+    """
+    A count drawn per user or per recipe: "N" for exactly N, "A-B" for a
+    uniform count between A and B, or "exp:M" for a long tail averaging M.
+    """
+
+    def __init__(self, spec):
+        self.spec = str(spec)
+        match = DISTRIBUTION_RE.match(self.spec)
+        if not match:
+            raise ValueError(
+                f"Invalid distribution {spec!r}, use N, A-B or exp:MEAN."
+            )
+        self.fixed = self.mean = None
+        if match["fixed"] is not None:
+            self.fixed = int(match["fixed"])
+        elif match["mean"] is not None:
+            try:
+                self.mean = float(match["mean"])
+            except ValueError:
+                self.mean = 0
+            if self.mean <= 0:
+                raise ValueError(
+                    f"Invalid distribution {spec!r}, the mean must be a "
+                    "number above 0."
+                )
+        else:
+            self.low, self.high = int(match["low"]), int(match["high"])
+            if self.low > self.high:
+                raise ValueError(
+                    f"Invalid distribution {spec!r}, A can't be above B."
+                )
+
+    def __repr__(self):
+        return f"Distribution({self.spec!r})"
+
+    def sample(self, rng):
+        if self.fixed is not None:
+            return self.fixed
+        if self.mean is not None:
+            return round(rng.expovariate(1 / self.mean))
+        return rng.randint(self.low, self.high)
+
+
+def email_for(index, prefix="seed"):
+    """Return the email of the `index`th generated user."""
+    return f"{prefix}{index}@example.com"
+
+
+def reserve_ids(connection, model, count):
+    """Take `count` primary keys from a PostgreSQL table's sequence."""
+    table = model._meta.db_table
+    column = model._meta.pk.column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) "
+            "FROM generate_series(1, %s)",
+            [table, column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def copy_value(value):
+    """Format a value for COPY's text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_objects(connection, model, objs):
+    """Insert model instances with COPY, setting their primary keys."""
+    fields = model._meta.concrete_fields
+    for obj, pk in zip(objs, reserve_ids(connection, model, len(objs))):
+        obj.pk = pk
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write(
+            "\t".join(
+                copy_value(
+                    f.get_db_prep_save(getattr(obj, f.attname), connection)
+                )
+                for f in fields
+            )
+        )
+        buffer.write("\n")
+    buffer.seek(0)
+    columns = ", ".join(
+        connection.ops.quote_name(f.column) for f in fields
+    )
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {table} ({columns}) FROM STDIN", buffer
+        )
+    return objs
+
+
+class Writer:
+    """Insert model instances with bulk_create, or COPY on PostgreSQL."""
+
+    def __init__(self, using, use_copy, batch_size):
+        self.using = using
+        self.connection = connections[using]
+        self.use_copy = use_copy and self.connection.vendor == "postgresql"
+        self.batch_size = batch_size
+
+    def insert(self, model, objs):
+        if not objs:
+            return objs
+        if self.use_copy:
+            return copy_objects(self.connection, model, objs)
+        return model.objects.using(self.using).bulk_create(
+            objs, batch_size=self.batch_size
+        )
+
+
+def generate(
+    users,
+    recipes="10",
+    tags="10",
+    ingredients="20",
+    tags_per_recipe="0-3",
+    ingredients_per_recipe="2-8",
+    seed=0,
+    password=DEFAULT_PASSWORD,
+    prefix="seed",
+    batch_size=5000,
+    use_copy=True,
+    using="default",
+    progress=None,
+):
+    """
+    Create `users` users with recipes, tags and ingredients drawn from
+    the given distributions, and return the number of rows per model.
+
+    Every user gets the same password, hashed once. Users are written in
+    chunks of about `batch_size` recipes; `progress(users_done)` is
+    called after each chunk.
+    """
+    recipes, tags, ingredients = map(
+        Distribution, [recipes, tags, ingredients]
+    )
+    tags_per_recipe = Distribution(tags_per_recipe)
+    ingredients_per_recipe = Distribution(ingredients_per_recipe)
+    rng = random.Random(seed)
+    # A salt drawn from the seed keeps the data identical between runs.
+    salt_rng = random.Random(f"salt{seed}")
+    salt = "".join(salt_rng.choices(RANDOM_STRING_CHARS, k=22))
+    password_hash = make_password(password, salt=salt)
+    writer = Writer(using, use_copy, batch_size)
+    User = get_user_model()
+    counts = {"users": 0, "recipes": 0, "tags": 0, "ingredients": 0}
+    counts.update(recipe_tags=0, recipe_ingredients=0)
+
+    index = 0
+    while index < users:
+        # Draw a chunk of users and their content.
+        chunk = []
+        chunk_recipes = 0
+        while index < users and chunk_recipes < batch_size:
+            user = User(
+                email=email_for(index, prefix),
+                name=f"Seed user {index}",
+                password=password_hash,
+            )
+            tag_names = [
+                f"{rng.choice(WORDS)} {n}" for n in range(tags.sample(rng))
+            ]
+            ingredient_names = [
+                f"{rng.choice(WORDS)} {n}"
+                for n in range(ingredients.sample(rng))
+            ]
+            user_recipes = []
+            for n in range(recipes.sample(rng)):
+                recipe = Recipe(
+                    title=f"{rng.choice(WORDS).title()} "
+                    f"{rng.choice(WORDS)} {n}",
+                    time_minutes=rng.randint(5, 180),
+                    price=Decimal(rng.randint(100, 9999)) / 100,
+                    description=" ".join(rng.choices(WORDS, k=12)),
+                )
+                recipe_tags = rng.sample(
+                    range(len(tag_names)),
+                    min(tags_per_recipe.sample(rng), len(tag_names)),
+                )
+                recipe_ingredients = rng.sample(
+                    range(len(ingredient_names)),
+                    min(
+                        ingredients_per_recipe.sample(rng),
+                        len(ingredient_names),
+                    ),
+                )
+                user_recipes.append(
+                    (recipe, recipe_tags, recipe_ingredients)
+                )
+            chunk.append((user, tag_names, ingredient_names, user_recipes))
+            chunk_recipes += len(user_recipes)
+            index += 1
+
+        with transaction.atomic(using=using):
+            write_chunk(writer, chunk, counts)
+        if progress is not None:
+            progress(index)
+    return counts
+
+
+def write_chunk(writer, chunk, counts):
+    """Insert a chunk of generated users and everything they own."""
+    users = writer.insert(get_user_model(), [user for user, *_ in chunk])
+
+    tags, ingredients, recipes = [], [], []
+    for user, tag_names, ingredient_names, user_recipes in chunk:
+        tags.extend(Tag(user_id=user.pk, name=name) for name in tag_names)
+        ingredients.extend(
+            Ingredient(user_id=user.pk, name=name)
+            for name in ingredient_names
+        )
+        for recipe, _, _ in user_recipes:
+            recipe.user_id = user.pk
+            recipes.append(recipe)
+    writer.insert(Tag, tags)
+    writer.insert(Ingredient, ingredients)
+    writer.insert(Recipe, recipes)
+
+    RecipeTag = Recipe.tags.through
+    RecipeIngredient = Recipe.ingredients.through
+    recipe_tags, recipe_ingredients = [], []
+    tag_offset = ingredient_offset = 0
+    for _, tag_names, ingredient_names, user_recipes in chunk:
+        for recipe, tag_indexes, ingredient_indexes in user_recipes:
+            recipe_tags.extend(
+                RecipeTag(
+                    recipe_id=recipe.pk, tag_id=tags[tag_offset + i].pk
+                )
+                for i in tag_indexes
+            )
+            recipe_ingredients.extend(
+                RecipeIngredient(
+                    recipe_id=recipe.pk,
+                    ingredient_id=ingredients[ingredient_offset + i].pk,
+                )
+                for i in ingredient_indexes
+            )
+        tag_offset += len(tag_names)
+        ingredient_offset += len(ingredient_names)
+    writer.insert(RecipeTag, recipe_tags)
+    writer.insert(RecipeIngredient, recipe_ingredients)
+
+    counts["users"] += len(users)
+    counts["tags"] += len(tags)
+    counts["ingredients"] += len(ingredients)
+    counts["recipes"] += len(recipes)
+    counts["recipe_tags"] += len(recipe_tags)
+    counts["recipe_ingredients"] += len(recipe_ingredients)
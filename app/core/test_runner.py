@@ -0,0 +1,18 @@
+"""
+Test runner for the project.
+"""
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the tests with request throttling turned off, since every test
+    client request comes from the same address. Throttling tests turn it
+    back on with override_settings(THROTTLE_ENABLED=True).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.THROTTLE_ENABLED = False
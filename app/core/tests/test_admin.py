@@ -1,9 +1,17 @@
 """Test for Django admin modification."""
 
+from io import BytesIO
+
+from django.contrib import admin
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
-from django.test import TestCase
+from django.test import RequestFactory, TestCase, override_settings
 from django.test import Client
 from django.contrib.auth import get_user_model
+from PIL import Image
+
+from core.models import Recipe
+from recipe.uploads import pillow
 
 
 class AdminSiteTests(TestCase):
@@ -41,3 +49,21 @@ class AdminSiteTests(TestCase):
         url = reverse("admin:core_user_add")
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=50)
+    def test_recipe_image_pixel_limit(self):
+        """Test recipe images uploaded in the admin get the pixel limit."""
+        # Reapply the real limit once the settings are restored.
+        self.addCleanup(pillow)
+        self.addCleanup(pillow.cache_clear)
+        pillow.cache_clear()
+        buffer = BytesIO()
+        Image.new("RGB", (20, 20)).save(buffer, format="PNG")
+        image = SimpleUploadedFile("image.png", buffer.getvalue())
+        request = RequestFactory().get("/")
+        request.user = self.admin_user
+        form_class = admin.site._registry[Recipe].get_form(request)
+
+        form = form_class(data={}, files={"image": image})
+
+        self.assertIn("image", form.errors)
@@ -2,49 +2,206 @@
 Test custom created django management command
 """
 
+import random
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
-from psycopg2 import OperationalError as Psycopg2Error
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from core.models import AuthToken, IdempotencyKey, Recipe, Tag
+from core.seeding import Distribution, copy_value
 
 
-# path of command to mock
-# check method that will allow to check the status of the db
-@patch("core.management.commands.wait_for_db.Command.check")
+@patch("core.management.commands.wait_for_db.ping")
 class CommandTests(SimpleTestCase):
     """Test custom command."""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_ping):
         """Test waiting for database if ready."""
-        patched_check.return_value = True
+        patched_ping.return_value = None
 
-        call_command("wait_for_db")
-        patched_check.assert_called_once_with(databases=["default"])
+        call_command("wait_for_db", stdout=StringIO())
+        patched_ping.assert_called_once_with("default")
 
     @patch("time.sleep")
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_ping):
         """Test wait for database when getting OperationalError."""
-        expected_list = [Psycopg2Error] * 2 + [OperationalError] * 3 + [True]
-        patched_check.side_effect = expected_list
-
-        call_command("wait_for_db")
-        self.assertEqual(patched_check.call_count, 6)  # 6 calls
-        patched_check.assert_called_with(databases=["default"])
-
-
-# When mokcing an object - we want in some cases to raise an exception
-# the side_effect allows to pass different values that can be handled
-# differently based on their type,
-# Here we pass the exception so the library will pass these exceptions
-# in the same order it has received them.
-
-# in the first stage - postgres havent started yet,
-# not ready to accept connections
-# After , the db is ready to accept connections but is not set up
-# and ready. In total - the first 2 calls -
-# we expect the Psycopg2 error
-# In the last 3 times the OpertationalError indicated the db
-# is not ready yet
-# We expect in the sixth time to recieve a true value indication
-# it is ready
+        patched_ping.side_effect = [OperationalError] * 5 + [None]
+
+        call_command("wait_for_db", stdout=StringIO())
+        self.assertEqual(patched_ping.call_count, 6)  # 6 calls
+        patched_ping.assert_called_with("default")
+
+    @patch("time.sleep")
+    def test_wait_for_db_backoff(self, patched_sleep, patched_ping):
+        """Test retries back off exponentially up to --max-interval."""
+        patched_ping.side_effect = [OperationalError] * 5 + [None]
+
+        with patch("random.uniform", side_effect=lambda a, b: b):
+            call_command(
+                "wait_for_db",
+                interval=1,
+                max_interval=5,
+                timeout=0,
+                stdout=StringIO(),
+            )
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(delays, [1, 2, 4, 5, 5])
+
+    @patch("time.sleep")
+    def test_wait_for_db_timeout(self, patched_sleep, patched_ping):
+        """Test the command gives up after --timeout."""
+        patched_ping.side_effect = OperationalError("refused")
+
+        with patch("time.monotonic", side_effect=range(0, 100, 1)):
+            with self.assertRaisesMessage(
+                CommandError, "Database unavailable after 3s: refused"
+            ):
+                call_command(
+                    "wait_for_db", interval=1, timeout=3, stdout=StringIO()
+                )
+
+    @patch("time.sleep")
+    @patch("core.management.commands.wait_for_db.pending_migrations")
+    def test_wait_for_migrations(
+        self, patched_pending, patched_sleep, patched_ping
+    ):
+        """Test --migrations waits until no migration is pending."""
+        patched_pending.side_effect = [[("core", "0009_latest")], []]
+        out = StringIO()
+
+        call_command("wait_for_db", migrations=True, stdout=out)
+
+        self.assertEqual(patched_pending.call_count, 2)
+        self.assertIn("1 migrations pending", out.getvalue())
+
+
+class PurgeTokensCommandTests(TestCase):
+    """Test the purge_tokens command."""
+
+    def test_purge_expired_tokens(self):
+        """Test only expired tokens are deleted, in batches."""
+        user = get_user_model().objects.create_user(
+            email="test@example.com", password="test123123"
+        )
+        for device in ["a", "b", "c"]:
+            AuthToken.objects.issue(user, device)
+        live_token, _ = AuthToken.objects.issue(user, "live")
+        AuthToken.objects.exclude(pk=live_token.pk).update(
+            expires=timezone.now() - timedelta(days=1)
+        )
+
+        out = StringIO()
+        call_command("purge_tokens", batch_size=2, stdout=out)
+
+        self.assertEqual(list(AuthToken.objects.all()), [live_token])
+        self.assertIn("Deleted 3 tokens.", out.getvalue())
+
+
+class PurgeIdempotencyKeysCommandTests(TestCase):
+    """Test the purge_idempotency_keys command."""
+
+    def test_purge_expired_keys(self):
+        """Test only expired keys are deleted."""
+        user = get_user_model().objects.create_user(
+            email="test@example.com", password="test123123"
+        )
+        now = timezone.now()
+        for n, expires in enumerate([-1, -2, 1]):
+            IdempotencyKey.objects.create(
+                user=user,
+                digest=bytes([n]) * 32,
+                fingerprint=b"",
+                expires=now + timedelta(hours=expires),
+            )
+
+        out = StringIO()
+        call_command("purge_idempotency_keys", batch_size=1, stdout=out)
+
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        self.assertIn("Deleted 2 keys.", out.getvalue())
+
+
+class SeedDataCommandTests(TestCase):
+    """Test the seed_data command."""
+
+    def seed(self, **options):
+        options = {"users": 3, "recipes": "4", "tags": "5", **options}
+        call_command("seed_data", stdout=StringIO(), **options)
+
+    def test_seed_data(self):
+        """Test users are created with their recipes, tags and password."""
+        self.seed(tags_per_recipe="2", ingredients_per_recipe="3")
+
+        users = get_user_model().objects.order_by("email")
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(users[0].password, users[1].password)
+        self.assertTrue(users[0].check_password("seed-password"))
+        recipes = Recipe.objects.filter(user=users[0])
+        self.assertEqual(recipes.count(), 4)
+        self.assertEqual(Tag.objects.filter(user=users[0]).count(), 5)
+        for recipe in recipes:
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 3)
+            self.assertEqual(
+                {tag.user_id for tag in recipe.tags.all()}, {users[0].id}
+            )
+
+    def test_deterministic(self):
+        """Test the same seed generates the same data."""
+
+        def generated(prefix):
+            return list(
+                Recipe.objects.filter(user__email__startswith=prefix)
+                .order_by("id")
+                .values_list("title", "price", "tags__name")
+            )
+
+        self.seed(prefix="a", seed=7, recipes="1-6", tags_per_recipe="1-3")
+        self.seed(prefix="b", seed=7, recipes="1-6", tags_per_recipe="1-3")
+        self.seed(prefix="c", seed=8, recipes="1-6", tags_per_recipe="1-3")
+
+        self.assertEqual(generated("a"), generated("b"))
+        self.assertNotEqual(generated("a"), generated("c"))
+
+    def test_existing_prefix_rejected(self):
+        """Test seeding twice with the same prefix fails."""
+        self.seed(users=1)
+
+        with self.assertRaises(CommandError):
+            self.seed(users=1)
+
+    def test_invalid_distribution(self):
+        """Test distributions are validated."""
+        with self.assertRaises(CommandError):
+            self.seed(recipes="lots")
+
+    def test_invalid_distribution_numbers(self):
+        """Test distributions that can't be sampled are rejected."""
+        for spec in ["exp:0", "exp:.", "exp:1.2.3", "5-2", "\u0663"]:
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    Distribution(spec)
+                with self.assertRaisesMessage(CommandError, "--recipes"):
+                    self.seed(recipes=spec)
+
+    def test_distributions(self):
+        """Test parsing and sampling distributions."""
+        rng = random.Random(0)
+
+        self.assertEqual(Distribution("3").sample(rng), 3)
+        self.assertTrue(
+            all(2 <= Distribution("2-4").sample(rng) <= 4 for _ in range(50))
+        )
+        samples = [Distribution("exp:10").sample(rng) for _ in range(2000)]
+        self.assertAlmostEqual(sum(samples) / len(samples), 10, delta=1)
+
+    def test_copy_value(self):
+        """Test values are escaped for COPY's text format."""
+        self.assertEqual(copy_value(None), "\\N")
+        self.assertEqual(copy_value(True), "t")
+        self.assertEqual(copy_value("a\tb\\"), "a\\tb\\\\")
@@ -0,0 +1,55 @@
+"""
+Tests for the tunable password hashers and off-thread hashing.
+"""
+
+import threading
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.hashers import TunedPBKDF2PasswordHasher, offload_hashing
+
+
+def thread_name_view(request):
+    return HttpResponse(threading.current_thread().name)
+
+
+class TunedHasherTests(SimpleTestCase):
+    """Test the hashers read their cost from settings."""
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_pbkdf2_iterations_from_settings(self):
+        """Test new hashes use the configured iteration count."""
+        encoded = make_password("secret123")
+
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(check_password("secret123", encoded))
+
+    def test_changed_cost_marks_hash_for_update(self):
+        """Test hashes made with an older cost are upgraded on login."""
+        hasher = TunedPBKDF2PasswordHasher()
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            encoded = hasher.encode("secret123", hasher.salt())
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertTrue(hasher.must_update(encoded))
+            self.assertTrue(hasher.verify("secret123", encoded))
+
+
+class OffloadHashingTests(SimpleTestCase):
+    """Test running password views on the hashing pool."""
+
+    @override_settings(SERVE_ASYNC=False)
+    def test_view_unchanged_without_async(self):
+        """Test the view is left alone when not served under ASGI."""
+        self.assertIs(offload_hashing(thread_name_view), thread_name_view)
+
+    @override_settings(SERVE_ASYNC=True)
+    def test_view_runs_on_hashing_pool(self):
+        """Test the wrapped view runs on a password-hashing thread."""
+        view = offload_hashing(thread_name_view)
+        request = RequestFactory().get("/")
+        res = async_to_sync(view)(request)
+
+        self.assertTrue(res.content.startswith(b"password-hashing"))
@@ -0,0 +1,72 @@
+"""
+Tests for the health check endpoints.
+"""
+
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core import health, views
+
+HEALTHZ_URL = reverse("healthz")
+READYZ_URL = reverse("readyz")
+
+
+class HealthCheckTests(TestCase):
+    """Test the liveness and readiness probes."""
+
+    def setUp(self):
+        views._migrated = False
+        self.addCleanup(setattr, views, "_migrated", False)
+
+    def test_healthz(self):
+        """Test the liveness probe doesn't query the database."""
+        with self.assertNumQueries(0):
+            res = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"status": "ok"})
+        self.assertIn("no-cache", res["Cache-Control"])
+
+    def test_readyz(self):
+        """Test the readiness probe when the database is migrated."""
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"status": "ok"})
+
+    def test_readyz_only_pings_once_migrated(self):
+        """Test later probes cost a single query."""
+        self.client.get(READYZ_URL)
+
+        with self.assertNumQueries(1):
+            self.client.get(READYZ_URL)
+
+    @patch("core.health.ping", side_effect=OperationalError("refused"))
+    def test_readyz_database_down(self, patched_ping):
+        """Test the readiness probe fails when the database is down."""
+        with self.assertLogs("core.views", "ERROR") as logs:
+            res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(
+            res.json(), {"status": "unavailable", "database": "error"}
+        )
+        self.assertIn("refused", logs.output[0])
+
+    @patch("core.health.pending_migrations")
+    def test_readyz_migrations_pending(self, patched_pending):
+        """Test the readiness probe fails until migrations are applied."""
+        patched_pending.return_value = [("core", "0009_latest")]
+
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()["pending_migrations"], 1)
+
+    def test_pending_migrations(self):
+        """Test no migration is pending on the test database."""
+        self.assertEqual(health.pending_migrations(), [])
+        self.assertIn(("core", "0001_initial"), health.migration_targets())
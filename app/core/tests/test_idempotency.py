@@ -0,0 +1,225 @@
+"""
+Tests for Idempotency-Key handling.
+"""
+
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Recipe
+from recipe.views import RecipeViewSet
+
+RECIPES_URL = reverse("recipe:recipe-list")
+PAYLOAD = {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+
+
+def image_file(flip=False):
+    buffer = BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, format="JPEG")
+    data = buffer.getvalue()
+    if flip:
+        # Other pixels in an image of the same length.
+        data = data[:-3] + bytes([data[-3] ^ 1]) + data[-2:]
+    return SimpleUploadedFile("image.jpg", data, "image/jpeg")
+
+
+class IdempotencyTests(TestCase):
+    """Test POST requests retried with an Idempotency-Key."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, payload=PAYLOAD, key="key-1"):
+        return self.client.post(
+            RECIPES_URL,
+            payload,
+            format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replayed(self):
+        """Test a retry gets the stored response without a new recipe."""
+        first = self.create()
+        retry = self.create()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_without_key(self):
+        """Test requests without a key aren't recorded."""
+        self.client.post(RECIPES_URL, PAYLOAD, format="json")
+        self.client.post(RECIPES_URL, PAYLOAD, format="json")
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_key_reused_for_other_request(self):
+        """Test a key can't be reused with a different body."""
+        self.create()
+        res = self.create({**PAYLOAD, "title": "Stew"})
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_in_progress(self):
+        """Test a retry while the first request runs gets a 409."""
+        self.create()
+        IdempotencyKey.objects.update(status_code=None, response=None)
+
+        res = self.create()
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res["Retry-After"], "1")
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_abandoned_key_taken_over(self):
+        """Test a key held past the lock timeout is taken over."""
+        self.create()
+        IdempotencyKey.objects.update(
+            status_code=None,
+            response=None,
+            started=timezone.now()
+            - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT + 1),
+        )
+
+        res = self.create()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def taken_over(self, started, error=None):
+        """
+        Send a request whose key a retry, started at `started`, takes over
+        while it runs. The request then raises `error`, if given.
+        """
+        perform_create = RecipeViewSet.perform_create
+
+        def take_over(view, serializer):
+            IdempotencyKey.objects.update(started=started)
+            if error is not None:
+                raise error
+            perform_create(view, serializer)
+
+        with patch.object(RecipeViewSet, "perform_create", take_over):
+            self.create()
+
+    def test_taken_over_key_not_stored(self):
+        """Test a request doesn't store its response in a key taken over."""
+        started = timezone.now() + timedelta(seconds=1)
+        self.taken_over(started)
+
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.started, started)
+        self.assertIsNone(record.status_code)
+
+    def test_taken_over_key_not_released(self):
+        """Test a failed request doesn't release a key taken over."""
+        started = timezone.now() + timedelta(seconds=1)
+        with self.assertRaises(ValueError):
+            self.taken_over(started, ValueError())
+
+        self.assertEqual(IdempotencyKey.objects.get().started, started)
+
+    def test_expired_key_reused(self):
+        """Test an expired key works as a new one."""
+        self.create()
+        IdempotencyKey.objects.update(expires=timezone.now())
+
+        res = self.create({**PAYLOAD, "title": "Stew"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_error_releases_key(self):
+        """Test a failed request can be fixed and retried with its key."""
+        invalid = self.create({"title": "Soup"})
+        res = self.create()
+
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_keys_per_user(self):
+        """Test users' keys don't clash."""
+        self.create()
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(other)
+
+        res = self.create()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(user=other).count(), 1)
+
+    def test_key_too_long(self):
+        """Test overlong keys are rejected."""
+        res = self.create(key="k" * 256)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.count(), 0)
+
+    def upload(self, recipe, images):
+        """Upload each image with the same key, and return the responses."""
+        url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+        return [
+            self.client.post(
+                url,
+                {"image": image},
+                format="multipart",
+                headers={"Idempotency-Key": "upload-1"},
+            )
+            for image in images
+        ]
+
+    def test_upload_not_repeated(self):
+        """Test a retried upload doesn't store the image again."""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=1
+        )
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                responses, images = [], []
+                for _ in range(2):
+                    responses.extend(self.upload(recipe, [image_file()]))
+                    recipe.refresh_from_db()
+                    images.append(recipe.image.name)
+
+        self.assertEqual(responses[1].status_code, status.HTTP_200_OK)
+        self.assertEqual(responses[1].json(), responses[0].json())
+        self.assertEqual(images[1], images[0])
+
+    def test_key_reused_for_other_upload(self):
+        """Test a key can't be reused to upload another file."""
+        recipe = Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=1
+        )
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                first, other = self.upload(
+                    recipe, [image_file(), image_file(flip=True)]
+                )
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            other.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
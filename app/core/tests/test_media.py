@@ -0,0 +1,152 @@
+"""Tests for serving uploaded media."""
+
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+IMAGE_NAME = "uploads/recipe/0b1c2d3e-4f50-4612-8a7b-8c9d0e1f2a3b.jpg"
+IMAGE_DATA = bytes(range(256)) * 4
+
+
+def media_url(path):
+    """Create and return the URL for a media file."""
+    return reverse("media", kwargs={"path": path})
+
+
+class ServeMediaTests(TestCase):
+    """Test the media view."""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        for name in [IMAGE_NAME, "uploads/readme.txt"]:
+            path = os.path.join(self.media_root.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(IMAGE_DATA)
+
+    def test_serve_full_file(self):
+        """Test a file is served with caching headers."""
+        res = self.client.get(media_url(IMAGE_NAME))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), IMAGE_DATA)
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertTrue(res["ETag"].startswith('"'))
+
+    def test_unhashed_name_not_immutable(self):
+        """Test files without a content-unique name get a short lifetime."""
+        res = self.client.get(media_url("uploads/readme.txt"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("immutable", res["Cache-Control"])
+
+    def test_conditional_get(self):
+        """Test a matching If-None-Match returns 304."""
+        etag = self.client.get(media_url(IMAGE_NAME))["ETag"]
+        res = self.client.get(
+            media_url(IMAGE_NAME), headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["ETag"], etag)
+
+    def test_conditional_get_weak_etag(self):
+        """Test a weakened ETag, as sent for compressed files, matches."""
+        etag = self.client.get(media_url(IMAGE_NAME))["ETag"]
+        res = self.client.get(
+            media_url(IMAGE_NAME), headers={"If-None-Match": "W/" + etag}
+        )
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range_request(self):
+        """Test a byte range returns partial content."""
+        res = self.client.get(
+            media_url(IMAGE_NAME), headers={"Range": "bytes=10-19"}
+        )
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b"".join(res.streaming_content), IMAGE_DATA[10:20])
+        self.assertEqual(res["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(res["Content-Length"], "10")
+
+    def test_suffix_range_request(self):
+        """Test a suffix range returns the end of the file."""
+        res = self.client.get(
+            media_url(IMAGE_NAME), headers={"Range": "bytes=-4"}
+        )
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b"".join(res.streaming_content), IMAGE_DATA[-4:])
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end of the file returns 416."""
+        res = self.client.get(
+            media_url(IMAGE_NAME), headers={"Range": "bytes=5000-"}
+        )
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res["Content-Range"], "bytes */1024")
+
+    def test_suffix_range_of_empty_file(self):
+        """Test a suffix range of an empty file returns 416."""
+        name = "uploads/recipe/7f6e5d4c-3b2a-4190-8f7e-6d5c4b3a2910.jpg"
+        path = os.path.join(self.media_root.name, name)
+        open(path, "wb").close()
+
+        res = self.client.get(media_url(name), headers={"Range": "bytes=-10"})
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res["Content-Range"], "bytes */0")
+
+    def test_stale_if_range_serves_full_file(self):
+        """Test a range is ignored when If-Range doesn't match."""
+        res = self.client.get(
+            media_url(IMAGE_NAME),
+            headers={"Range": "bytes=0-9", "If-Range": '"stale"'},
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_missing_file(self):
+        """Test a missing file returns 404."""
+        res = self.client.get(media_url("uploads/missing.jpg"))
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_path_traversal_rejected(self):
+        """Test paths outside MEDIA_ROOT are not served."""
+        res = self.client.get(media_url("../../etc/passwd"))
+
+        self.assertEqual(res.status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE="x-accel-redirect")
+    def test_accel_redirect(self):
+        """Test the body is handed off to the front server."""
+        res = self.client.get(media_url(IMAGE_NAME))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, b"")
+        self.assertEqual(
+            res["X-Accel-Redirect"], "/protected/media/" + IMAGE_NAME
+        )
+
+    @override_settings(MEDIA_SENDFILE="x-sendfile")
+    def test_sendfile(self):
+        """Test X-Sendfile points at the file on disk."""
+        res = self.client.get(media_url(IMAGE_NAME))
+
+        self.assertEqual(
+            res["X-Sendfile"], os.path.join(self.media_root.name, IMAGE_NAME)
+        )
@@ -0,0 +1,205 @@
+"""
+Tests for the metrics module and the /metrics endpoint.
+"""
+
+import json
+import tempfile
+import threading
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+METRICS_URL = reverse("metrics")
+
+requests_metric = metrics.Counter(
+    "test_requests_total", "Test requests.", ["method"]
+)
+latency_metric = metrics.Histogram(
+    "test_latency_seconds", "Test latency.", buckets=(0.1, 1)
+)
+workers_metric = metrics.Gauge("test_workers", "Test workers.")
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+@override_settings(METRICS_DIR="")
+class MetricsTests(SimpleTestCase):
+    """Test recording and rendering metrics."""
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_counter(self):
+        """Test counters add up by label."""
+        requests_metric.inc(method="GET")
+        requests_metric.inc(2, method="GET")
+        requests_metric.inc(method="POST")
+
+        text = metrics.render()
+
+        self.assertIn("# TYPE test_requests_total counter", text)
+        self.assertEqual(
+            sample_lines(text, "test_requests_total"),
+            [
+                'test_requests_total{method="GET"} 3',
+                'test_requests_total{method="POST"} 1',
+            ],
+        )
+
+    def test_histogram(self):
+        """Test histograms render cumulative buckets, sum and count."""
+        for value in [0.05, 0.5, 0.5, 3]:
+            latency_metric.observe(value)
+
+        text = metrics.render()
+
+        self.assertEqual(
+            sample_lines(text, "test_latency_seconds"),
+            [
+                'test_latency_seconds_bucket{le="0.1"} 1',
+                'test_latency_seconds_bucket{le="1"} 3',
+                'test_latency_seconds_bucket{le="+Inf"} 4',
+                "test_latency_seconds_sum 4.05",
+                "test_latency_seconds_count 4",
+            ],
+        )
+
+    def test_threads_aggregated(self):
+        """Test values recorded on several threads are summed."""
+
+        def record():
+            for _ in range(100):
+                requests_metric.inc(method="GET")
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIn(
+            'test_requests_total{method="GET"} 400', metrics.render()
+        )
+
+    def test_exited_threads_retired(self):
+        """Test exited threads' values are kept without their dicts."""
+        for _ in range(3):
+            thread = threading.Thread(target=latency_metric.observe, args=[2])
+            thread.start()
+            thread.join()
+        requests_metric.inc(method="GET")
+
+        text = metrics.render()
+
+        self.assertEqual(len(metrics._thread_values), 1)
+        self.assertIn("test_latency_seconds_count 3", text)
+        self.assertIn('test_requests_total{method="GET"} 1', text)
+
+    def test_label_values_escaped(self):
+        """Test quotes and backslashes in label values are escaped."""
+        requests_metric.inc(method='a"b\\c')
+
+        self.assertIn('{method="a\\"b\\\\c"}', metrics.render())
+
+    def test_processes_aggregated(self):
+        """Test the values of every worker in METRICS_DIR are summed."""
+        metrics_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(metrics_dir.cleanup)
+        requests_metric.inc(method="GET")
+        workers_metric.set(1)
+        # A worker that has exited, so only its counter is kept.
+        (Path(metrics_dir.name) / "metrics-999999999.json").write_text(
+            json.dumps(
+                {
+                    "values": [["test_requests_total", ["GET"], 5]],
+                    "gauges": [["test_workers", [], 1]],
+                }
+            )
+        )
+
+        with override_settings(METRICS_DIR=metrics_dir.name):
+            text = metrics.render()
+
+        self.assertIn('test_requests_total{method="GET"} 6', text)
+        self.assertIn("test_workers 1", text)
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the /metrics endpoint and request metrics."""
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_metrics(self):
+        """Test requests are recorded by viewset action."""
+        Recipe.objects.create(
+            user=self.user, title="Soup", time_minutes=5, price=Decimal("1")
+        )
+        self.client.get(reverse("recipe:recipe-list"))
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'http_requests_total{view="RecipeViewSet.list",method="GET",'
+            'status="200"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="RecipeViewSet.list",'
+            'method="GET"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_response_size_bytes_count{view="RecipeViewSet.list"} 1',
+            text,
+        )
+        self.assertNotIn("http_request_db_seconds_count{", text)
+
+    @override_settings(METRICS_DB_TIME=True)
+    def test_db_time(self):
+        """Test METRICS_DB_TIME splits requests' time around SQL."""
+        self.client.get(reverse("recipe:recipe-list"))
+
+        text = self.client.get(METRICS_URL).content.decode()
+
+        self.assertIn(
+            'http_request_db_seconds_count{view="RecipeViewSet.list"} 1', text
+        )
+        self.assertIn(
+            'http_request_app_seconds_count{view="RecipeViewSet.list"} 1',
+            text,
+        )
+
+    def test_content_type(self):
+        """Test the endpoint serves the text exposition format."""
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "text/plain; version=0.0.4")
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required(self):
+        """Test METRICS_TOKEN must be sent as a bearer token."""
+        denied = self.client.get(METRICS_URL)
+        allowed = self.client.get(
+            METRICS_URL, headers={"Authorization": "Bearer secret"}
+        )
+
+        self.assertEqual(denied.status_code, 401)
+        self.assertEqual(allowed.status_code, 200)
@@ -0,0 +1,320 @@
+"""
+Tests for the project middleware.
+"""
+
+import json
+import zlib
+from unittest import skipIf
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+
+from core.middleware import (
+    CompressionMiddleware,
+    QueryProfilerMiddleware,
+    RoutedMiddleware,
+    brotli,
+    choose_encoding,
+    zstandard,
+)
+
+BODY = b'{"title": "Sample recipe", "price": "5.25"}' * 100
+
+
+def gunzip(data):
+    return zlib.decompress(data, 31)
+
+
+@override_settings(COMPRESSION_ENCODINGS=["br", "zstd", "gzip"])
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test response compression."""
+
+    def respond(self, response, accept_encoding="gzip", path="/", view=None):
+        request = RequestFactory().get(
+            path, headers={"Accept-Encoding": accept_encoding}
+        )
+        return CompressionMiddleware(view or (lambda request: response))(
+            request
+        )
+
+    def test_gzip(self):
+        """Test JSON responses are compressed with gzip."""
+        res = self.respond(HttpResponse(BODY, "application/json"))
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(res["Vary"], "Accept-Encoding")
+        self.assertEqual(res["Content-Length"], str(len(res.content)))
+        self.assertEqual(gunzip(res.content), BODY)
+
+    def test_not_accepted(self):
+        """Test responses stay uncompressed without Accept-Encoding."""
+        res = self.respond(HttpResponse(BODY, "application/json"), "")
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertEqual(res["Vary"], "Accept-Encoding")
+        self.assertEqual(res.content, BODY)
+
+    def test_below_threshold(self):
+        """Test small responses aren't compressed."""
+        res = self.respond(HttpResponse(b'{"id": 1}', "application/json"))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertEqual(res.content, b'{"id": 1}')
+
+    def test_image_skipped(self):
+        """Test already compressed media isn't compressed again."""
+        res = self.respond(HttpResponse(BODY, "image/jpeg"))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+        self.assertEqual(res.content, BODY)
+
+    def test_partial_content_skipped(self):
+        """Test range responses aren't compressed."""
+        res = self.respond(HttpResponse(BODY, "text/plain", status=206))
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    def test_csrf_token_skipped(self):
+        """Test responses holding a CSRF token aren't compressed."""
+
+        def view(request):
+            return HttpResponse(BODY + get_token(request).encode())
+
+        res = self.respond(None, view=view)
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    def test_admin_html_skipped(self):
+        """Test HTML pages of the admin and docs aren't compressed."""
+        html = self.respond(HttpResponse(BODY), path="/admin/")
+        schema = self.respond(
+            HttpResponse(BODY, "application/json"), path="/api/schema/"
+        )
+
+        self.assertFalse(html.has_header("Content-Encoding"))
+        self.assertEqual(schema["Content-Encoding"], "gzip")
+
+    def test_strong_etag_weakened(self):
+        """Test compressed responses have a weak ETag."""
+        response = HttpResponse(BODY, "application/json")
+        response["ETag"] = '"abc"'
+
+        res = self.respond(response)
+
+        self.assertEqual(res["ETag"], 'W/"abc"')
+
+    def test_streaming(self):
+        """Test streaming responses are compressed as they're iterated."""
+        chunks = [BODY[i:i + 100] for i in range(0, len(BODY), 100)]
+        res = self.respond(StreamingHttpResponse(chunks, "text/csv"))
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertFalse(res.has_header("Content-Length"))
+        self.assertEqual(gunzip(b"".join(res.streaming_content)), BODY)
+
+    def test_async_streaming(self):
+        """Test async streaming responses are compressed."""
+
+        async def chunks():
+            for i in range(0, len(BODY), 100):
+                yield BODY[i:i + 100]
+
+        res = self.respond(StreamingHttpResponse(chunks(), "text/csv"))
+
+        async def read():
+            return b"".join([chunk async for chunk in res.streaming_content])
+
+        self.assertEqual(gunzip(async_to_sync(read)()), BODY)
+
+    def test_event_stream_skipped(self):
+        """Test server-sent events aren't compressed."""
+        res = self.respond(
+            StreamingHttpResponse([BODY], "text/event-stream")
+        )
+
+        self.assertFalse(res.has_header("Content-Encoding"))
+
+    @skipIf(brotli is None, "brotli isn't installed")
+    def test_brotli(self):
+        """Test brotli is preferred when the client accepts it."""
+        res = self.respond(
+            HttpResponse(BODY, "application/json"), "gzip, deflate, br"
+        )
+
+        self.assertEqual(res["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(res.content), BODY)
+
+    @skipIf(zstandard is None, "zstandard isn't installed")
+    def test_zstd(self):
+        """Test zstd streaming responses decompress."""
+        res = self.respond(
+            StreamingHttpResponse([BODY[:500], BODY[500:]], "text/plain"),
+            "zstd",
+        )
+        content = b"".join(res.streaming_content)
+
+        self.assertEqual(res["Content-Encoding"], "zstd")
+        self.assertEqual(
+            zstandard.ZstdDecompressor().decompressobj().decompress(content),
+            BODY,
+        )
+
+
+class ChooseEncodingTests(SimpleTestCase):
+    """Test Accept-Encoding negotiation."""
+
+    @override_settings(COMPRESSION_ENCODINGS=["br", "zstd", "gzip"])
+    def test_q_values(self):
+        """Test the highest q value wins, then the server's order."""
+        self.assertEqual(choose_encoding("gzip;q=1.0, br;q=0.5"), "gzip")
+        self.assertEqual(choose_encoding("br;q=0, gzip"), "gzip")
+        self.assertEqual(choose_encoding("identity"), None)
+        self.assertEqual(choose_encoding("gzip;q=0"), None)
+
+    @override_settings(COMPRESSION_ENCODINGS=["gzip"])
+    def test_wildcard(self):
+        """Test * accepts every coding."""
+        self.assertEqual(choose_encoding("*"), "gzip")
+        self.assertEqual(choose_encoding("*, gzip;q=0"), None)
+
+
+def session_view(request):
+    """Return whether the session and user middleware ran."""
+    ran = hasattr(request, "session") and hasattr(request, "user")
+    return HttpResponse(str(ran))
+
+
+class RoutedMiddlewareTests(TestCase):
+    """Test the routed middleware stack."""
+
+    def test_admin_routed(self):
+        """Test admin requests run the routed middleware."""
+        middleware = RoutedMiddleware(session_view)
+
+        res = middleware(RequestFactory().get("/admin/"))
+
+        self.assertEqual(res.content, b"True")
+
+    def test_api_skips_routed(self):
+        """Test API requests skip the routed middleware."""
+        middleware = RoutedMiddleware(session_view)
+
+        res = middleware(RequestFactory().get("/api/recipe/recipes/"))
+
+        self.assertEqual(res.content, b"False")
+
+    def test_async(self):
+        """Test the middleware runs in async mode."""
+
+        async def view(request):
+            return session_view(request)
+
+        middleware = RoutedMiddleware(view)
+
+        res = async_to_sync(middleware)(RequestFactory().get("/api/docs/"))
+
+        self.assertEqual(res.content, b"True")
+
+    def test_admin_csrf_enforced(self):
+        """Test the CSRF check runs for routed paths."""
+        client = Client(enforce_csrf_checks=True)
+
+        res = client.post("/admin/login/", {"username": "a", "password": "b"})
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_api_sets_no_cookies(self):
+        """Test API responses don't set session or CSRF cookies."""
+        res = self.client.get("/api/recipe/")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.cookies, {})
+
+
+def query_view(request):
+    """Run two queries."""
+    get_user_model().objects.count()
+    get_user_model().objects.exists()
+    return HttpResponse()
+
+
+@override_settings(
+    QUERY_PROFILER_ENABLED=True,
+    QUERY_PROFILER_SAMPLE_RATE=1,
+    QUERY_PROFILER_SLOW_DB_MS=10_000,
+    QUERY_PROFILER_SLOW_QUERY_COUNT=100,
+    QUERY_PROFILER_SLOWEST=1,
+)
+class QueryProfilerMiddlewareTests(TestCase):
+    """Test profiling the queries of requests."""
+
+    def test_disabled(self):
+        """Test the middleware is skipped unless enabled."""
+        with override_settings(QUERY_PROFILER_ENABLED=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                QueryProfilerMiddleware(query_view)
+
+    def test_server_timing(self):
+        """Test the query count and time are sent in Server-Timing."""
+        middleware = QueryProfilerMiddleware(query_view)
+
+        res = middleware(RequestFactory().get("/api/recipe/"))
+
+        self.assertRegex(
+            res["Server-Timing"], r'^db;dur=\d+\.\d;desc="2 queries"$'
+        )
+
+    def test_not_sampled(self):
+        """Test requests outside the sample aren't profiled."""
+        middleware = QueryProfilerMiddleware(query_view)
+
+        with override_settings(QUERY_PROFILER_SAMPLE_RATE=0):
+            res = middleware(RequestFactory().get("/api/recipe/"))
+
+        self.assertFalse(res.has_header("Server-Timing"))
+
+    def test_slow_request_logged(self):
+        """Test requests over a threshold are logged with their queries."""
+        middleware = QueryProfilerMiddleware(query_view)
+
+        with override_settings(QUERY_PROFILER_SLOW_QUERY_COUNT=2):
+            with self.assertLogs("core.queries", "WARNING") as logs:
+                middleware(RequestFactory().get("/api/recipe/?page=1"))
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["event"], "slow_request")
+        self.assertEqual(entry["path"], "/api/recipe/")
+        self.assertEqual(entry["status"], 200)
+        self.assertEqual(entry["queries"], 2)
+        self.assertEqual(len(entry["slowest"]), 1)
+        self.assertIn("SELECT", entry["slowest"][0]["sql"])
+
+    def test_fast_request_not_logged(self):
+        """Test requests under the thresholds aren't logged."""
+        middleware = QueryProfilerMiddleware(query_view)
+
+        with self.assertNoLogs("core.queries"):
+            middleware(RequestFactory().get("/api/recipe/"))
+
+    def test_async(self):
+        """Test profiling async requests."""
+
+        async def view(request):
+            await get_user_model().objects.acount()
+            return HttpResponse()
+
+        middleware = QueryProfilerMiddleware(view)
+
+        res = async_to_sync(middleware)(RequestFactory().get("/api/recipe/"))
+
+        self.assertIn('desc="1 queries"', res["Server-Timing"])
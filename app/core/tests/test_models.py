@@ -89,3 +89,12 @@ class ModelTest(TestCase):
         mock_uuid.return_value = uuid
         file_path = models.recipe_image_file_path(None, "example.jpg")
         self.assertEqual(file_path, f"uploads/recipe/{uuid}.jpg")
+
+    def test_issue_auth_token(self):
+        """Test issuing a token stores its digest with an expiry."""
+        user = create_user()
+        token, key = models.AuthToken.objects.issue(user, "phone")
+
+        self.assertEqual(bytes(token.digest), models.hash_token(key))
+        self.assertFalse(token.is_expired)
+        self.assertEqual(str(token), f"{user} (phone)")
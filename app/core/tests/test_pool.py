@@ -0,0 +1,196 @@
+"""
+Tests for the database connection pool.
+"""
+
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.backends.postgresql import base as postgresql
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core.db.backends.postgresql_pool import base
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, status=extensions.TRANSACTION_STATUS_IDLE):
+        self.closed = 0
+        self.rolled_back = False
+        self.info = SimpleNamespace(transaction_status=status)
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the pool itself."""
+
+    def test_reuses_released_connections(self):
+        """Test a released connection is handed out again."""
+        pool = ConnectionPool(FakeConnection, max_size=2, timeout=1)
+
+        first = pool.acquire()
+        pool.release(first)
+
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_timeout_when_exhausted(self):
+        """Test acquire raises PoolTimeout once max_size are in use."""
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_waits_for_release(self):
+        """Test a waiting thread gets the connection that's released."""
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=5)
+        held = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, [held])
+        timer.start()
+
+        self.assertIs(pool.acquire(), held)
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual(stats["acquired"], 2)
+        self.assertEqual(stats["waited"], 1)
+        self.assertGreater(stats["wait_seconds_max"], 0.01)
+
+    def test_discard_frees_slot(self):
+        """Test discarding a connection closes it and frees its slot."""
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=0.01)
+        first = pool.acquire()
+
+        pool.discard(first)
+
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.acquire(), first)
+
+    def test_broken_connection_replaced(self):
+        """Test a connection failing the check is replaced."""
+
+        def check(conn):
+            if conn.closed:
+                raise Exception("closed")
+
+        pool = ConnectionPool(FakeConnection, 1, timeout=1, check=check)
+        first = pool.acquire()
+        pool.release(first)
+        first.closed = 1
+
+        second = pool.acquire()
+
+        self.assertIsNot(second, first)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a failure to connect doesn't leak a slot."""
+        def connect():
+            raise OSError("refused")
+
+        pool = ConnectionPool(connect, max_size=1, timeout=0.01)
+
+        with self.assertRaises(OSError):
+            pool.acquire()
+
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_close_idle(self):
+        """Test idle connections are closed."""
+        pool = ConnectionPool(FakeConnection, max_size=2, timeout=1)
+        conn = pool.acquire()
+        pool.release(conn)
+
+        pool.close_idle()
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+
+
+class PooledBackendTests(SimpleTestCase):
+    """Test the pooled PostgreSQL backend."""
+
+    def setUp(self):
+        base._pools.clear()
+        self.addCleanup(base._pools.clear)
+        settings_dict = {
+            **connection.settings_dict,
+            "ENGINE": "core.db.backends.postgresql_pool",
+            "NAME": "recipes",
+            "OPTIONS": {},
+            "CONN_HEALTH_CHECKS": False,
+            "POOL": {"MAX_SIZE": 1, "TIMEOUT": 0.01},
+        }
+        self.settings_dict = settings_dict
+        patcher = patch.object(
+            postgresql.DatabaseWrapper,
+            "get_new_connection",
+            side_effect=lambda params: FakeConnection(),
+        )
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wrapper(self):
+        return base.DatabaseWrapper(self.settings_dict)
+
+    def test_close_returns_connection_to_pool(self):
+        """Test closing a wrapper lets the next one reuse its connection."""
+        first = self.wrapper()
+        conn = first.get_new_connection({"dbname": "recipes"})
+        first.connection = conn
+        first._close()
+
+        second = self.wrapper()
+
+        self.assertIs(second.get_new_connection({"dbname": "recipes"}), conn)
+        self.assertFalse(conn.closed)
+        self.connect.assert_called_once()
+
+    def test_open_transaction_rolled_back(self):
+        """Test a connection left in a transaction is rolled back."""
+        wrapper = self.wrapper()
+        conn = wrapper.get_new_connection({"dbname": "recipes"})
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        wrapper.connection = conn
+
+        wrapper._close()
+
+        self.assertTrue(conn.rolled_back)
+        self.assertEqual(base.pool_stats()[0]["idle"], 1)
+
+    def test_connection_in_atomic_block_discarded(self):
+        """Test a connection closed mid-atomic isn't reused."""
+        wrapper = self.wrapper()
+        conn = wrapper.get_new_connection({"dbname": "recipes"})
+        wrapper.connection = conn
+        wrapper.in_atomic_block = True
+
+        wrapper._close()
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(base.pool_stats()[0]["size"], 0)
+
+    def test_pool_timeout_is_operational_error(self):
+        """Test an exhausted pool raises the driver's OperationalError."""
+        self.wrapper().get_new_connection({"dbname": "recipes"})
+
+        with self.assertRaises(postgresql.Database.OperationalError):
+            self.wrapper().get_new_connection({"dbname": "recipes"})
+
+    def test_new_pool_after_fork(self):
+        """Test a child process doesn't reuse its parent's pool."""
+        self.wrapper().get_new_connection({"dbname": "recipes"})
+
+        with patch("core.db.backends.postgresql_pool.base.os.getpid") as pid:
+            pid.return_value = -1
+            self.wrapper().get_new_connection({"dbname": "recipes"})
+
+        self.assertEqual(self.connect.call_count, 2)
@@ -0,0 +1,308 @@
+"""
+Query budgets for every API route.
+
+Each route is requested against a small and a large dataset. It must make
+the same number of queries for both, so a page costs O(1) queries however
+many rows it shows, and no more than its budget in query_budgets.json.
+
+Run with UPDATE_QUERY_BUDGETS=1 to rewrite the budgets from the current
+counts, and check in the result along with the change that caused it.
+"""
+
+import json
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import AuthToken, Ingredient, Recipe, Tag
+from core.seeding import DEFAULT_PASSWORD, email_for, generate
+from recipe.urls import router
+from user import urls as user_urls
+
+BUDGETS_PATH = Path(__file__).with_name("query_budgets.json")
+UPDATE_BUDGETS = os.getenv("UPDATE_QUERY_BUDGETS") == "1"
+
+# seed_data distributions for one user's data in each dataset.
+DATASETS = {
+    "small": {
+        "recipes": "2",
+        "tags": "2",
+        "ingredients": "2",
+        "tags_per_recipe": "1",
+        "ingredients_per_recipe": "1",
+    },
+    "large": {
+        "recipes": "40",
+        "tags": "20",
+        "ingredients": "20",
+        "tags_per_recipe": "8",
+        "ingredients_per_recipe": "8",
+    },
+}
+
+
+def api_routes():
+    """Return "<url name> <METHOD>" for every recipe and user route."""
+    routes = ["recipe:api-root GET"]
+    for _, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            name = route.name.format(basename=basename)
+            routes.extend(
+                f"recipe:{name} {method.upper()}"
+                for method, action in route.mapping.items()
+                if hasattr(viewset, action)
+            )
+    for pattern in user_urls.urlpatterns:
+        view_class = pattern.callback.view_class
+        routes.extend(
+            f"user:{pattern.name} {method.upper()}"
+            for method in view_class.http_method_names
+            if method not in ("head", "options")
+            and hasattr(view_class, method)
+        )
+    return routes
+
+
+def image_file(name="image.jpg"):
+    buffer = BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, format="JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/jpeg")
+
+
+def recipe_payload(data):
+    return {
+        "title": "Budget recipe",
+        "time_minutes": 10,
+        "price": "2.50",
+        "tags": [{"name": data["tag_name"]}, {"name": "New tag"}],
+        "ingredients": [{"name": "New ingredient"}],
+    }
+
+
+def recipe_url(name, data):
+    return reverse(f"recipe:{name}", args=[data["recipe_id"]])
+
+
+# The request sent for each route, as (path, data, format), built from a
+# dataset's fixture. Every route needs one.
+REQUESTS = {
+    "recipe:api-root GET": lambda data: (
+        reverse("recipe:api-root"),
+        None,
+        None,
+    ),
+    "recipe:recipe-list GET": lambda data: (
+        reverse("recipe:recipe-list"),
+        None,
+        None,
+    ),
+    "recipe:recipe-list POST": lambda data: (
+        reverse("recipe:recipe-list"),
+        recipe_payload(data),
+        "json",
+    ),
+    "recipe:recipe-detail GET": lambda data: (
+        recipe_url("recipe-detail", data),
+        None,
+        None,
+    ),
+    "recipe:recipe-detail PUT": lambda data: (
+        recipe_url("recipe-detail", data),
+        recipe_payload(data),
+        "json",
+    ),
+    "recipe:recipe-detail PATCH": lambda data: (
+        recipe_url("recipe-detail", data),
+        {"tags": [{"name": "New tag"}]},
+        "json",
+    ),
+    "recipe:recipe-detail DELETE": lambda data: (
+        recipe_url("recipe-detail", data),
+        None,
+        None,
+    ),
+    "recipe:recipe-upload-image POST": lambda data: (
+        recipe_url("recipe-upload-image", data),
+        {"image": image_file()},
+        "multipart",
+    ),
+    "recipe:recipe-upload-images POST": lambda data: (
+        reverse("recipe:recipe-upload-images"),
+        {str(pk): image_file() for pk in data["recipe_ids"][:2]},
+        "multipart",
+    ),
+    "recipe:tag-list GET": lambda data: (
+        reverse("recipe:tag-list"),
+        None,
+        None,
+    ),
+    "recipe:tag-detail PUT": lambda data: (
+        reverse("recipe:tag-detail", args=[data["tag_id"]]),
+        {"name": "Renamed"},
+        "json",
+    ),
+    "recipe:tag-detail PATCH": lambda data: (
+        reverse("recipe:tag-detail", args=[data["tag_id"]]),
+        {"name": "Renamed"},
+        "json",
+    ),
+    "recipe:tag-detail DELETE": lambda data: (
+        reverse("recipe:tag-detail", args=[data["tag_id"]]),
+        None,
+        None,
+    ),
+    "recipe:ingredient-list GET": lambda data: (
+        reverse("recipe:ingredient-list"),
+        None,
+        None,
+    ),
+    "recipe:ingredient-detail PUT": lambda data: (
+        reverse("recipe:ingredient-detail", args=[data["ingredient_id"]]),
+        {"name": "Renamed"},
+        "json",
+    ),
+    "recipe:ingredient-detail PATCH": lambda data: (
+        reverse("recipe:ingredient-detail", args=[data["ingredient_id"]]),
+        {"name": "Renamed"},
+        "json",
+    ),
+    "recipe:ingredient-detail DELETE": lambda data: (
+        reverse("recipe:ingredient-detail", args=[data["ingredient_id"]]),
+        None,
+        None,
+    ),
+    "user:create POST": lambda data: (
+        reverse("user:create"),
+        {
+            "email": "new-budget-user@example.com",
+            "password": "testpass123",
+            "name": "New user",
+        },
+        "json",
+    ),
+    "user:token POST": lambda data: (
+        reverse("user:token"),
+        {"email": data["email"], "password": DEFAULT_PASSWORD},
+        "json",
+    ),
+    "user:token-rotate POST": lambda data: (
+        reverse("user:token-rotate"),
+        None,
+        None,
+    ),
+    "user:me GET": lambda data: (reverse("user:me"), None, None),
+    "user:me PUT": lambda data: (
+        reverse("user:me"),
+        {"email": data["email"], "password": "newpass123", "name": "Name"},
+        "json",
+    ),
+    "user:me PATCH": lambda data: (
+        reverse("user:me"),
+        {"name": "Name"},
+        "json",
+    ),
+}
+
+
+def load_budgets():
+    if not BUDGETS_PATH.exists():
+        return {}
+    return json.loads(BUDGETS_PATH.read_text())
+
+
+def save_budgets(budgets):
+    text = json.dumps(budgets, indent=2, sort_keys=True)
+    BUDGETS_PATH.write_text(text + "\n")
+
+
+class QueryBudgetTests(TestCase):
+    """Test every API route makes a bounded number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixtures = {}
+        for seed, (size, distributions) in enumerate(DATASETS.items()):
+            generate(1, seed=seed, prefix=size, **distributions)
+            user = get_user_model().objects.get(email=email_for(0, size))
+            recipe = Recipe.objects.filter(user=user).order_by("id").first()
+            tag = Tag.objects.filter(user=user).order_by("id").first()
+            ingredient = Ingredient.objects.filter(user=user).first()
+            token, _ = AuthToken.objects.issue(user, "budgets")
+            cls.fixtures[size] = {
+                "user_id": user.pk,
+                "token_id": token.pk,
+                "email": user.email,
+                "recipe_id": recipe.pk,
+                "recipe_ids": list(
+                    Recipe.objects.filter(user=user)
+                    .order_by("id")
+                    .values_list("id", flat=True)
+                ),
+                "tag_id": tag.pk,
+                "tag_name": tag.name,
+                "ingredient_id": ingredient.pk,
+            }
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def count_queries(self, route, size):
+        """Send a route's request for a dataset and count its queries."""
+        data = self.fixtures[size]
+        client = APIClient()
+        client.force_authenticate(
+            get_user_model().objects.get(pk=data["user_id"]),
+            AuthToken.objects.get(pk=data["token_id"]),
+        )
+        path, payload, fmt = REQUESTS[route](data)
+        method = getattr(client, route.split()[1].lower())
+        # Roll back so every request sees the same data.
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                res = method(path, payload, format=fmt)
+            transaction.set_rollback(True)
+        self.assertLess(res.status_code, 400, f"{route}: {res.content!r}")
+        return len(queries)
+
+    def test_every_route_has_a_request(self):
+        """Test a request is defined for every route, and nothing else."""
+        self.assertCountEqual(REQUESTS, api_routes())
+
+    def test_query_budgets(self):
+        """Test query counts don't grow with rows and stay in budget."""
+        budgets = load_budgets()
+        counts = {}
+        for route in api_routes():
+            with self.subTest(route=route):
+                small, large = (
+                    self.count_queries(route, size) for size in DATASETS
+                )
+                counts[route] = small
+                self.assertEqual(
+                    small,
+                    large,
+                    f"{route} made {small} queries for the small dataset "
+                    f"and {large} for the large one.",
+                )
+                if not UPDATE_BUDGETS:
+                    self.assertIn(route, budgets, "No budget, see module.")
+                    self.assertLessEqual(small, budgets[route])
+
+        if UPDATE_BUDGETS:
+            save_budgets(counts)
+        else:
+            self.assertCountEqual(budgets, counts, "Stale budgets.")
@@ -0,0 +1,90 @@
+"""
+Tests for the JSON renderer and parser.
+"""
+
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+PAYLOAD = {
+    "id": 1,
+    "title": "Crème brûlée    ",
+    "price": Decimal("5.25"),
+    "created": datetime(2024, 5, 1, 12, 30, 15, 123456, timezone.utc),
+    "day": date(2024, 5, 1),
+    "duration": timedelta(minutes=5),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "lazy": gettext_lazy("Invalid token."),
+    "tags": [{"id": 2, "name": "Vegan"}],
+    3: None,
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the renderer matches JSONRenderer."""
+
+    def test_same_output(self):
+        """Test rendering is byte for byte the same as JSONRenderer."""
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD),
+            JSONRenderer().render(PAYLOAD),
+        )
+
+    def test_indent(self):
+        """Test indented output falls back to JSONRenderer."""
+        media_type = "application/json; indent=4"
+
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD, media_type),
+            JSONRenderer().render(PAYLOAD, media_type),
+        )
+
+    def test_none(self):
+        """Test rendering None returns an empty body."""
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_without_orjson(self):
+        """Test the stdlib fallback."""
+        with patch("core.renderers.orjson", None):
+            ret = FastJSONRenderer().render(PAYLOAD)
+
+        self.assertEqual(ret, JSONRenderer().render(PAYLOAD))
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the parser matches JSONParser."""
+
+    def test_parse(self):
+        """Test parsing gives the same data as JSONParser."""
+        body = '{"title": "Crème brûlée", "tags": [{"name": "a"}]}'.encode()
+
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(body)),
+            JSONParser().parse(BytesIO(body)),
+        )
+
+    def test_invalid(self):
+        """Test invalid JSON raises a parse error."""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"title": '))
+
+    def test_other_encoding(self):
+        """Test bodies in other encodings fall back to JSONParser."""
+        body = '{"title": "Crème"}'.encode("latin-1")
+
+        data = FastJSONParser().parse(
+            BytesIO(body), parser_context={"encoding": "latin-1"}
+        )
+
+        self.assertEqual(data, {"title": "Crème"})
@@ -0,0 +1,172 @@
+"""
+Tests for routing reads to replicas.
+"""
+
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.db import routers
+from core.db.routers import ReplicaRouter, use_replica
+from core.middleware import ReplicaMiddleware
+from core.models import AuthToken, Recipe
+
+router = ReplicaRouter()
+
+
+def lag_check(alias):
+    return {"replica_1": 0.5, "replica_2": 30}[alias]
+
+
+def broken_check(alias):
+    raise ConnectionError(alias)
+
+
+@override_settings(
+    REPLICA_DATABASES=["replica_1", "replica_2"],
+    REPLICA_LAG_CHECK="",
+    REPLICA_MAX_LAG=2,
+)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the database router."""
+
+    def setUp(self):
+        routers._lag.clear()
+        self.addCleanup(routers._lag.clear)
+
+    def test_reads_use_primary_by_default(self):
+        """Test reads outside use_replica() go to the primary."""
+        self.assertEqual(router.db_for_read(None), "default")
+
+    def test_reads_use_replica(self):
+        """Test reads inside use_replica() go to a replica."""
+        with use_replica():
+            self.assertIn(router.db_for_read(None), ["replica_1", "replica_2"])
+
+    def test_tokens_read_from_primary(self):
+        """Test auth tokens are read from the primary, new ones included."""
+        with use_replica():
+            self.assertEqual(router.db_for_read(AuthToken), "default")
+            self.assertIn(
+                router.db_for_read(Recipe), ["replica_1", "replica_2"]
+            )
+
+    def test_writes_use_primary(self):
+        """Test writes always go to the primary."""
+        with use_replica():
+            self.assertEqual(router.db_for_write(None), "default")
+
+    @override_settings(
+        REPLICA_LAG_CHECK="core.tests.test_replicas.lag_check"
+    )
+    def test_lagging_replica_skipped(self):
+        """Test replicas further behind than REPLICA_MAX_LAG are skipped."""
+        with use_replica():
+            aliases = {router.db_for_read(None) for _ in range(20)}
+
+        self.assertEqual(aliases, {"replica_1"})
+
+    @override_settings(
+        REPLICA_LAG_CHECK="core.tests.test_replicas.broken_check"
+    )
+    def test_failing_check_falls_back_to_primary(self):
+        """Test reads go to the primary when no replica can be checked."""
+        with use_replica():
+            self.assertEqual(router.db_for_read(None), "default")
+
+    @override_settings(
+        REPLICA_LAG_CHECK="core.tests.test_replicas.lag_check"
+    )
+    def test_lag_checks_cached(self):
+        """Test replica lag is measured once per REPLICA_LAG_CACHE."""
+        with patch(
+            "core.tests.test_replicas.lag_check", wraps=lag_check
+        ) as check, use_replica():
+            router.db_for_read(None)
+            router.db_for_read(None)
+
+        self.assertEqual(check.call_count, 2)
+
+    def test_no_migrations_on_replicas(self):
+        """Test migrations only run on the primary."""
+        self.assertTrue(router.allow_migrate("default", "core"))
+        self.assertFalse(router.allow_migrate("replica_1", "core"))
+
+
+@override_settings(
+    REPLICA_DATABASES=["replica_1"],
+    REPLICA_LAG_CHECK="",
+    REPLICA_PIN_SECONDS=5,
+)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    """Test choosing replicas per request."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.factory = RequestFactory()
+        self.databases_used = []
+
+        def view(request):
+            self.databases_used.append(router.db_for_read(None))
+            status = 201 if request.method == "POST" else 200
+            return HttpResponse(status=status)
+
+        self.middleware = ReplicaMiddleware(view)
+
+    def request(self, method, token="Token abc"):
+        request = getattr(self.factory, method)(
+            "/api/recipe/recipes/", HTTP_AUTHORIZATION=token
+        )
+        return self.middleware(request)
+
+    def test_get_reads_from_replica(self):
+        """Test GET requests read from a replica."""
+        self.request("get")
+
+        self.assertEqual(self.databases_used, ["replica_1"])
+
+    def test_post_reads_from_primary(self):
+        """Test unsafe requests read from the primary."""
+        self.request("post")
+
+        self.assertEqual(self.databases_used, ["default"])
+
+    def test_pinned_after_write(self):
+        """Test a client reads from the primary right after a write."""
+        self.request("post")
+        self.request("get")
+        self.request("get", token="Token other")
+
+        self.assertEqual(
+            self.databases_used, ["default", "default", "replica_1"]
+        )
+
+    def test_failed_write_not_pinned(self):
+        """Test a rejected write doesn't pin the client."""
+        middleware = ReplicaMiddleware(lambda r: HttpResponse(status=400))
+        middleware(self.factory.post("/", HTTP_AUTHORIZATION="Token abc"))
+        self.request("get")
+
+        self.assertEqual(self.databases_used, ["replica_1"])
+
+    async def test_async(self):
+        """Test the middleware in an async handler."""
+
+        async def view(request):
+            self.databases_used.append(router.db_for_read(None))
+            status = 201 if request.method == "POST" else 200
+            return HttpResponse(status=status)
+
+        middleware = ReplicaMiddleware(view)
+        for method in ["get", "post", "get"]:
+            request = getattr(self.factory, method)(
+                "/", HTTP_AUTHORIZATION="Token abc"
+            )
+            await middleware(request)
+
+        self.assertEqual(
+            self.databases_used, ["replica_1", "default", "default"]
+        )
@@ -0,0 +1,112 @@
+"""
+Tests for the prebuilt OpenAPI schema.
+"""
+
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from drf_spectacular.views import SpectacularAPIView
+
+from core import schema
+
+SCHEMA_URL = reverse("api-schema")
+
+
+class CachedSchemaTests(TestCase):
+    """Test serving the prebuilt schema."""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name)
+        settings = override_settings(
+            SCHEMA_CACHE_DIR=cache_dir.name, APP_VERSION="v1"
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        schema.clear_cache()
+        self.addCleanup(schema.clear_cache)
+
+    def test_matches_generated_schema(self):
+        """Test the cached schema matches SpectacularAPIView's output."""
+        view = SpectacularAPIView.as_view()
+        for format in ["yaml", "json"]:
+            res = self.client.get(SCHEMA_URL, {"format": format})
+            request = RequestFactory().get(SCHEMA_URL, {"format": format})
+            expected = view(request)
+            expected.render()
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.content, expected.content)
+            self.assertEqual(res["Content-Type"], expected["Content-Type"])
+
+    def test_conditional_get(self):
+        """Test a matching If-None-Match returns 304."""
+        etag = self.client.get(SCHEMA_URL)["ETag"]
+
+        res = self.client.get(SCHEMA_URL, headers={"If-None-Match": etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["ETag"], etag)
+
+    def test_generated_once(self):
+        """Test the schema is only generated once per version."""
+        with patch(
+            "core.schema.render_schema", wraps=schema.render_schema
+        ) as render:
+            self.client.get(SCHEMA_URL)
+            self.client.get(SCHEMA_URL, {"format": "json"})
+
+        render.assert_called_once()
+
+    def test_loaded_from_disk(self):
+        """Test another process reuses the artifacts on disk."""
+        etag = self.client.get(SCHEMA_URL)["ETag"]
+        schema.clear_cache()
+
+        with patch("core.schema.render_schema") as render:
+            res = self.client.get(SCHEMA_URL)
+
+        render.assert_not_called()
+        self.assertEqual(res["ETag"], etag)
+
+    def test_rebuilt_for_new_version(self):
+        """Test a new code version builds new artifacts."""
+        self.client.get(SCHEMA_URL)
+        schema.clear_cache()
+
+        with override_settings(APP_VERSION="v2"):
+            self.client.get(SCHEMA_URL)
+
+        self.assertEqual(
+            sorted(path.name for path in self.cache_dir.iterdir()),
+            [
+                "openapi-v1.json",
+                "openapi-v1.yaml",
+                "openapi-v2.json",
+                "openapi-v2.yaml",
+            ],
+        )
+
+    def test_build_schema_command(self):
+        """Test the command writes the artifacts."""
+        out = StringIO()
+
+        call_command("build_schema", stdout=out)
+
+        self.assertTrue((self.cache_dir / "openapi-v1.yaml").exists())
+        self.assertTrue((self.cache_dir / "openapi-v1.json").exists())
+        self.assertIn("Built schema v1.", out.getvalue())
+
+    def test_code_version_from_sources(self):
+        """Test the version falls back to a hash of the source files."""
+        with override_settings(APP_VERSION=""):
+            schema.code_version.cache_clear()
+            version = schema.code_version()
+
+        self.assertEqual(len(version), 16)
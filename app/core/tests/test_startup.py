@@ -0,0 +1,92 @@
+"""
+Tests for what booting a worker loads.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from core.management.commands.startup_profile import parse_importtime
+
+# Modules only needed by some requests, which must not load at boot, with
+# their submodules. Pillow covers the admin's image fields too.
+DEFERRED_MODULES = [
+    "PIL",
+    "drf_spectacular.generators",
+    "drf_spectacular.views",
+]
+
+# Prints the deferred modules the process has loaded.
+PRINT_DEFERRED = (
+    "import json, sys\n"
+    f"deferred = {DEFERRED_MODULES!r}\n"
+    "print(json.dumps(sorted(\n"
+    "    m for m in sys.modules\n"
+    "    if any(m == d or m.startswith(d + '.') for d in deferred)\n"
+    ")))\n"
+)
+
+
+def run_python(code, **env):
+    """
+    Run code in a fresh interpreter and return its JSON output. The schema
+    isn't built on startup unless `env` says so.
+    """
+    env = {**os.environ, "SCHEMA_BUILD_ON_STARTUP": "0", **env}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=settings.BASE_DIR,
+        env=env,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+class StartupTests(SimpleTestCase):
+    """
+    Test what booting a worker loads. Its timing is measured by the
+    startup_profile command instead.
+    """
+
+    def test_default_settings(self):
+        """
+        Test booting with the schema built on startup: the first process
+        builds it, and later ones load it without the schema generator.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = {
+                "SCHEMA_BUILD_ON_STARTUP": "1",
+                "SCHEMA_CACHE_DIR": cache_dir,
+            }
+            run_python("import app.wsgi\n" + PRINT_DEFERRED, **env)
+            built = sorted(os.listdir(cache_dir))
+            loaded = run_python("import app.wsgi\n" + PRINT_DEFERRED, **env)
+
+        self.assertEqual(len(built), 2)
+        self.assertEqual(loaded, [])
+
+    def test_heavy_imports_deferred(self):
+        """Test Pillow and the schema views aren't imported at boot."""
+        loaded = run_python("import app.wsgi, app.urls\n" + PRINT_DEFERRED)
+
+        self.assertEqual(loaded, [])
+
+    def test_parse_importtime(self):
+        """Test parsing -X importtime output."""
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:      1500 |       1620 | app.wsgi\n"
+        )
+
+        self.assertEqual(
+            parse_importtime(output),
+            [("_io", 120, 120), ("app.wsgi", 1500, 1620)],
+        )
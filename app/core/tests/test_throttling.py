@@ -0,0 +1,175 @@
+"""
+Tests for the token bucket throttles.
+"""
+
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import throttling
+from core.models import AuthToken
+from recipe import async_views
+
+RATES = {"reads": "3/min", "writes": "2/min", "login": "2/min"}
+
+
+def throttled(**rates):
+    """Turn throttling on with the given rates."""
+    return override_settings(
+        THROTTLE_ENABLED=True,
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": rates,
+        },
+    )
+
+
+class BucketStoreTests(SimpleTestCase):
+    """Test the bucket stores."""
+
+    def setUp(self):
+        cache.clear()
+
+    def take_all(self, store, count, now, clock):
+        with patch(f"core.throttling.{clock}", return_value=now):
+            return [store.take("key", 3, 60)[0] for _ in range(count)]
+
+    def test_burst_then_refill(self):
+        """Test a bucket allows a burst, then refills at the rate."""
+        for store, clock in [
+            (throttling.LocalBucketStore(60), "time.monotonic"),
+            (throttling.CacheBucketStore("default"), "time.time"),
+        ]:
+            with self.subTest(store=type(store).__name__):
+                self.assertEqual(
+                    self.take_all(store, 4, 1000, clock),
+                    [True, True, True, False],
+                )
+                # One token every 20 seconds.
+                self.assertEqual(
+                    self.take_all(store, 2, 1020, clock), [True, False]
+                )
+
+    def test_eviction(self):
+        """Test refilled buckets are dropped every evict interval."""
+        store = throttling.LocalBucketStore(60)
+        with patch("core.throttling.time.monotonic", return_value=0):
+            store.evict(0)
+            # Full again after 20 and 200 seconds.
+            store.take("idle", 3, 60)
+            store.take("busy", 3, 600)
+        self.assertEqual(len(store), 2)
+
+        with patch("core.throttling.time.monotonic", return_value=61):
+            store.take("new", 3, 60)
+            self.assertEqual(len(store), 2)
+            self.assertLess(store.take("busy", 3, 600)[1], 2)
+
+
+class ThrottleAPITests(TestCase):
+    """Test throttling of API requests."""
+
+    def setUp(self):
+        throttling.local_store.clear()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        _, self.key = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @throttled(**RATES)
+    def test_rate_limit_headers(self):
+        """Test responses report the bucket they were checked against."""
+        res = self.client.get(reverse("recipe:recipe-list"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["RateLimit-Limit"], "3")
+        self.assertEqual(res["RateLimit-Remaining"], "2")
+        self.assertEqual(res["RateLimit-Reset"], "20")
+        self.assertEqual(res["RateLimit-Policy"], "3;w=60")
+
+    @throttled(**RATES)
+    def test_reads_throttled_per_user(self):
+        """Test a user is refused once their bucket is empty."""
+        url = reverse("recipe:recipe-list")
+        statuses = [self.client.get(url).status_code for _ in range(4)]
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(url)
+
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        self.assertEqual(res.status_code, 200)
+
+    @throttled(**RATES)
+    def test_writes_scope(self):
+        """Test writes are counted apart from reads."""
+        url = reverse("recipe:recipe-list")
+        payload = {"title": "Soup", "time_minutes": 5, "price": "1.00"}
+        statuses = [
+            self.client.post(url, payload, format="json").status_code
+            for _ in range(3)
+        ]
+
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @throttled(**RATES)
+    def test_login_throttled_per_ip(self):
+        """Test token requests are refused with a Retry-After."""
+        client = APIClient()
+        payload = {"email": "user@example.com", "password": "wrong"}
+        for _ in range(2):
+            client.post(reverse("user:token"), payload)
+        res = client.post(reverse("user:token"), payload)
+
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(res["Retry-After"], "30")
+        self.assertEqual(res["RateLimit-Remaining"], "0")
+
+    @throttled(**RATES)
+    def test_forwarded_for_ignored(self):
+        """Test rotating X-Forwarded-For doesn't get a fresh bucket."""
+        client = APIClient()
+        payload = {"email": "user@example.com", "password": "wrong"}
+        statuses = [
+            client.post(
+                reverse("user:token"),
+                payload,
+                headers={"X-Forwarded-For": f"10.0.0.{i}"},
+            ).status_code
+            for i in range(3)
+        ]
+
+        self.assertEqual(statuses, [400, 400, 429])
+
+    @throttled(reads="3/min")
+    def test_scope_without_rate(self):
+        """Test scopes without a rate aren't throttled."""
+        client = APIClient()
+        payload = {"email": "user@example.com", "password": "wrong"}
+        res = [client.post(reverse("user:token"), payload) for _ in range(3)]
+
+        self.assertEqual(res[-1].status_code, 400)
+        self.assertNotIn("RateLimit-Limit", res[-1])
+
+    @throttled(**RATES)
+    async def test_async_views_throttled(self):
+        """Test the async read views share the users' read buckets."""
+        request = AsyncRequestFactory().get(
+            "/", headers={"Authorization": f"Token {self.key}"}
+        )
+        statuses = [
+            (await async_views.recipe_list(request)).status_code
+            for _ in range(4)
+        ]
+
+        self.assertEqual(statuses, [200, 200, 200, 429])
@@ -0,0 +1,260 @@
+"""
+Token bucket request throttles.
+
+Each client has a bucket per scope holding up to `limit` tokens, refilled
+at `limit` tokens per period. A request takes a token and is refused while
+the bucket is empty, so clients can burst up to the limit and then get the
+steady rate. A bucket is just its token count and when it was last
+updated, which makes checking one O(1), unlike DRF's throttles that keep a
+timestamp per request.
+
+Rates are set per scope in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], in
+DRF's "<requests>/<period>" format. Buckets are kept per process unless
+THROTTLE_CACHE_ALIAS names a cache shared by every worker.
+"""
+
+import math
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core import metrics
+
+CACHE_PREFIX = "throttle:"
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+
+# What a throttle check found. `remaining` whole tokens are left after the
+# request, the bucket is full again after `reset` seconds, and a refused
+# request may be retried after `wait` seconds.
+Result = namedtuple(
+    "Result",
+    ["allowed", "scope", "limit", "period", "remaining", "reset", "wait"],
+)
+
+
+def parse_rate(rate):
+    """Return (limit, period in seconds) for a rate such as "100/min"."""
+    limit, period = rate.split("/")
+    return int(limit), PERIODS[period[0]]
+
+
+def take_token(tokens, elapsed, limit, period):
+    """
+    Refill a bucket holding `tokens` for `elapsed` seconds and take a token
+    from it. Returns the tokens left and whether one could be taken.
+    """
+    tokens = min(limit, tokens + elapsed * limit / period)
+    if tokens >= 1:
+        return tokens - 1, True
+    return tokens, False
+
+
+def seconds_to_full(tokens, limit, period):
+    return (limit - tokens) * period / limit
+
+
+class LocalBucketStore:
+    """
+    Buckets kept in a dict, for a single process.
+
+    A bucket that has refilled is the same as a missing one, so every
+    `evict_interval` seconds the full buckets are dropped. Memory is then
+    bounded by the clients seen in the last period.
+    """
+
+    def __init__(self, evict_interval):
+        self.evict_interval = evict_interval
+        # Key -> (tokens, updated, full at).
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_eviction = time.monotonic() + evict_interval
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, limit, period):
+        """Take a token from a bucket; return (allowed, tokens left)."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_eviction:
+                self.evict(now)
+            tokens, updated, _ = self._buckets.get(key, (limit, now, now))
+            tokens, allowed = take_token(tokens, now - updated, limit, period)
+            full_at = now + seconds_to_full(tokens, limit, period)
+            self._buckets[key] = (tokens, now, full_at)
+        return allowed, tokens
+
+    async def atake(self, key, limit, period):
+        return self.take(key, limit, period)
+
+    def evict(self, now):
+        """Drop the buckets that have refilled. Call with the lock held."""
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket[2] > now
+        }
+        self._next_eviction = now + self.evict_interval
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets kept in a Django cache shared by every process.
+
+    Entries expire once their bucket would be full. Reading and writing a
+    bucket isn't atomic, so concurrent requests from one client can now
+    and then both take its last token, which is fine for throttling.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def update(self, entry, limit, period):
+        now = time.time()
+        tokens, updated = entry or (limit, now)
+        tokens, allowed = take_token(tokens, now - updated, limit, period)
+        timeout = math.ceil(seconds_to_full(tokens, limit, period))
+        return (tokens, now), max(timeout, 1), allowed, tokens
+
+    def take(self, key, limit, period):
+        """Take a token from a bucket; return (allowed, tokens left)."""
+        cache = caches[self.alias]
+        entry = cache.get(CACHE_PREFIX + key)
+        entry, timeout, allowed, tokens = self.update(entry, limit, period)
+        cache.set(CACHE_PREFIX + key, entry, timeout)
+        return allowed, tokens
+
+    async def atake(self, key, limit, period):
+        """Async version of take()."""
+        cache = caches[self.alias]
+        entry = await cache.aget(CACHE_PREFIX + key)
+        entry, timeout, allowed, tokens = self.update(entry, limit, period)
+        await cache.aset(CACHE_PREFIX + key, entry, timeout)
+        return allowed, tokens
+
+
+local_store = LocalBucketStore(settings.THROTTLE_EVICT_INTERVAL)
+
+
+def bucket_store():
+    """Return the store for buckets, as set by THROTTLE_CACHE_ALIAS."""
+    alias = settings.THROTTLE_CACHE_ALIAS
+    return CacheBucketStore(alias) if alias else local_store
+
+
+def remember(request, result):
+    """
+    Keep the most restrictive result on the request, for the rate limit
+    headers set by core.middleware.RateLimitMiddleware.
+    """
+    request = getattr(request, "_request", request)
+    current = getattr(request, "rate_limit", None)
+    if current is None or (
+        (result.allowed, result.remaining)
+        < (current.allowed, current.remaining)
+    ):
+        request.rate_limit = result
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Base token bucket throttle, for clients told apart by `get_key()`.
+
+    A scope without a rate isn't throttled. Works with DRF requests and,
+    through `aallow_request()`, with plain requests carrying a `user`.
+    """
+
+    scope = None
+
+    def get_scope(self, request):
+        return self.scope
+
+    def get_key(self, request):
+        return "ip:" + self.get_ident(request)
+
+    def bucket(self, request):
+        """Return (scope, key, limit, period), or None to let it through."""
+        if not settings.THROTTLE_ENABLED:
+            return None
+        scope = self.get_scope(request)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return None
+        limit, period = parse_rate(rate)
+        key = f"{scope}:{self.get_key(request)}"
+        return scope, key, limit, period
+
+    def allow_request(self, request, view):
+        bucket = self.bucket(request)
+        if bucket is None:
+            return True
+        scope, key, limit, period = bucket
+        allowed, tokens = bucket_store().take(key, limit, period)
+        return self.record(request, scope, limit, period, allowed, tokens)
+
+    async def aallow_request(self, request, view=None):
+        """Async version of allow_request()."""
+        bucket = self.bucket(request)
+        if bucket is None:
+            return True
+        scope, key, limit, period = bucket
+        allowed, tokens = await bucket_store().atake(key, limit, period)
+        return self.record(request, scope, limit, period, allowed, tokens)
+
+    def record(self, request, scope, limit, period, allowed, tokens):
+        self.result = Result(
+            allowed,
+            scope,
+            limit,
+            period,
+            int(tokens),
+            seconds_to_full(tokens, limit, period),
+            0 if allowed else (1 - tokens) * period / limit,
+        )
+        remember(request, self.result)
+        if not allowed:
+            metrics.THROTTLED.inc(scope=scope)
+        return allowed
+
+    def wait(self):
+        """Seconds until the bucket has a token again."""
+        return self.result.wait
+
+
+class RequestThrottle(BucketThrottle):
+    """
+    Throttle reads and writes per user, or per IP address for anonymous
+    requests, in the "reads" and "writes" scopes.
+    """
+
+    def get_scope(self, request):
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return "reads"
+        return "writes"
+
+    def get_key(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return super().get_key(request)
+
+
+class LoginThrottle(BucketThrottle):
+    """Throttle token requests per IP address."""
+
+    scope = "login"
+
+
+class SignupThrottle(BucketThrottle):
+    """Throttle account creation per IP address."""
+
+    scope = "signup"
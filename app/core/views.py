@@ -0,0 +1,261 @@
+"""
+Views shared across the project.
+"""
+
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.utils import DatabaseError
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from core import health, metrics
+
+logger = logging.getLogger(__name__)
+
+# Uploaded recipe images are stored under a random uuid4 name (see
+# core.models.recipe_image_file_path), so their content never changes.
+HASHED_NAME_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.\w+$"
+)
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STREAM_CHUNK_SIZE = 64 * 2**10
+
+# Set by readyz once it has seen every migration applied.
+_migrated = False
+
+
+def _file_etag(stat):
+    """Return a strong ETag derived from the identity of the file."""
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _parse_range(header, size):
+    """
+    Return the (start, end) of a single byte range, both inclusive.
+
+    Returns None when the header should be ignored (multiple or malformed
+    ranges) and raises ValueError when the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if not length or not size:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    """Yield `length` bytes of the file starting at offset `start`."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(path, relative_path):
+    """Hand the file off to the front server instead of streaming it."""
+    response = HttpResponse()
+    if settings.MEDIA_SENDFILE == "x-accel-redirect":
+        location = settings.MEDIA_ACCEL_REDIRECT_LOCATION + relative_path
+        response["X-Accel-Redirect"] = location
+    else:
+        response["X-Sendfile"] = path
+    # Let the front server pick the type from the file it sends.
+    del response["Content-Type"]
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded media file.
+
+    Supports single byte-range requests, strong ETags with conditional GET
+    and long-lived caching for content-addressed names. With MEDIA_SENDFILE
+    set the body is left to the front server (X-Sendfile or
+    X-Accel-Redirect), which also takes care of ranges.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("File does not exist.")
+    if not os.path.isfile(full_path):
+        raise Http404("File does not exist.")
+
+    etag = _file_etag(stat)
+    if HASHED_NAME_RE.search(path):
+        cache_control = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = f"public, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+
+    def finalize(response):
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        response["Cache-Control"] = cache_control
+        return response
+
+    # Weak comparison, as CompressionMiddleware weakens the ETags it sends.
+    if_none_match = request.headers.get("If-None-Match", "")
+    tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    if etag in tags:
+        return finalize(HttpResponseNotModified())
+
+    if settings.MEDIA_SENDFILE:
+        return finalize(_sendfile_response(full_path, path))
+
+    size = stat.st_size
+    content_type = mimetypes.guess_type(full_path)[0]
+    content_type = content_type or "application/octet-stream"
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return finalize(response)
+
+    if byte_range is None:
+        if request.method == "HEAD":
+            response = HttpResponse(content_type=content_type)
+            response["Content-Length"] = size
+        else:
+            response = FileResponse(
+                open(full_path, "rb"), content_type=content_type
+            )
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        if request.method == "HEAD":
+            response = HttpResponse(status=206, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                _read_range(full_path, start, length),
+                status=206,
+                content_type=content_type,
+            )
+        response["Content-Length"] = length
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return finalize(response)
+
+
+class LazyView:
+    """
+    A class-based view that's only imported when it's first used.
+
+    Keeps heavy view modules, like drf_spectacular's, out of worker boot.
+    `cls`, `initkwargs` and `actions` are passed through to the real view,
+    so schema generators still see it.
+    """
+
+    csrf_exempt = True
+
+    def __init__(self, import_path, **initkwargs):
+        self.import_path = import_path
+        self.initkwargs = initkwargs
+
+    @cached_property
+    def view(self):
+        return import_string(self.import_path).as_view(**self.initkwargs)
+
+    def __call__(self, request, *args, **kwargs):
+        return self.view(request, *args, **kwargs)
+
+    def __getattr__(self, name):
+        if name in ("cls", "actions"):
+            return getattr(self.view, name)
+        raise AttributeError(name)
+
+
+@never_cache
+@require_safe
+def healthz(request):
+    """Liveness probe: the process is up and serving requests."""
+    return JsonResponse({"status": "ok"})
+
+
+@never_cache
+@require_safe
+def readyz(request):
+    """
+    Readiness probe: the database answers and its migrations are applied.
+
+    Once the migrations have been seen applied, later probes only ping.
+    Database errors are logged rather than shown to the caller.
+    """
+    global _migrated
+    try:
+        health.ping()
+        if not _migrated:
+            pending = health.pending_migrations()
+            if pending:
+                return JsonResponse(
+                    {
+                        "status": "unavailable",
+                        "pending_migrations": len(pending),
+                    },
+                    status=503,
+                )
+            _migrated = True
+    except DatabaseError:
+        logger.exception("Readiness check failed")
+        return JsonResponse(
+            {"status": "unavailable", "database": "error"}, status=503
+        )
+    return JsonResponse({"status": "ok"})
+
+
+@never_cache
+@require_safe
+def metrics_view(request):
+    """
+    Serve the metrics of every worker in the Prometheus text format.
+
+    With METRICS_TOKEN set, scrapers must send it as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4"
+    )
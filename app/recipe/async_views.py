@@ -0,0 +1,213 @@
+"""
+Async read path for the recipe API, used when served under ASGI.
+
+GET requests to the recipe list and detail and to the tag and ingredient
+lists are answered by native async views using the async ORM, so slow
+clients don't each hold a thread. Every other request is passed on to the
+DRF viewsets unchanged.
+
+`recipe_events` streams the user's change events as Server-Sent Events.
+"""
+
+import asyncio
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import URLPattern
+from django.utils.translation import gettext as _
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+
+from core.models import Recipe, Tag, Ingredient
+from core.renderers import FastJSONRenderer
+from recipe import serializers
+from recipe.events import broker, ensure_listener
+from recipe.fast_serializers import aserialize_attrs, aserialize_recipes
+from recipe.queries import filter_recipe_attrs, filter_recipes
+from recipe.versioning import etag
+from user.authentication import CachedTokenAuthentication
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    """Render data the same way as the DRF views."""
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status_code,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+async def authenticate(request):
+    """Return the user for the request, or raise NotAuthenticated."""
+    authenticator = CachedTokenAuthentication()
+    result = await authenticator.aauthenticate(request)
+    if result is None:
+        raise exceptions.NotAuthenticated()
+    return result[0]
+
+
+async def check_throttles(request):
+    """Apply the default DRF throttles, or raise Throttled."""
+    waits = []
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not await throttle.aallow_request(request):
+            waits.append(throttle.wait())
+    if waits:
+        raise exceptions.Throttled(max(waits))
+
+
+def error_response(exc):
+    """Return the response DRF would send for an API exception."""
+    headers = None
+    if isinstance(
+        exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+    ):
+        headers = {"WWW-Authenticate": "Token"}
+    return json_response({"detail": exc.detail}, exc.status_code, headers)
+
+
+def api_view(view):
+    """Authenticate the request and turn API exceptions into responses."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request)
+            await check_throttles(request)
+            data = await view(request, request.user, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+        if isinstance(data, HttpResponse):
+            return data
+        return json_response(data)
+
+    return wrapper
+
+
+@api_view
+async def recipe_list(request, user):
+    """List the user's recipes, like RecipeViewSet.list."""
+    queryset = filter_recipes(Recipe.objects.all(), request.GET, user)
+    return await aserialize_recipes(queryset)
+
+
+@api_view
+async def recipe_detail(request, user, pk):
+    """Return one of the user's recipes, like RecipeViewSet.retrieve."""
+    queryset = filter_recipes(
+        Recipe.objects.prefetch_related("tags", "ingredients"),
+        request.GET,
+        user,
+    )
+    try:
+        recipe = await queryset.aget(pk=pk)
+    except (Recipe.DoesNotExist, ValueError):
+        raise exceptions.NotFound(_("No Recipe matches the given query."))
+    data = serializers.RecipeDetailSerializer(
+        recipe, context={"request": request}
+    ).data
+    return json_response(data, headers={"ETag": etag(recipe.version)})
+
+
+def attr_list(model):
+    """Return a view listing the user's tags or ingredients."""
+
+    @api_view
+    async def view(request, user):
+        queryset = filter_recipe_attrs(model.objects.all(), request.GET, user)
+        return await aserialize_attrs(queryset)
+
+    return view
+
+
+tag_list = attr_list(Tag)
+ingredient_list = attr_list(Ingredient)
+
+
+def format_event(event):
+    """Encode an event as a Server-Sent Events message."""
+    name = ".".join(filter(None, [event["type"], event.get("action")]))
+    return f"event: {name}\ndata: {json.dumps(event)}\n\n"
+
+
+@require_GET
+async def recipe_events(request):
+    """
+    Stream create, update and delete events for the user's recipes, tags
+    and ingredients.
+
+    Each open stream is a queue and a suspended coroutine, no thread.
+    Events carry the type, action and id of the object; a `resync` event
+    means some were dropped and the client should refetch its lists.
+    """
+    try:
+        user = await authenticate(request)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+    ensure_listener()
+    subscription = broker.subscribe(user.id)
+
+    async def stream():
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), settings.RECIPE_EVENTS_KEEPALIVE
+                    )
+                except TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(
+        stream(), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+READ_VIEWS = {
+    "recipe-list": recipe_list,
+    "recipe-detail": recipe_detail,
+    "tag-list": tag_list,
+    "ingredient-list": ingredient_list,
+}
+
+
+def async_reads(read_view, viewset_view):
+    """Serve GET from read_view and other methods from the viewset."""
+    sync_view = sync_to_async(viewset_view)
+
+    @wraps(viewset_view)
+    async def view(request, *args, **kwargs):
+        if request.method == "GET":
+            return await read_view(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    return view
+
+
+def with_async_reads(urlpatterns):
+    """Swap the router's read routes for ones served by the async views."""
+    patterns = []
+    for pattern in urlpatterns:
+        # Format suffix routes (e.g. .json) stay with the viewsets.
+        groups = pattern.pattern.regex.groupindex
+        if pattern.name in READ_VIEWS and "format" not in groups:
+            view = async_reads(READ_VIEWS[pattern.name], pattern.callback)
+            pattern = URLPattern(
+                pattern.pattern, view, pattern.default_args, pattern.name
+            )
+        patterns.append(pattern)
+    return patterns
@@ -0,0 +1,178 @@
+"""
+Change events for a user's recipes, tags and ingredients.
+
+Model signals publish an event once the change is committed. Events go
+through an in-process broker to the subscribers of the user they belong
+to, which are the open Server-Sent Events streams (see
+recipe.async_views.recipe_events).
+
+With RECIPE_EVENTS_PG_NOTIFY, events are sent with Postgres NOTIFY instead,
+and every process runs one listener thread that feeds them to its broker,
+so a change made by one worker reaches subscribers on all of them.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Ingredient, Recipe, Tag
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "recipe_events"
+EVENT_TYPES = {Recipe: "recipe", Tag: "tag", Ingredient: "ingredient"}
+
+
+class Subscription:
+    """A bounded queue of events for one subscriber on an event loop."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.RECIPE_EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        """Queue an event; runs on the subscriber's loop."""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client can't keep up: drop what's queued and tell it to
+            # refetch instead.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class Broker:
+    """In-process pub/sub of events, keyed by user id."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Return a new subscription; call from the subscriber's loop."""
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions[subscription.user_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id, event):
+        """Send an event to the user's subscribers; safe from any thread."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.put, event
+                )
+            except RuntimeError:
+                # The subscriber's loop has been closed.
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+def send_event(instance, action):
+    """Publish a change to an instance once the transaction commits."""
+    user_id = instance.user_id
+    event = {
+        "type": EVENT_TYPES[type(instance)],
+        "action": action,
+        "id": instance.pk,
+    }
+    if settings.RECIPE_EVENTS_PG_NOTIFY:
+        # NOTIFY is transactional, so it's only delivered on commit.
+        payload = json.dumps({"user_id": user_id, "event": event})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+    else:
+        transaction.on_commit(lambda: broker.publish(user_id, event))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def send_saved(sender, instance, created, **kwargs):
+    send_event(instance, "created" if created else "updated")
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def send_deleted(sender, instance, **kwargs):
+    send_event(instance, "deleted")
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def send_relations_changed(sender, instance, action, reverse, **kwargs):
+    # Changes made from the tag or ingredient side aren't reported.
+    if action.startswith("post_") and not reverse:
+        send_event(instance, "updated")
+
+
+def listen():
+    """Feed Postgres notifications to the broker; runs in its own thread."""
+    while True:
+        conn = None
+        try:
+            conn = connection.get_new_connection(
+                connection.get_connection_params()
+            )
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    message = json.loads(conn.notifies.pop(0).payload)
+                    broker.publish(message["user_id"], message["event"])
+        except Exception:
+            logger.exception("Recipe event listener failed, reconnecting")
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        time.sleep(1)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener():
+    """Start this process's notification listener if it's needed."""
+    global _listener
+    if not settings.RECIPE_EVENTS_PG_NOTIFY:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = threading.Thread(
+                target=listen, name="recipe-events", daemon=True
+            )
+            _listener.start()
@@ -0,0 +1,101 @@
+"""
+Read-only fast path for the recipe, tag and ingredient lists.
+
+Builds the same output as RecipeSerializer, TagSerializer and
+IngredientSerializer with many=True, straight from `.values()` rows and one
+query per recipe relation, without a serializer per object.
+"""
+
+from collections import defaultdict
+
+from core.models import Recipe
+from recipe.serializers import RecipeSerializer
+
+RECIPE_FIELDS = ["id", "title", "time_minutes", "price", "link"]
+ATTR_FIELDS = ["id", "name"]
+RELATIONS = ["tags", "ingredients"]
+
+
+def attr_rows(queryset):
+    """Return the queryset's tags or ingredients as (id, name) rows."""
+    return queryset.values_list(*ATTR_FIELDS)
+
+
+def build_attrs(rows):
+    return [{"id": attr_id, "name": name} for attr_id, name in rows]
+
+
+def recipe_rows(queryset):
+    return queryset.values(*RECIPE_FIELDS)
+
+
+def relation_rows(name, recipe_ids):
+    """Return (recipe_id, id, name) rows for one of the recipes' relations."""
+    field = Recipe._meta.get_field(name)
+    target = field.m2m_reverse_field_name()
+    return (
+        field.remote_field.through.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("pk")
+        .values_list("recipe_id", f"{target}_id", f"{target}__name")
+    )
+
+
+def build_recipes(rows, relations):
+    """
+    Return recipe dicts for `.values()` rows, with the related tags and
+    ingredients from `relations`, a dict of relation_rows() by name.
+    """
+    price = RecipeSerializer().fields["price"].to_representation
+    related = {}
+    for name, relation in relations.items():
+        by_recipe = related[name] = defaultdict(list)
+        for recipe_id, attr_id, attr_name in relation:
+            by_recipe[recipe_id].append({"id": attr_id, "name": attr_name})
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "time_minutes": row["time_minutes"],
+            "price": price(row["price"]),
+            "link": row["link"],
+            "tags": related["tags"].get(row["id"], []),
+            "ingredients": related["ingredients"].get(row["id"], []),
+        }
+        for row in rows
+    ]
+
+
+def serialize_attrs(queryset):
+    """Return TagSerializer / IngredientSerializer output for a queryset."""
+    return build_attrs(attr_rows(queryset))
+
+
+def serialize_recipes(queryset):
+    """Return RecipeSerializer(many=True) output for a queryset."""
+    rows = list(recipe_rows(queryset))
+    recipe_ids = [row["id"] for row in rows]
+    relations = {
+        name: list(relation_rows(name, recipe_ids)) if rows else []
+        for name in RELATIONS
+    }
+    return build_recipes(rows, relations)
+
+
+# The async versions iterate the querysets with `async for`, which fetches
+# every row in a single sync_to_async() call. aiterator() also queries in
+# the thread-sensitive executor, but hops there once per chunk, and the
+# rows all end up in a list here anyway.
+async def aserialize_attrs(queryset):
+    """Async version of serialize_attrs()."""
+    return build_attrs([row async for row in attr_rows(queryset)])
+
+
+async def aserialize_recipes(queryset):
+    """Async version of serialize_recipes()."""
+    rows = [row async for row in recipe_rows(queryset)]
+    recipe_ids = [row["id"] for row in rows]
+    relations = {}
+    for name in RELATIONS:
+        relation = relation_rows(name, recipe_ids)
+        relations[name] = [row async for row in relation] if rows else []
+    return build_recipes(rows, relations)
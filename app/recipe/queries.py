@@ -0,0 +1,31 @@
+"""
+Querysets shared by the sync and async recipe views.
+"""
+
+
+def params_to_int(qs):
+    """convert a list of strings to integers"""
+    return [int(str_id) for str_id in qs.split(",")]
+
+
+def filter_recipes(queryset, query_params, user):
+    """Filter recipes by the request's tags and ingredients params."""
+    tags = query_params.get("tags")
+    ingredients = query_params.get("ingredients")
+    if tags:
+        queryset = queryset.filter(tags__id__in=params_to_int(tags))
+    if ingredients:
+        ingredient_ids = params_to_int(ingredients)
+        queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+    # Adding filter to user by the user authenticated.
+    # Since the authentication class is configures for all operations.
+    # The user is passed by the authentication system for the request.
+    return queryset.filter(user=user).order_by("-id").distinct()
+
+
+def filter_recipe_attrs(queryset, query_params, user):
+    """Filter tags or ingredients by the request's assigned_only param."""
+    assigned_only = bool(int(query_params.get("assigned_only", 0)))
+    if assigned_only:
+        queryset = queryset.filter(recipe__isnull=False)
+    return queryset.filter(user=user).order_by("-name").distinct()
@@ -2,8 +2,10 @@
 Serializers for recipes API.
 """
 
+from django.db import transaction
 from rest_framework import serializers
 from core.models import Recipe, Tag, Ingredient
+from recipe.versioning import PreconditionFailed
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -66,26 +68,31 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags_data = validated_data.pop("tags", [])
         ingredients_data = validated_data.pop("ingredients", [])
 
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags_data, recipe)
-        self._get_or_create_ingredients(ingredients_data, recipe)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            self._get_or_create_tags(tags_data, recipe)
+            self._get_or_create_ingredients(ingredients_data, recipe)
         return recipe
 
     def update(self, instance, validated_data):
-        """Update recipe."""
+        """Update recipe, if it's still at `expected_version` when given."""
+        expected_version = validated_data.pop("expected_version", None)
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", [])
 
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            if not instance.bump_version(expected_version):
+                raise PreconditionFailed()
+            if tags is not None:
+                instance.tags.clear()
+                self._get_or_create_tags(tags, instance)
+            if ingredients is not None:
+                instance.ingredients.clear()
+                self._get_or_create_ingredients(ingredients, instance)
+
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
         return instance
 
 
@@ -97,7 +104,12 @@ class RecipeDetailSerializer(RecipeSerializer):
     ingredients = IngredientSerializer(many=True, required=False)
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ["description", "image"]
+        fields = RecipeSerializer.Meta.fields + [
+            "description",
+            "image",
+            "version",
+        ]
+        read_only_fields = ["id", "version"]
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -108,3 +120,8 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ["id", "image"]
         read_only_fields = ["id"]
         extra_kwargs = {"image": {"required": "True"}}
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            instance.bump_version()
+            return super().update(instance, validated_data)
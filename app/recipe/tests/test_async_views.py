@@ -0,0 +1,164 @@
+"""
+Tests for the async read path of the recipe API.
+"""
+
+from decimal import Decimal
+from inspect import iscoroutinefunction
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import AsyncRequestFactory, TestCase
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from core.models import AuthToken, Recipe, Tag
+from recipe import async_views
+from recipe.serializers import (
+    RecipeDetailSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+from recipe.urls import router
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe."""
+    defaults = {
+        "title": "Sample recipe",
+        "time_minutes": 22,
+        "price": Decimal("5.25"),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class AsyncReadViewTests(TestCase):
+    """Test the async views match the DRF viewsets."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        _, key = AuthToken.objects.issue(self.user)
+        self.headers = {"Authorization": f"Token {key}"}
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.recipe = create_recipe(self.user, title="Curry")
+        self.recipe.tags.add(self.tag)
+        create_recipe(self.user, title="Soup")
+
+    def get(self, data=None):
+        """Create an authenticated GET request."""
+        return AsyncRequestFactory().get("/", data, headers=self.headers)
+
+    async def test_recipe_list(self):
+        """Test the list matches the recipe serializer output."""
+        res = await async_views.recipe_list(self.get())
+
+        recipes = await sync_to_async(
+            lambda: RecipeSerializer(
+                Recipe.objects.order_by("-id"), many=True
+            ).data
+        )()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, JSONRenderer().render(recipes))
+
+    async def test_recipe_list_filtered(self):
+        """Test the list applies the tags filter."""
+        res = await async_views.recipe_list(
+            self.get({"tags": str(self.tag.id)})
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(b"Curry", res.content)
+        self.assertNotIn(b"Soup", res.content)
+
+    async def test_recipe_detail(self):
+        """Test the detail matches the recipe detail serializer output."""
+        request = self.get()
+        res = await async_views.recipe_detail(request, pk=self.recipe.id)
+
+        recipe = await sync_to_async(
+            lambda: RecipeDetailSerializer(
+                Recipe.objects.get(pk=self.recipe.id),
+                context={"request": request},
+            ).data
+        )()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, JSONRenderer().render(recipe))
+
+    async def test_recipe_detail_of_other_user_not_found(self):
+        """Test other users' recipes aren't returned."""
+        other_user = await get_user_model().objects.acreate(
+            email="other@example.com"
+        )
+        other_recipe = await sync_to_async(create_recipe)(other_user)
+        res = await async_views.recipe_detail(
+            self.get(), pk=other_recipe.id
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_tag_list(self):
+        """Test listing tags."""
+        res = await async_views.tag_list(self.get())
+
+        tags = await sync_to_async(
+            lambda: TagSerializer(Tag.objects.all(), many=True).data
+        )()
+        self.assertEqual(res.content, JSONRenderer().render(tags))
+
+    async def test_auth_required(self):
+        """Test requests without a token are rejected."""
+        res = await async_views.recipe_list(AsyncRequestFactory().get("/"))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res["WWW-Authenticate"], "Token")
+
+    async def test_invalid_token_rejected(self):
+        """Test requests with an unknown token are rejected."""
+        request = AsyncRequestFactory().get(
+            "/", headers={"Authorization": "Token bad"}
+        )
+        res = await async_views.recipe_list(request)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+def async_read_patterns():
+    """Return the swapped router patterns by name, without format suffixes."""
+    return {
+        pattern.name: pattern
+        for pattern in async_views.with_async_reads(router.urls)
+        if "format" not in pattern.pattern.regex.groupindex
+    }
+
+
+class WithAsyncReadsTests(TestCase):
+    """Test swapping the router's read routes."""
+
+    def test_read_routes_swapped(self):
+        """Test list and detail routes dispatch to async views."""
+        patterns = async_read_patterns()
+
+        for name in async_views.READ_VIEWS:
+            callback = patterns[name].callback
+            self.assertTrue(iscoroutinefunction(callback), msg=name)
+        self.assertFalse(
+            iscoroutinefunction(patterns["recipe-upload-image"].callback)
+        )
+
+    def test_writes_go_to_viewset(self):
+        """Test non-GET requests are handled by the DRF viewset."""
+        user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        _, key = AuthToken.objects.issue(user)
+        view = async_read_patterns()["tag-list"].callback
+        request = APIRequestFactory().post(
+            "/", HTTP_AUTHORIZATION=f"Token {key}"
+        )
+
+        res = async_to_sync(view)(request)
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
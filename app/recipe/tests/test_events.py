@@ -0,0 +1,216 @@
+"""
+Tests for recipe change events.
+"""
+
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    AsyncRequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from rest_framework import status
+
+from core.models import AuthToken, Recipe, Tag
+from recipe import async_views
+from recipe.events import Broker, broker, listen
+
+
+def create_user(email="user@example.com"):
+    return get_user_model().objects.create_user(
+        email=email, password="testpass123"
+    )
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 22, "price": 5}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@patch("recipe.events.broker.publish")
+class EventSignalTests(TestCase):
+    """Test model changes publish events."""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_created_published_on_commit(self, publish):
+        """Test creating a recipe publishes an event after the commit."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe = create_recipe(self.user)
+            publish.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        publish.assert_called_once_with(
+            self.user.id,
+            {"type": "recipe", "action": "created", "id": recipe.id},
+        )
+
+    def test_updated_and_deleted(self, publish):
+        """Test updating and deleting a tag publish events."""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        tag_id = tag.id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = "Vegetarian"
+            tag.save()
+            tag.delete()
+
+        events = [call.args[1] for call in publish.call_args_list]
+        self.assertEqual(
+            events,
+            [
+                {"type": "tag", "action": "updated", "id": tag_id},
+                {"type": "tag", "action": "deleted", "id": tag_id},
+            ],
+        )
+
+    def test_recipe_tags_changed(self, publish):
+        """Test changing a recipe's tags publishes a recipe update."""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+
+        publish.assert_called_once_with(
+            self.user.id,
+            {"type": "recipe", "action": "updated", "id": recipe.id},
+        )
+
+
+class BrokerTests(TestCase):
+    """Test the in-process broker."""
+
+    async def test_publish_to_user(self):
+        """Test events only reach the subscribers of their user."""
+        events = Broker()
+        subscription = events.subscribe(1)
+        other = events.subscribe(2)
+
+        events.publish(1, {"type": "tag"})
+        event = await asyncio.wait_for(subscription.get(), 1)
+
+        self.assertEqual(event, {"type": "tag"})
+        self.assertTrue(other.queue.empty())
+
+    @override_settings(RECIPE_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_subscriber_resyncs(self):
+        """Test a full queue is replaced by a resync event."""
+        events = Broker()
+        subscription = events.subscribe(1)
+
+        for i in range(3):
+            events.publish(1, {"type": "tag", "id": i})
+        await asyncio.sleep(0)
+
+        self.assertEqual(await subscription.get(), {"type": "resync"})
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_unsubscribe(self):
+        """Test unsubscribed queues get no more events."""
+        events = Broker()
+        subscription = events.subscribe(1)
+        events.unsubscribe(subscription)
+
+        events.publish(1, {"type": "tag"})
+        await asyncio.sleep(0)
+
+        self.assertTrue(subscription.queue.empty())
+
+
+class RecipeEventsViewTests(TestCase):
+    """Test the Server-Sent Events stream."""
+
+    def setUp(self):
+        self.user = create_user()
+        _, self.key = AuthToken.objects.issue(self.user)
+        # Streams left open by a test stay subscribed.
+        self.addCleanup(broker._subscriptions.clear)
+
+    async def test_stream_events(self):
+        """Test published events are sent to the stream."""
+        request = AsyncRequestFactory().get(
+            "/", headers={"Authorization": f"Token {self.key}"}
+        )
+        res = await async_views.recipe_events(request)
+        stream = aiter(res.streaming_content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/event-stream")
+        self.assertEqual(await anext(stream), b": connected\n\n")
+        broker.publish(
+            self.user.id, {"type": "recipe", "action": "created", "id": 7}
+        )
+        message = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(
+            message,
+            b"event: recipe.created\n"
+            b'data: {"type": "recipe", "action": "created", "id": 7}\n\n',
+        )
+
+    async def test_disconnect_unsubscribes(self):
+        """Test cancelling the stream, as on disconnect, unsubscribes."""
+        request = AsyncRequestFactory().get(
+            "/", headers={"Authorization": f"Token {self.key}"}
+        )
+        res = await async_views.recipe_events(request)
+        stream = aiter(res.streaming_content)
+        await anext(stream)
+
+        task = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertNotIn(self.user.id, broker._subscriptions)
+
+    @override_settings(RECIPE_EVENTS_KEEPALIVE=0.01)
+    async def test_keep_alive(self):
+        """Test idle streams send keep-alive comments."""
+        request = AsyncRequestFactory().get(
+            "/", headers={"Authorization": f"Token {self.key}"}
+        )
+        res = await async_views.recipe_events(request)
+        stream = aiter(res.streaming_content)
+
+        await anext(stream)
+        self.assertEqual(await anext(stream), b": keep-alive\n\n")
+
+    async def test_auth_required(self):
+        """Test streams need a valid token."""
+        res = await async_views.recipe_events(AsyncRequestFactory().get("/"))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class StopListener(BaseException):
+    """Raised to end listen()'s loop in tests."""
+
+
+class ListenerTests(SimpleTestCase):
+    """Test the Postgres notification listener."""
+
+    @patch("recipe.events.time.sleep")
+    @patch("recipe.events.connection")
+    def test_failed_connection_closed(self, connection, sleep):
+        """Test a failed connection is closed before reconnecting."""
+        failed, last = MagicMock(), MagicMock()
+        failed.cursor.side_effect = OSError("connection lost")
+        last.cursor.side_effect = StopListener
+        connection.get_new_connection.side_effect = [failed, last]
+
+        with self.assertLogs("recipe.events", "ERROR"):
+            with self.assertRaises(StopListener):
+                listen()
+
+        failed.close.assert_called_once_with()
+        last.close.assert_called_once_with()
+        sleep.assert_called_once_with(1)
@@ -0,0 +1,116 @@
+"""
+Tests for the fast path list serializers.
+"""
+
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import fast_serializers
+from recipe.queries import filter_recipe_attrs, filter_recipes
+from recipe.serializers import (
+    IngredientSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FastSerializerParityTests(TestCase):
+    """Test the fast path output is byte-identical to the serializers."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        other_user = get_user_model().objects.create_user(
+            email="other@example.com", password="testpass123"
+        )
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ["Vegan", "Dessert", "Crème ☕"]
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ["Salt", "Kale"]
+        ]
+        Tag.objects.create(user=self.user, name="Unused")
+        prices = [Decimal("5.25"), Decimal("10"), Decimal("0.5")]
+        for i, price in enumerate(prices):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f"Recipe {i}",
+                time_minutes=i * 7,
+                price=price,
+                link="https://example.com" if i else "",
+                description="Not in the list output",
+            )
+            recipe.tags.add(*self.tags[:i])
+            recipe.ingredients.add(*self.ingredients[: i % 2 + 1])
+        Recipe.objects.create(
+            user=other_user, title="Other", time_minutes=1, price=1
+        )
+
+    def assert_recipes_match(self, query_params):
+        queryset = filter_recipes(
+            Recipe.objects.all(), query_params, self.user
+        )
+        expected = render(RecipeSerializer(queryset, many=True).data)
+
+        self.assertEqual(
+            render(fast_serializers.serialize_recipes(queryset)), expected
+        )
+        self.assertEqual(
+            render(
+                async_to_sync(fast_serializers.aserialize_recipes)(queryset)
+            ),
+            expected,
+        )
+
+    def test_recipes(self):
+        """Test recipe lists match RecipeSerializer."""
+        self.assert_recipes_match({})
+
+    def test_recipes_filtered(self):
+        """Test filtered and empty recipe lists match RecipeSerializer."""
+        self.assert_recipes_match({"tags": str(self.tags[0].id)})
+        self.assert_recipes_match({"tags": "0"})
+
+    def test_attrs(self):
+        """Test tag and ingredient lists match their serializers."""
+        for model, serializer_class in [
+            (Tag, TagSerializer),
+            (Ingredient, IngredientSerializer),
+        ]:
+            for params in [{}, {"assigned_only": "1"}]:
+                queryset = filter_recipe_attrs(
+                    model.objects.all(), params, self.user
+                )
+                expected = render(serializer_class(queryset, many=True).data)
+
+                self.assertEqual(
+                    render(fast_serializers.serialize_attrs(queryset)),
+                    expected,
+                )
+                self.assertEqual(
+                    render(
+                        async_to_sync(fast_serializers.aserialize_attrs)(
+                            queryset
+                        )
+                    ),
+                    expected,
+                )
+
+    def test_recipe_queries(self):
+        """Test recipe lists take one query plus one per relation."""
+        queryset = filter_recipes(Recipe.objects.all(), {}, self.user)
+
+        with self.assertNumQueries(3):
+            fast_serializers.serialize_recipes(queryset)
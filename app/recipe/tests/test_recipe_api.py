@@ -3,10 +3,14 @@
 from decimal import Decimal
 import tempfile
 import os
+import zipfile
+from io import BytesIO
+from unittest.mock import patch
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework import status
@@ -15,6 +19,7 @@ from core.models import Recipe, Tag, Ingredient
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse("recipe:recipe-list")
+BULK_IMAGE_UPLOAD_URL = reverse("recipe:recipe-upload-images")
 
 
 def detail_url(recipe_id):
@@ -41,6 +46,13 @@ def create_recipe(user, **params):
     return recipe
 
 
+def image_bytes(image_format="JPEG", size=(10, 10)):
+    """Create and return an encoded image."""
+    buffer = BytesIO()
+    Image.new("RGB", size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
 def create_user(**params):
     """Create and return new user."""
     return get_user_model().objects.create_user(**params)
@@ -471,3 +483,224 @@ class ImageUploadTests(TestCase):
         payload = {"image": "notAnImage"}
         res = self.client.post(url, payload, format="multipart")
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_image_too_large(self):
+        """Test uploads over the byte limit are rejected while streaming."""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".png") as image_file:
+            img = Image.effect_noise((64, 64), 100)
+            img.save(image_file, format="PNG")
+            image_file.seek(0)
+            payload = {"image": image_file}
+            res = self.client.post(url, payload, format="multipart")
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_DIMENSION=50)
+    def test_upload_image_dimensions_too_large(self):
+        """Test images over the dimension limit are rejected."""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            img = Image.new("RGB", (100, 10))
+            img.save(image_file, format="JPEG")
+            image_file.seek(0)
+            payload = {"image": image_file}
+            res = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", res.data)
+
+    def test_upload_image_unsupported_format(self):
+        """Test images in formats outside the allow list are rejected."""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".bmp") as image_file:
+            img = Image.new("RGB", (10, 10))
+            img.save(image_file, format="BMP")
+            image_file.seek(0)
+            payload = {"image": image_file}
+            res = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_not_an_image_file(self):
+        """Test files Pillow can't identify are rejected."""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            image_file.write(b"not an image")
+            image_file.seek(0)
+            payload = {"image": image_file}
+            res = self.client.post(url, payload, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkImageUploadTests(TestCase):
+    """Tests for uploading images to many recipes at once."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email="user@example.com", password="goodPassword123"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+    def tearDown(self):
+        for recipe in Recipe.objects.all():
+            recipe.image.delete()
+
+    def upload_archive(self, entries, encrypted=()):
+        """
+        Zip the entries and post them as an archive, with the entries
+        named in `encrypted` flagged as encrypted.
+        """
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name, data in entries.items():
+                zip_file.writestr(name, data)
+        data = bytearray(archive.getvalue())
+        # Set the encryption flag in the central directory.
+        offset = data.find(b"PK\x01\x02")
+        while offset != -1:
+            length = int.from_bytes(data[offset + 28:offset + 30], "little")
+            name = data[offset + 46:offset + 46 + length].decode()
+            if name in encrypted:
+                data[offset + 8] |= 0x1
+            offset = data.find(b"PK\x01\x02", offset + 46)
+        archive = BytesIO(bytes(data))
+        archive.name = "images.zip"
+        return self.client.post(
+            BULK_IMAGE_UPLOAD_URL, {"archive": archive}, format="multipart"
+        )
+
+    def test_upload_zip_archive(self):
+        """Test uploading an archive stores an image per recipe."""
+        entries = {
+            f"images/{recipe.id}.jpg": image_bytes() for recipe in self.recipes
+        }
+        res = self.upload_archive(entries)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["results"]), 3)
+        for recipe in self.recipes:
+            recipe.refresh_from_db()
+            self.assertTrue(os.path.exists(recipe.image.path))
+
+    def test_upload_multipart_batch(self):
+        """Test uploading one file per recipe id."""
+        payload = {}
+        for recipe in self.recipes:
+            image_file = BytesIO(image_bytes("PNG"))
+            image_file.name = "image.png"
+            payload[str(recipe.id)] = image_file
+        res = self.client.post(
+            BULK_IMAGE_UPLOAD_URL, payload, format="multipart"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(result["id"] for result in res.data["results"]),
+            sorted(recipe.id for recipe in self.recipes),
+        )
+        for recipe in self.recipes:
+            recipe.refresh_from_db()
+            self.assertTrue(recipe.image.name.endswith(".png"))
+
+    def test_results_reported_per_recipe(self):
+        """Test bad entries fail on their own without failing the batch."""
+        other_user = create_user(
+            email="other@example.com", password="goodPassword123"
+        )
+        other_recipe = create_recipe(user=other_user)
+        good, bad = self.recipes[:2]
+        entries = {
+            f"{good.id}.jpg": image_bytes(),
+            f"{bad.id}.jpg": b"not an image",
+            f"{other_recipe.id}.jpg": image_bytes(),
+            "999999.jpg": image_bytes(),
+        }
+        res = self.upload_archive(entries)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = {result["id"]: result for result in res.data["results"]}
+        self.assertIn("image", results[good.id])
+        self.assertIn("errors", results[bad.id])
+        self.assertIn("errors", results[other_recipe.id])
+        self.assertIn("errors", results[999999])
+        other_recipe.refresh_from_db()
+        self.assertFalse(other_recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_oversized_entry_rejected(self):
+        """Test archive entries over the image size limit are rejected."""
+        recipe = self.recipes[0]
+        res = self.upload_archive({f"{recipe.id}.jpg": image_bytes()})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("errors", res.data["results"][0])
+
+    def test_unreadable_entry_rejected(self):
+        """Test encrypted archive entries fail on their own."""
+        good, bad = self.recipes[:2]
+        res = self.upload_archive(
+            {f"{good.id}.jpg": image_bytes(), f"{bad.id}.jpg": image_bytes()},
+            encrypted=[f"{bad.id}.jpg"],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = {result["id"]: result for result in res.data["results"]}
+        self.assertIn("image", results[good.id])
+        self.assertIn("errors", results[bad.id])
+
+    def test_non_ascii_digit_names_rejected(self):
+        """Test entries named with non-ASCII digits fail on their own."""
+        recipe = self.recipes[0]
+        res = self.upload_archive(
+            {f"{recipe.id}.jpg": image_bytes(), "\u00b2.jpg": image_bytes()}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = {result["id"]: result for result in res.data["results"]}
+        self.assertIn("image", results[recipe.id])
+        self.assertIn("errors", results["\u00b2"])
+
+    def test_storage_error_reported(self):
+        """Test images that can't be stored fail per recipe."""
+        storage = Recipe._meta.get_field("image").storage
+        recipe = self.recipes[0]
+        with patch.object(storage, "save", side_effect=OSError):
+            with self.assertLogs("recipe.uploads", "ERROR"):
+                res = self.upload_archive({f"{recipe.id}.jpg": image_bytes()})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("errors", res.data["results"][0])
+
+    def test_failed_upload_discards_images(self):
+        """Test images are deleted when the recipes can't be saved."""
+        entries = {
+            f"{recipe.id}.jpg": image_bytes() for recipe in self.recipes
+        }
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root), patch.object(
+                Recipe, "bump_version", side_effect=DatabaseError
+            ):
+                with self.assertRaises(DatabaseError):
+                    self.upload_archive(entries)
+
+            files = [names for _, _, names in os.walk(media_root) if names]
+        self.assertEqual(files, [])
+
+    def test_invalid_archive(self):
+        """Test uploading a file that isn't a zip archive."""
+        archive = BytesIO(b"not a zip")
+        archive.name = "images.zip"
+        res = self.client.post(
+            BULK_IMAGE_UPLOAD_URL, {"archive": archive}, format="multipart"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
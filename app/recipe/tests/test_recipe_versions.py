@@ -0,0 +1,113 @@
+"""
+Tests for recipe versions, ETags and If-Match.
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncRequestFactory, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import AuthToken, Recipe
+from recipe import async_views
+
+
+def detail_url(recipe_id):
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class RecipeVersionTests(TestCase):
+    """Test optimistic concurrency on recipe updates."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="testpass123"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="Soup",
+            time_minutes=5,
+            price=Decimal("1.00"),
+        )
+        self.url = detail_url(self.recipe.id)
+        _, self.key = AuthToken.objects.issue(self.user)
+
+    def patch(self, title, if_match=None):
+        headers = {"If-Match": if_match} if if_match else {}
+        return self.client.patch(
+            self.url, {"title": title}, format="json", headers=headers
+        )
+
+    def test_detail_etag(self):
+        """Test the detail carries the version as its ETag."""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res["ETag"], '"1"')
+        self.assertEqual(res.data["version"], 1)
+
+    def test_update_if_match(self):
+        """Test an update at the current version is applied."""
+        res = self.patch("Stew", '"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["ETag"], '"2"')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, "Stew")
+        self.assertEqual(self.recipe.version, 2)
+
+    def test_stale_update_rejected(self):
+        """Test an update made from an old version gets a 412."""
+        self.patch("Stew", '"1"')
+        res = self.patch("Curry", '"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, "Stew")
+
+    def test_weak_etag_accepted(self):
+        """Test the weak ETag of a compressed response matches."""
+        res = self.patch("Stew", 'W/"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_invalid_if_match(self):
+        """Test an If-Match that isn't a recipe ETag never matches."""
+        res = self.patch("Stew", '"abc"')
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_update_without_if_match(self):
+        """Test updates without If-Match always apply and bump the version."""
+        self.patch("Stew")
+        res = self.client.put(
+            self.url,
+            {"title": "Curry", "time_minutes": 10, "price": "2.00"},
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["ETag"], '"3"')
+
+    def test_bump_version(self):
+        """Test bumping from a stale instance."""
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertTrue(self.recipe.bump_version(1))
+
+        self.assertFalse(stale.bump_version(1))
+        self.assertTrue(stale.bump_version())
+        self.assertEqual(stale.version, 3)
+
+    async def test_async_detail_etag(self):
+        """Test the async detail view sends the ETag too."""
+        request = AsyncRequestFactory().get(
+            "/", headers={"Authorization": f"Token {self.key}"}
+        )
+
+        res = await async_views.recipe_detail(request, pk=self.recipe.id)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["ETag"], '"1"')
@@ -0,0 +1,331 @@
+"""
+Streaming upload handling for recipe images.
+"""
+
+import functools
+import logging
+import os
+import threading
+import zipfile
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+
+from core import metrics
+from core.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Multipart framing (boundaries, part headers, other form fields) sent
+# alongside the image itself.
+MULTIPART_OVERHEAD = 64 * 2**10
+
+
+class ImageTooLarge(exceptions.APIException):
+    """Raised when an upload goes over the configured byte limit."""
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _("Uploaded image is too large.")
+    default_code = "image_too_large"
+
+
+class InvalidImage(ValueError):
+    """Raised when an image fails validation."""
+
+
+@functools.cache
+def pillow():
+    """
+    Import Pillow's Image module on first use and set the pixel limit.
+
+    Every API image upload opens the image here before anything else
+    decodes it, including the serializer's ImageField, and the admin uses
+    ImageFormField, so the limit caps all of them without importing Pillow
+    at startup.
+    """
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = settings.RECIPE_IMAGE_MAX_PIXELS
+    return Image
+
+
+class ImageFormField(forms.ImageField):
+    """Form ImageField that applies Pillow's pixel limit first."""
+
+    def to_python(self, data):
+        pillow()
+        return super().to_python(data)
+
+
+def check_image(image):
+    """Validate the format and dimensions of an opened (lazy) image."""
+    if image.format not in settings.RECIPE_IMAGE_FORMATS:
+        raise InvalidImage(_("Unsupported image format."))
+    width, height = image.size
+    max_dimension = settings.RECIPE_IMAGE_MAX_DIMENSION
+    if width > max_dimension or height > max_dimension:
+        raise InvalidImage(_("Image dimensions are too large."))
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise InvalidImage(_("Image has too many pixels."))
+
+
+def open_image(data):
+    """Open image bytes lazily, reading only the header."""
+    Image = pillow()
+    try:
+        return Image.open(BytesIO(data))
+    except Image.DecompressionBombError:
+        raise InvalidImage(_("Image has too many pixels."))
+
+
+class RecipeImageUploadHandler(FileUploadHandler):
+    """
+    Validate recipe images while they are still being received.
+
+    The handler sits in front of Django's default handlers and passes every
+    chunk on to them, so it never stores the file itself. It counts the
+    bytes as they arrive, and buffers only the start of the file until
+    Pillow can read the image header. Bad formats and dimensions are
+    rejected before the rest of the body is read.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        self.max_request_size = self.max_size + MULTIPART_OVERHEAD
+        self.header_size = settings.RECIPE_IMAGE_HEADER_SIZE
+        self.inspecting = False
+
+    def should_inspect(self, field_name):
+        """Return whether the file in `field_name` is an image to check."""
+        return field_name == "image"
+
+    def reject(self, exc):
+        """Abort the upload because the current file is invalid."""
+        if isinstance(exc, ImageTooLarge):
+            raise exc
+        raise exceptions.ValidationError({"image": [str(exc)]})
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        """Reject requests that announce a body over the limit upfront."""
+        if content_length > self.max_request_size:
+            raise ImageTooLarge()
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.inspecting = self.should_inspect(field_name)
+        self.header = b""
+        self.header_checked = False
+        if not self.inspecting:
+            return
+        if self.content_length and self.content_length > self.max_size:
+            self.reject(ImageTooLarge())
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.inspecting:
+            return raw_data
+        if start + len(raw_data) > self.max_size:
+            self.reject(ImageTooLarge())
+        if not self.header_checked:
+            self.header += raw_data
+            self.check_header(final=len(self.header) >= self.header_size)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.inspecting and not self.header_checked:
+            self.check_header(final=True)
+        # Let the next handler build the uploaded file.
+        return None
+
+    def check_header(self, final):
+        """Try to identify the image from the bytes buffered so far."""
+        try:
+            with metrics.IMAGE_DURATION.time(step="header"):
+                image = open_image(self.header)
+                check_image(image)
+        except InvalidImage as exc:
+            self.reject(exc)
+        except Exception:
+            if final:
+                self.reject(InvalidImage(_("Upload a valid image.")))
+            return
+        self.header_checked = True
+        self.header = b""
+
+
+class BulkRecipeImageUploadHandler(RecipeImageUploadHandler):
+    """
+    Upload handler for batches of recipe images.
+
+    Every file field except `archive` is checked as an image, and a bad
+    file only skips that file. The errors are kept by field name so they
+    can be reported per recipe.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_request_size = settings.RECIPE_BULK_UPLOAD_MAX_SIZE
+        self.errors = {}
+
+    def should_inspect(self, field_name):
+        return field_name != "archive"
+
+    def reject(self, exc):
+        self.errors[self.field_name] = str(exc)
+        raise SkipFile()
+
+
+def read_archive(archive):
+    """
+    Return (recipe_id, read) pairs for the images in a zip archive.
+
+    Entries must be named after the recipe they belong to, for example
+    `12.jpg`. Nothing is extracted to disk: `read()` decompresses a single
+    entry into memory, bounded by the per-image size limit. It raises
+    InvalidImage for entries that are encrypted, use an unsupported
+    compression method or are corrupt.
+    """
+    max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+    try:
+        zip_file = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        raise exceptions.ValidationError(
+            {"archive": [_("Upload a valid zip archive.")]}
+        )
+    entries = [info for info in zip_file.infolist() if not info.is_dir()]
+    if len(entries) > settings.RECIPE_BULK_UPLOAD_MAX_FILES:
+        raise exceptions.ValidationError(
+            {"archive": [_("Archive contains too many files.")]}
+        )
+
+    def reader(info):
+        def read():
+            # The sizes in the archive can lie, so bound the read itself.
+            if info.file_size > max_size:
+                raise ImageTooLarge()
+            try:
+                with zip_file.open(info) as entry:
+                    data = entry.read(max_size + 1)
+            except (
+                RuntimeError,
+                NotImplementedError,
+                zipfile.BadZipFile,
+                zlib.error,
+                EOFError,
+            ):
+                raise InvalidImage(_("Archive entry can't be read."))
+            if len(data) > max_size:
+                raise ImageTooLarge()
+            return data
+
+        return read
+
+    return [
+        (os.path.splitext(os.path.basename(info.filename))[0], reader(info))
+        for info in entries
+    ]
+
+
+def save_image(recipe, data):
+    """Validate image bytes fully and store them for the recipe."""
+    try:
+        with metrics.IMAGE_DURATION.time(step="verify"):
+            image = open_image(data)
+            check_image(image)
+            image.verify()
+    except InvalidImage:
+        raise
+    except Exception:
+        raise InvalidImage(_("Upload a valid image."))
+    field = Recipe._meta.get_field("image")
+    file_name = field.generate_filename(
+        recipe, f"image.{image.format.lower()}"
+    )
+    with metrics.IMAGE_DURATION.time(step="store"):
+        return field.storage.save(file_name, ContentFile(data))
+
+
+def discard_images(names):
+    """Delete stored images that no recipe refers to."""
+    storage = Recipe._meta.get_field("image").storage
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.exception("Couldn't delete image %s", name)
+
+
+def process_bulk_images(recipes, items):
+    """
+    Validate and store many recipe images on a bounded worker pool.
+
+    `recipes` maps recipe ids to the recipes the caller may change, and
+    `items` is a list of (recipe_id, read) pairs whose data is read one at
+    a time, so at most twice the pool size of images sit in memory.
+    Returns a dict of stored file names and a dict of error messages, both
+    keyed by recipe id. If it raises, the images it stored are deleted.
+    """
+    workers = settings.RECIPE_BULK_UPLOAD_WORKERS
+    slots = threading.BoundedSemaphore(workers * 2)
+    counts = Counter(recipe_id for recipe_id, read in items)
+    futures = {}
+    errors = {}
+
+    def process(recipe, data):
+        try:
+            return save_image(recipe, data)
+        finally:
+            slots.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for recipe_id, read in items:
+                if counts[recipe_id] > 1:
+                    errors[recipe_id] = _("Duplicate recipe.")
+                    continue
+                if recipe_id not in recipes:
+                    errors[recipe_id] = _("Recipe not found.")
+                    continue
+                try:
+                    data = read()
+                except ImageTooLarge as exc:
+                    errors[recipe_id] = exc.detail
+                    continue
+                except InvalidImage as exc:
+                    errors[recipe_id] = str(exc)
+                    continue
+                slots.acquire()
+                futures[recipe_id] = pool.submit(
+                    process, recipes[recipe_id], data
+                )
+
+        stored = {}
+        for recipe_id, future in futures.items():
+            try:
+                stored[recipe_id] = future.result()
+            except InvalidImage as exc:
+                errors[recipe_id] = str(exc)
+            except OSError:
+                logger.exception(
+                    "Couldn't store image for recipe %s", recipe_id
+                )
+                errors[recipe_id] = _("Image couldn't be stored.")
+    except BaseException:
+        # The pool has finished every submitted image by now.
+        discard_images(
+            future.result()
+            for future in futures.values()
+            if future.exception() is None
+        )
+        raise
+    return stored, errors
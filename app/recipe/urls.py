@@ -2,9 +2,11 @@
 URL mappings for the recipe app.
 """
 
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from recipe import views
+from recipe.async_views import recipe_events, with_async_reads
 
 # User router to automatically create all different endpoint
 # that are availlable for that view we are adding.
@@ -16,5 +18,12 @@ router = DefaultRouter()
 router.register("recipes", views.RecipeViewSet)
 router.register("tags", views.TagViewSet)
 router.register("ingredients", views.IngredientViewSet)
+router_urls = router.urls
+# Under ASGI, answer GET list/detail requests with native async views.
+if settings.SERVE_ASYNC:
+    router_urls = with_async_reads(router_urls)
 app_name = "recipe"
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [path("", include(router_urls))]
+# The change feed holds its connection open, so it needs ASGI.
+if settings.SERVE_ASYNC:
+    urlpatterns.insert(0, path("events/", recipe_events, name="events"))
@@ -0,0 +1,44 @@
+"""
+Optimistic concurrency for recipe updates.
+
+Recipe responses carry the recipe's version as their ETag. A client that
+sends it back in If-Match only has its PUT or PATCH applied if nobody
+changed the recipe in between, and gets a 412 otherwise, without any lock
+held while it was editing.
+"""
+
+import re
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+
+ETAG_RE = re.compile(r'(?:W/)?"(\d+)"')
+
+
+class PreconditionFailed(exceptions.APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _("The recipe has changed since it was read.")
+    default_code = "precondition_failed"
+
+
+def etag(version):
+    """Return the ETag for a recipe version."""
+    return f'"{version}"'
+
+
+def if_match_version(request):
+    """
+    Return the version required by the If-Match header, or None if there
+    is no condition.
+
+    Compressed responses have their ETag made weak, so weak ETags are
+    accepted too: the version is the same whatever the encoding. Anything
+    other than one recipe ETag or "*" can't match.
+    """
+    header = request.headers.get("If-Match", "").strip()
+    if not header or header == "*":
+        return None
+    match = ETAG_RE.fullmatch(header)
+    if match is None:
+        raise PreconditionFailed()
+    return int(match.group(1))
@@ -1,6 +1,9 @@
 """Views for the recipe API's"""
 
 # from django.shortcuts import render
+import re
+
+from django.db import transaction
 from drf_spectacular.utils import (
     extend_schema,
     extend_schema_view,
@@ -10,10 +13,27 @@ from drf_spectacular.utils import (
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from core.idempotency import idempotent
 from core.models import Recipe, Tag, Ingredient
+from user.authentication import CachedTokenAuthentication
 from recipe import serializers
+from recipe.fast_serializers import serialize_attrs, serialize_recipes
+from recipe.queries import filter_recipe_attrs, filter_recipes
+from recipe.uploads import (
+    BulkRecipeImageUploadHandler,
+    RecipeImageUploadHandler,
+    discard_images,
+    process_bulk_images,
+    read_archive,
+)
+from recipe.versioning import etag, if_match_version
+
+# str.isdigit() also accepts digits like "²" that int() rejects.
+RECIPE_ID = re.compile(r"[0-9]+")
+
+# Actions responding with a recipe, sent with its version as the ETag.
+ETAG_ACTIONS = ("retrieve", "create", "update", "partial_update")
 
 
 # Create your views here.
@@ -43,29 +63,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
     # list endpoint, recipe by id endpoint and more
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def _params_to_int(self, qs):
-        """convert a list of strings to integers"""
-        return [int(str_id) for str_id in qs.split(",")]
-
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
-        tags = self.request.query_params.get("tags")
-        ingredients = self.request.query_params.get("ingredients")
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        # Adding filter to user by the user authenticated.
-        # Since the authentication class is configures for all operations.
-        # The user is passed by the authentication system for the request.
-        return (
-            queryset.filter(user=self.request.user).order_by("-id").distinct()
+        return filter_recipes(
+            self.queryset, self.request.query_params, self.request.user
         )
 
     def get_serializer_class(self):
@@ -74,18 +78,52 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if self.action == "list":
             return serializers.RecipeSerializer
         # a custom action unlike list
-        elif self.action == "upload_image":
+        elif self.action in ("upload_image", "upload_images"):
             return serializers.RecipeImageSerializer
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        """List recipes, built straight from database rows."""
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(serialize_recipes(queryset))
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """Create a recipe, once per Idempotency-Key."""
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         # Overwrite the behaviour when django saves a created object.
         serializer.save(user=self.request.user)
 
+    def perform_update(self, serializer):
+        """Update a recipe, if it's still at the If-Match version."""
+        serializer.save(expected_version=if_match_version(self.request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        data = getattr(response, "data", None)
+        if (
+            getattr(self, "action", None) in ETAG_ACTIONS
+            and status.is_success(response.status_code)
+            and isinstance(data, dict)
+            and "version" in data
+        ):
+            response["ETag"] = etag(data["version"])
+        return response
+
     @action(methods=["POST"], detail=True, url_path="upload-image")
+    @idempotent
     def upload_image(self, request, pk=None):
         """Upload an image to recipe."""
+        # Validate the image while it streams in, before the default
+        # handlers have buffered the whole body.
+        request.upload_handlers.insert(0, RecipeImageUploadHandler(request))
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
         if serializer.is_valid():
@@ -93,6 +131,57 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=["POST"], detail=False, url_path="upload-images")
+    @idempotent
+    def upload_images(self, request):
+        """
+        Upload images to many recipes at once.
+
+        Takes either a zip file in `archive` with entries named after
+        recipe ids (`12.jpg`), or one file per recipe with the recipe id
+        as the field name. Returns a result for every recipe.
+        """
+        handler = BulkRecipeImageUploadHandler(request)
+        request.upload_handlers.insert(0, handler)
+        archive = request.FILES.get("archive")
+        if archive is not None:
+            items = read_archive(archive)
+        else:
+            items = [(name, file.read) for name, file in request.FILES.items()]
+
+        names = list(dict.fromkeys([*handler.errors, *dict(items)]))
+        recipes = self.get_queryset().filter(
+            id__in=[name for name in names if RECIPE_ID.fullmatch(name)]
+        )
+        recipes = {str(recipe.id): recipe for recipe in recipes}
+        stored, errors = process_bulk_images(recipes, items)
+        errors.update(handler.errors)
+
+        results = []
+        unsaved = dict(stored)
+        try:
+            for name in names:
+                if name in errors:
+                    recipe_id = (
+                        int(name) if RECIPE_ID.fullmatch(name) else name
+                    )
+                    results.append(
+                        {"id": recipe_id, "errors": [errors[name]]}
+                    )
+                    continue
+                recipe = recipes[name]
+                recipe.image = unsaved[name]
+                with transaction.atomic():
+                    recipe.bump_version()
+                    recipe.save(update_fields=["image"])
+                del unsaved[name]
+                results.append(self.get_serializer(recipe).data)
+        except BaseException:
+            # Don't leave images behind for recipes that weren't saved.
+            discard_images(unsaved.values())
+            raise
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
 
 # Mixins must be defined before inoreder to use it
 # So we can overwrite the behavior
@@ -118,23 +207,21 @@ class BaseRecipeAtrrViewSet(
 ):
     """Base viewset for generic recipe attributes."""
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """Retrieve attribure for authenciated user"""
-        assigned_only = bool(
-            int(self.request.query_params.get("assigned_only", 0))
+        return filter_recipe_attrs(
+            self.queryset, self.request.query_params, self.request.user
         )
 
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return (
-            queryset.filter(user=self.request.user)
-            .order_by("-name")
-            .distinct()
-        )
+    def list(self, request, *args, **kwargs):
+        """List attributes, built straight from database rows."""
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(serialize_attrs(queryset))
 
 
 class TagViewSet(BaseRecipeAtrrViewSet):
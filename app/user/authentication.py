@@ -0,0 +1,196 @@
+"""
+Authentication backends for the API.
+"""
+
+import pickle
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+
+from core import metrics
+from core.cache import LRUCache
+from core.models import AuthToken, hash_token
+
+local_cache = LRUCache(
+    settings.TOKEN_AUTH_CACHE_MAX_ENTRIES, settings.TOKEN_AUTH_CACHE_TTL
+)
+
+
+def shared_cache():
+    """Return the cache shared by every process, or None if disabled."""
+    alias = settings.TOKEN_AUTH_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def token_cache_key(digest):
+    """Return the cache key for a token digest."""
+    return "auth-token:2:" + bytes(digest).hex()
+
+
+def invalidate_token(digest):
+    """Drop a token from every cache tier."""
+    cache_key = token_cache_key(digest)
+    local_cache.delete(cache_key)
+    cache = shared_cache()
+    if cache is not None:
+        cache.delete(cache_key)
+
+
+def invalidate_user_tokens(user):
+    """Drop all of a user's tokens from every cache tier."""
+    tokens = AuthToken.objects.filter(user=user)
+    for digest in tokens.values_list("digest", flat=True):
+        invalidate_token(digest)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Authentication with expiring, hashed AuthTokens.
+
+    The token -> user lookup is cached.
+    Lookups try a per-process LRU cache first, then the shared Django
+    cache, and only then the database. Entries are pickled so that every
+    request gets its own user instance. Shared entries carry their expiry,
+    so copying one to the local cache doesn't extend its lifetime. Tokens
+    are invalidated when they are deleted or their user is saved, see
+    user.signals. Other processes may keep using their local copy for up
+    to TOKEN_AUTH_CACHE_TTL seconds.
+
+    `aauthenticate` is the same lookup for async views, using the async
+    cache and ORM APIs.
+    """
+
+    model = AuthToken
+
+    def get_key(self, request):
+        """Return the token key from the Authorization header, or None."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            msg = _("Invalid token header. No credentials provided.")
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _(
+                "Invalid token header. Token string should not contain spaces."
+            )
+            raise exceptions.AuthenticationFailed(msg)
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            msg = _(
+                "Invalid token header. "
+                "Token string should not contain invalid characters."
+            )
+            raise exceptions.AuthenticationFailed(msg)
+
+    def authenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return self.authenticate_credentials(key)
+
+    async def aauthenticate(self, request):
+        """Async version of authenticate()."""
+        key = self.get_key(request)
+        if key is None:
+            return None
+        return await self.aauthenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        digest = hash_token(key)
+        cache_key = token_cache_key(digest)
+        cache = shared_cache()
+        entry = local_cache.get(cache_key)
+        result = "local"
+        if entry is None and cache is not None:
+            entry = self.from_shared(cache_key, cache.get(cache_key))
+            result = "shared"
+        if entry is None:
+            result = "miss"
+        metrics.CACHE_LOOKUPS.inc(cache="auth_token", result=result)
+        if entry is None:
+            tokens = self.model.objects.select_related("user")
+            try:
+                token = tokens.get(digest=digest)
+            except self.model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            entry = self.remember(cache_key, token, digest)
+            if cache is not None:
+                cache.set(
+                    cache_key,
+                    self.shared_entry(entry),
+                    settings.TOKEN_AUTH_CACHE_TTL,
+                )
+        return self.check_token(pickle.loads(entry))
+
+    async def aauthenticate_credentials(self, key):
+        """Async version of authenticate_credentials()."""
+        digest = hash_token(key)
+        cache_key = token_cache_key(digest)
+        cache = shared_cache()
+        entry = local_cache.get(cache_key)
+        result = "local"
+        if entry is None and cache is not None:
+            entry = self.from_shared(cache_key, await cache.aget(cache_key))
+            result = "shared"
+        if entry is None:
+            result = "miss"
+        metrics.CACHE_LOOKUPS.inc(cache="auth_token", result=result)
+        if entry is None:
+            tokens = self.model.objects.select_related("user")
+            try:
+                token = await tokens.aget(digest=digest)
+            except self.model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            entry = self.remember(cache_key, token, digest)
+            if cache is not None:
+                await cache.aset(
+                    cache_key,
+                    self.shared_entry(entry),
+                    settings.TOKEN_AUTH_CACHE_TTL,
+                )
+        return self.check_token(pickle.loads(entry))
+
+    def remember(self, cache_key, token, digest):
+        """Cache a token fetched from the database and return the entry."""
+        # Postgres hands back a memoryview, which can't be pickled.
+        token.digest = digest
+        entry = pickle.dumps(token, pickle.HIGHEST_PROTOCOL)
+        local_cache.set(cache_key, entry)
+        return entry
+
+    def shared_entry(self, entry):
+        """Return an entry for the shared cache, with its expiry time."""
+        return (time.time() + settings.TOKEN_AUTH_CACHE_TTL, entry)
+
+    def from_shared(self, cache_key, shared):
+        """
+        Copy an entry from the shared cache to the local one for the rest
+        of its TTL, and return it. None if it's missing or expired.
+        """
+        if shared is None:
+            return None
+        expires, entry = shared
+        ttl = expires - time.time()
+        if ttl <= 0:
+            return None
+        local_cache.set(cache_key, entry, ttl)
+        return entry
+
+    def check_token(self, token):
+        """Return (user, token) if the token may be used."""
+        if token.is_expired:
+            raise exceptions.AuthenticationFailed(_("Token has expired."))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return (token.user, token)
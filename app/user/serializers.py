@@ -41,6 +41,9 @@ class AuthTokenSerializer(serializers.Serializer):
         style={"input_type": "password"},
         trim_whitespace=False,
     )
+    device = serializers.CharField(
+        max_length=64, required=False, allow_blank=True, default=""
+    )
 
     # validator method called during the validation stage
     def validate(self, attrs):
@@ -59,3 +62,11 @@ class AuthTokenSerializer(serializers.Serializer):
         # We set the user attribute so we can use it in the view.
         attrs["user"] = user
         return attrs
+
+
+class TokenSerializer(serializers.Serializer):
+    """Serializer for a newly issued auth token."""
+
+    token = serializers.CharField()
+    device = serializers.CharField()
+    expires = serializers.DateTimeField()
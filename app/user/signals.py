@@ -0,0 +1,28 @@
+"""
+Signal handlers for the user app.
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import AuthToken
+from user.authentication import invalidate_token, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=AuthToken)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token from the cache once it's deleted."""
+    invalidate_token(instance.digest)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_saved_user(sender, instance, created, update_fields, **kwargs):
+    """Refresh cached users after a change, e.g. password or is_active."""
+    if created:
+        return
+    if update_fields is not None and not {"password", "is_active"} & set(
+        update_fields
+    ):
+        return
+    invalidate_user_tokens(instance)
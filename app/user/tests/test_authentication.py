@@ -0,0 +1,148 @@
+"""
+Tests for the cached token authentication.
+"""
+
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cache import LRUCache
+from core.models import AuthToken
+from user.authentication import local_cache, token_cache_key
+
+ME_URL = reverse("user:me")
+
+
+class LRUCacheTests(TestCase):
+    """Test the in-process LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry goes once the cache is full."""
+        lru = LRUCache(max_entries=2, ttl=60)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("c"), 3)
+
+    def test_entries_expire(self):
+        """Test entries are not returned after their TTL."""
+        lru = LRUCache(max_entries=2, ttl=60)
+        lru.set("a", 1, ttl=0)
+
+        self.assertIsNone(lru.get("a"))
+        self.assertEqual(len(lru), 0)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating API requests with cached tokens."""
+
+    def setUp(self):
+        local_cache.clear()
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com", password="test123123", name="Test"
+        )
+        self.token, key = AuthToken.objects.issue(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {key}")
+
+    def test_token_lookup_cached(self):
+        """Test repeated requests don't look the token up again."""
+        self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_shared_cache_used_on_local_miss(self):
+        """Test a process with a cold local cache uses the shared cache."""
+        self.client.get(ME_URL)
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_shared_entry_keeps_its_expiry(self):
+        """Test a shared entry isn't used locally past its expiry."""
+        self.client.get(ME_URL)
+        local_cache.clear()
+        cache_key = token_cache_key(self.token.digest)
+        _, entry = cache.get(cache_key)
+        cache.set(cache_key, (time.time() - 1, entry))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_uses_fresh_user(self):
+        """Test updates don't save stale fields of the cached user."""
+        self.client.get(ME_URL)
+        # Changed by another process, whose invalidation was missed.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_staff=True
+        )
+
+        res = self.client.patch(ME_URL, {"name": "New name"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, "New name")
+        self.assertTrue(self.user.is_staff)
+
+    def test_deleted_token_rejected(self):
+        """Test a cached token stops working once deleted."""
+        self.client.get(ME_URL)
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_rejected(self):
+        """Test an expired token is rejected even when cached."""
+        self.client.get(ME_URL)
+        self.token.expires = timezone.now() - timedelta(seconds=1)
+        self.token.save()
+        local_cache.clear()
+        cache.clear()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected."""
+        self.client.credentials(HTTP_AUTHORIZATION="Token not-a-token")
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a cached user is refreshed when deactivated."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save(update_fields=["is_active"])
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_refreshes_user(self):
+        """Test updating the password through the API refreshes the cache."""
+        self.client.get(ME_URL)
+        res = self.client.patch(ME_URL, {"password": "new_password123"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
@@ -7,9 +7,11 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from core.models import AuthToken
 
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
+TOKEN_ROTATE_URL = reverse("user:token-rotate")
 ME_URL = reverse("user:me")
 
 
@@ -82,6 +84,49 @@ class PublicUserAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn("token", res.data)
 
+    def test_create_token_per_device(self):
+        """Test a new login replaces the token of the same device only."""
+        user = create_user(email="test@example.com", password="good_pass123")
+        payload = {"email": user.email, "password": "good_pass123"}
+        self.client.post(TOKEN_URL, {**payload, "device": "phone"})
+        self.client.post(TOKEN_URL, {**payload, "device": "phone"})
+        res = self.client.post(TOKEN_URL, {**payload, "device": "tablet"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["device"], "tablet")
+        self.assertIn("expires", res.data)
+        devices = AuthToken.objects.filter(user=user).values_list(
+            "device", flat=True
+        )
+        self.assertCountEqual(devices, ["phone", "tablet"])
+
+    def test_token_key_not_stored(self):
+        """Test only a digest of the token key is stored."""
+        user = create_user(email="test@example.com", password="good_pass123")
+        payload = {"email": user.email, "password": "good_pass123"}
+        res = self.client.post(TOKEN_URL, payload)
+
+        token = AuthToken.objects.get(user=user)
+        self.assertNotIn(res.data["token"].encode(), bytes(token.digest))
+
+    def test_rotate_token(self):
+        """Test rotating a token issues a new one and revokes the old."""
+        user = create_user(email="test@example.com", password="good_pass123")
+        old_token, old_key = AuthToken.objects.issue(user, "phone")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {old_key}")
+        res = self.client.post(TOKEN_ROTATE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["device"], "phone")
+        self.assertNotEqual(res.data["token"], old_key)
+        new_key = res.data["token"]
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {new_key}")
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_create_token_bad_credentials(self):
         """Test return error if credentials not valid."""
         user_details = {
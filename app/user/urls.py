@@ -1,11 +1,23 @@
 """URL Mappings for the user API."""
 
 from django.urls import path
+from core.hashers import offload_hashing
 from user import views
 
 app_name = "user"
 urlpatterns = [
-    path("create/", views.CreateUserView.as_view(), name="create"),
-    path("token/", views.CreateTokenView.as_view(), name="token"),
+    path(
+        "create/",
+        offload_hashing(views.CreateUserView.as_view()),
+        name="create",
+    ),
+    path(
+        "token/",
+        offload_hashing(views.CreateTokenView.as_view()),
+        name="token",
+    ),
+    path(
+        "token/rotate/", views.RotateTokenView.as_view(), name="token-rotate"
+    ),
     path("me/", views.ManageUserViews.as_view(), name="me"),
 ]
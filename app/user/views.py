@@ -1,16 +1,33 @@
 """Views for the user API."""
 
-from rest_framework import generics, authentication, permissions
-from user.serializers import UserSerializer, AuthTokenSerializer
+from django.contrib.auth import get_user_model
+from rest_framework import generics, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from core.models import AuthToken
+from core.throttling import LoginThrottle, SignupThrottle
+from user.authentication import CachedTokenAuthentication
+from user.serializers import (
+    UserSerializer,
+    AuthTokenSerializer,
+    TokenSerializer,
+)
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
 
+def token_response(token, key):
+    """Return the response for a newly issued token."""
+    data = {"token": key, "device": token.device, "expires": token.expires}
+    return Response(TokenSerializer(data).data)
+
+
 # Create your views here.
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
 
     serializer_class = UserSerializer
+    throttle_classes = [SignupThrottle]
 
 
 class CreateTokenView(ObtainAuthToken):
@@ -19,17 +36,45 @@ class CreateTokenView(ObtainAuthToken):
     # We have created a custom Serializer since it uses a username and password
     # and we aim to use email and password
     serializer_class = AuthTokenSerializer
+    throttle_classes = [LoginThrottle]
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        """Issue a token for the user's device, replacing any older one."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token, key = AuthToken.objects.issue(
+            serializer.validated_data["user"],
+            serializer.validated_data["device"],
+        )
+        return token_response(token, key)
+
+
+class RotateTokenView(APIView):
+    """Replace the token used for the request with a new one."""
+
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = TokenSerializer
+
+    def post(self, request, *args, **kwargs):
+        """Issue a new token for the same device; the old one stops working."""
+        token, key = AuthToken.objects.issue(request.user, request.auth.device)
+        return token_response(token, key)
+
 
 class ManageUserViews(generics.RetrieveUpdateAPIView):
     """Manage authenticated user."""
 
     # provided functionality for retrieving and updating objects in the db.
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """Retrieve and return the authenticated user."""
-        return self.request.user
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # The authenticated user may come from the token cache, so saving
+        # it could write back stale fields such as the password.
+        return get_user_model().objects.get(pk=self.request.user.pk)